@@ -0,0 +1,127 @@
+"""
+Cold-start cost of opening the vector store and context store on Lambda:
+copying the ChromaDB directory and context store to /tmp (current Chroma
+path) versus opening the NumPy index and context store in place,
+read-only, with /tmp overlays (config.READ_ONLY_SERVING).
+
+Each measurement covers open + first query, in a fresh subprocess so that
+no client caches survive between runs:
+
+    python -m backend.benchmarks.cold_start_benchmark --size 5000
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import chromadb
+import numpy as np
+
+from backend.benchmarks.vector_index_benchmark import synthetic_corpus
+from backend.corpus.context_store import SongContextStore
+from backend.corpus.embeddings.vector_index import NumpyVectorIndex
+
+COPY_TO_TMP = """
+import shutil, sys, time
+import chromadb
+from backend.corpus.context_store import SongContextStore
+root, tmp, query = sys.argv[1], sys.argv[2], [float(x) for x in sys.argv[3:]]
+started = time.perf_counter()
+shutil.copytree(f"{root}/genius_corpus_db", f"{tmp}/genius_corpus_db")
+shutil.copyfile(f"{root}/song_contexts.db", f"{tmp}/song_contexts.db")
+collection = chromadb.PersistentClient(path=f"{tmp}/genius_corpus_db").get_collection(
+    "genius_embeddings"
+)
+store = SongContextStore(f"{tmp}/song_contexts.db")
+ids = collection.query(query_embeddings=[query], n_results=10)["ids"][0]
+store.get_many_by_song_ids(ids)
+print(time.perf_counter() - started)
+"""
+
+OPEN_IN_PLACE = """
+import sys, time
+from backend.corpus.context_store import OverlayContextStore, SongContextStore
+from backend.corpus.embeddings.vector_index import NumpyVectorIndex, OverlayVectorIndex
+root, tmp, query = sys.argv[1], sys.argv[2], [float(x) for x in sys.argv[3:]]
+started = time.perf_counter()
+index = OverlayVectorIndex(
+    NumpyVectorIndex(f"{root}/numpy_index", read_only=True),
+    NumpyVectorIndex(f"{tmp}/numpy_index_overlay"),
+)
+store = OverlayContextStore(
+    SongContextStore(f"{root}/song_contexts.db", read_only=True),
+    SongContextStore(f"{tmp}/song_contexts_overlay.db"),
+)
+ids = index.query(query_embeddings=[query], n_results=10)["ids"][0]
+store.get_many_by_song_ids(ids)
+print(time.perf_counter() - started)
+"""
+
+
+def build_shipped_stores(root, ids, embeddings, metadatas):
+    collection = chromadb.PersistentClient(
+        path=str(root / "genius_corpus_db")
+    ).get_or_create_collection(
+        name="genius_embeddings", metadata={"hnsw:space": "cosine"}
+    )
+    for start in range(0, len(ids), 5000):
+        collection.add(
+            ids=ids[start : start + 5000],
+            embeddings=embeddings[start : start + 5000],
+            metadatas=metadatas[start : start + 5000],
+        )
+    NumpyVectorIndex.build(root / "numpy_index", ids, embeddings, metadatas)
+
+    store = SongContextStore(root / "song_contexts.db")
+    store.put_many(
+        {
+            "track_id": None,
+            "artist": metadata["artists"],
+            "track_name": metadata["track_name"],
+            "context": "Lyrics:\n" + "la la la\n" * 300,
+        }
+        for metadata in metadatas
+    )
+    store.close()
+
+
+def time_cold_start(script, root, query):
+    with tempfile.TemporaryDirectory() as tmp:
+        output = subprocess.run(
+            [sys.executable, "-c", script, str(root), tmp, *map(str, query)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(ids, embeddings, metadatas, runs=5):
+    report = {}
+    with tempfile.TemporaryDirectory() as shipped:
+        root = Path(shipped)
+        build_shipped_stores(root, ids, embeddings, metadatas)
+        query = embeddings[0].tolist()
+        for name, script in (
+            ("copy to /tmp (chroma)", COPY_TO_TMP),
+            ("open in place (numpy)", OPEN_IN_PLACE),
+        ):
+            timings = [time_cold_start(script, root, query) for _ in range(runs)]
+            report[name] = float(np.median(timings) * 1000)
+
+    print(f"\n{len(ids)} songs, median of {runs} cold starts (open + first query)\n")
+    for name, median_ms in report.items():
+        print(f"{name:<26}{median_ms:>10.1f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(*synthetic_corpus(args.size, args.dim), runs=args.runs)
@@ -0,0 +1,146 @@
+"""
+CPU seconds and bytes written per track for the download conversion
+policies of TrackDownloader, measured offline: fixture audio files are
+generated with ffmpeg and served from a local HTTP server standing in for
+YouTube's audio streams.
+
+    python -m backend.benchmarks.conversion_benchmark --seconds 180
+
+Policies:
+    file + transcode    download to a temp file, encode, delete (previous)
+    stream + transcode  ffmpeg reads the HTTP stream and encodes
+    stream + copy       ffmpeg reads the HTTP stream and stream-copies
+                        (source codec already matches the output format)
+"""
+
+import argparse
+import functools
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.request
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from backend import config
+from backend.core.track_downloader import TrackDownloader
+
+# fixture name -> (ffmpeg encoder arguments, yt-dlp style codec name)
+FIXTURES = {
+    "source.webm": (["-acodec", "libopus", "-b:a", "128k"], "opus"),
+    "source.m4a": (["-acodec", "aac", "-b:a", "128k"], "mp4a.40.2"),
+    "source.mp3": (["-acodec", "libmp3lame", "-b:a", "128k"], "mp3"),
+}
+
+
+def children_cpu_sec():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def make_fixtures(ffmpeg, folder, seconds):
+    for name, (encoder, _) in FIXTURES.items():
+        subprocess.run(
+            [
+                ffmpeg,
+                "-nostdin",
+                "-f",
+                "lavfi",
+                "-i",
+                f"sine=frequency=440:duration={seconds}",
+            ]
+            + encoder
+            + ["-y", str(folder / name)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+def serve(folder):
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(folder))
+    handler.log_message = lambda *args: None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(convert):
+    """
+    Runs `convert()`, which returns its output files and the bytes of any
+    intermediate download, and returns the ffmpeg CPU seconds and the
+    total bytes written.
+    """
+    cpu_before = children_cpu_sec()
+    outputs, downloaded_bytes = convert()
+    cpu_sec = children_cpu_sec() - cpu_before
+    return cpu_sec, downloaded_bytes + sum(path.stat().st_size for path in outputs)
+
+
+def run_benchmark(ffmpeg, seconds=180):
+    downloader = TrackDownloader()
+    downloader.ffmpeg_path = ffmpeg
+    report = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixtures = tmp / "fixtures"
+        fixtures.mkdir()
+        make_fixtures(ffmpeg, fixtures, seconds)
+        server = serve(fixtures)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        for output_format, output_codec in (("mp3", "mp3"), ("m4a", "mp4a")):
+            config.AUDIO_OUTPUT_FORMAT = output_format
+            for name, (_, codec) in FIXTURES.items():
+                url = f"{base_url}/{name}"
+                stem = tmp / f"{Path(name).stem}_{output_format}"
+
+                def file_transcode(url=url, stem=stem):
+                    temp_path, _ = urllib.request.urlretrieve(url, f"{stem}_download")
+                    temp_bytes = Path(temp_path).stat().st_size
+                    output = Path(f"{stem}_file.{output_format}")
+                    downloader.convert_audio({"path": temp_path}, output)
+                    return [output], temp_bytes
+
+                def stream(url=url, stem=stem, acodec=None, policy="transcode"):
+                    output = Path(f"{stem}_{policy}.{output_format}")
+                    downloader.convert_audio({"url": url, "acodec": acodec}, output)
+                    return [output], 0
+
+                policies = {
+                    "file + transcode": file_transcode,
+                    "stream + transcode": stream,
+                }
+                if codec.split(".")[0] == output_codec:
+                    policies["stream + copy"] = functools.partial(
+                        stream, acodec=codec, policy="copy"
+                    )
+
+                for policy, convert in policies.items():
+                    cpu, written = measure(convert)
+                    report.append((output_format, name, policy, cpu, written))
+
+        server.shutdown()
+
+    print(f"\n{seconds}s tracks, CPU = ffmpeg user+system seconds\n")
+    print(f"{'output':<8}{'source':<14}{'policy':<22}{'CPU s':>8}{'MB written':>12}")
+    for output_format, name, policy, cpu, written in report:
+        print(
+            f"{output_format:<8}{name:<14}{policy:<22}{cpu:>8.2f}{written / 1e6:>12.2f}"
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=int, default=180)
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg"))
+    args = parser.parse_args()
+
+    if not args.ffmpeg:
+        sys.exit("ffmpeg not found; pass --ffmpeg /path/to/ffmpeg.")
+    run_benchmark(args.ffmpeg, seconds=args.seconds)
@@ -0,0 +1,118 @@
+"""
+Recall, size and latency of compressed song embeddings (PCA and/or int8)
+against the full-precision NumPy index, with and without rescoring against a
+float16 copy (whose size is counted in the "+rescore" rows).
+
+    python -m backend.benchmarks.embedding_compression_benchmark --size 5000
+"""
+
+import argparse
+import tempfile
+
+import numpy as np
+
+from backend.benchmarks.vector_index_benchmark import (
+    load_corpus,
+    percentile_ms,
+    recall_at_k,
+    synthetic_corpus,
+    time_queries,
+)
+from backend.corpus.embeddings.embedding_compression import (
+    CompressedVectorIndex,
+    EmbeddingCompressor,
+)
+from backend.corpus.embeddings.vector_index import NumpyVectorIndex
+
+CONFIGURATIONS = {
+    "int8": (None, "int8"),
+    "pca-512": (512, None),
+    "pca-256": (256, None),
+    "pca-256-int8": (256, "int8"),
+    "pca-128-int8": (128, "int8"),
+}
+
+
+def run_benchmark(ids, embeddings, metadatas, num_queries=200, top_k=10, rescore=50):
+    rng = np.random.default_rng(1)
+    query_rows = rng.integers(len(ids), size=num_queries)
+    queries = embeddings[query_rows] + 0.3 * rng.normal(
+        size=(num_queries, embeddings.shape[1])
+    )
+
+    def search(index):
+        return lambda q: index.query(
+            query_embeddings=[q], n_results=top_k, include=["distances"]
+        )["ids"][0]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        full_index = NumpyVectorIndex.build(
+            f"{index_dir}/full", ids, embeddings, metadatas
+        )
+        rescore_index = NumpyVectorIndex.build(
+            f"{index_dir}/float16", ids, embeddings, metadatas, dtype="float16"
+        )
+        latencies, exact = time_queries(search(full_index), queries)
+        report = {
+            "float32": {
+                "bytes": full_index.vectors.nbytes,
+                "p50_ms": percentile_ms(latencies, 50),
+                "recall": 1.0,
+            }
+        }
+
+        for name, (pca_dim, quantization) in CONFIGURATIONS.items():
+            compressed = CompressedVectorIndex.build(
+                f"{index_dir}/{name}",
+                ids,
+                embeddings,
+                metadatas,
+                compressor=EmbeddingCompressor(pca_dim, quantization),
+                rescore_candidates=0,
+            )
+            latencies, results = time_queries(search(compressed), queries)
+            report[name] = {
+                "bytes": compressed.nbytes(),
+                "p50_ms": percentile_ms(latencies, 50),
+                "recall": recall_at_k(results, exact),
+            }
+
+            compressed.full_index = rescore_index
+            compressed.rescore_candidates = rescore
+            latencies, results = time_queries(search(compressed), queries)
+            report[f"{name}+rescore"] = {
+                "bytes": compressed.nbytes(),
+                "p50_ms": percentile_ms(latencies, 50),
+                "recall": recall_at_k(results, exact),
+            }
+
+    print(
+        f"\n{len(ids)} vectors x {embeddings.shape[1]} dims, {num_queries} queries, "
+        f"top-{top_k}, rescoring the best {rescore} compressed candidates\n"
+    )
+    print(f"{'index':<22}{'MB':>10}{'p50 ms':>10}{'recall@k':>10}")
+    for name, stats in report.items():
+        print(
+            f"{name:<22}{stats['bytes'] / 1e6:>10.2f}"
+            f"{stats['p50_ms']:>10.2f}{stats['recall']:>10.3f}"
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", action="store_true", help="use the local corpus")
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus()
+    else:
+        corpus = synthetic_corpus(args.size, args.dim)
+    run_benchmark(
+        *corpus, num_queries=args.queries, top_k=args.top_k, rescore=args.rescore
+    )
@@ -0,0 +1,114 @@
+"""
+Latency of the Refine selection step as the candidate pool grows:
+the previous chain (one embedding lookup per candidate, then an ANN query
+restricted by an $or filter) versus one bulk embedding fetch followed by
+a single HybridScorer pass. OpenAI/Genius calls are excluded.
+
+    python -m backend.benchmarks.hybrid_scorer_benchmark --pools 20 200 2000
+"""
+
+import argparse
+import time
+
+import chromadb
+import numpy as np
+import pandas as pd
+
+from backend.benchmarks.vector_index_benchmark import synthetic_corpus
+from backend.core.hybrid_scorer import FEATURE_RANGES, HybridScorer
+from backend.corpus.context_store import song_id_for
+
+
+def synthetic_pool(metadatas, size, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(metadatas), size=size, replace=False)
+    pool = pd.DataFrame([metadatas[row] for row in rows])
+    for feature, (low, high) in FEATURE_RANGES.items():
+        pool[feature] = rng.uniform(low, high, size=size)
+    pool["popularity"] = rng.integers(0, 100, size=size)
+    return pool
+
+
+def chained_selection(collection, pool, prompt_embedding, top_k):
+    for artist, track_name in zip(pool["artists"], pool["track_name"]):
+        collection.get(ids=[song_id_for(artist, track_name)], include=["documents"])
+    conditions = [
+        {"$and": [{"artists": {"$eq": a}}, {"track_name": {"$eq": t}}]}
+        for a, t in zip(pool["artists"], pool["track_name"])
+    ]
+    return collection.query(
+        query_embeddings=[prompt_embedding],
+        n_results=min(top_k, len(conditions)),
+        where={"$or": conditions},
+        include=["metadatas", "distances"],
+    )
+
+
+def hybrid_selection(collection, pool, prompt_embedding, params, top_k):
+    song_ids = [song_id_for(a, t) for a, t in zip(pool["artists"], pool["track_name"])]
+    stored = {}
+    for start in range(0, len(song_ids), 500):
+        existing = collection.get(
+            ids=song_ids[start : start + 500], include=["embeddings"]
+        )
+        stored.update(zip(existing["ids"], existing["embeddings"]))
+    matrix = np.stack([stored[song_id] for song_id in song_ids])
+    similarities = matrix @ prompt_embedding / np.linalg.norm(matrix, axis=1)
+    return HybridScorer().top_n(pool, params, similarities, n=top_k)
+
+
+def run_benchmark(corpus_size, dim, pool_sizes, top_k=10, repeats=3):
+    ids, embeddings, metadatas = synthetic_corpus(corpus_size, dim)
+    collection = chromadb.Client().get_or_create_collection(
+        name="hybrid_scorer_benchmark", metadata={"hnsw:space": "cosine"}
+    )
+    for start in range(0, len(ids), 5000):
+        collection.add(
+            ids=ids[start : start + 5000],
+            embeddings=embeddings[start : start + 5000],
+            metadatas=metadatas[start : start + 5000],
+        )
+
+    prompt_embedding = embeddings[0] / np.linalg.norm(embeddings[0])
+    params = {"energy": [0.6, 0.8], "tempo": [110, 130], "valence": [0.5, 0.7]}
+
+    print(f"\n{corpus_size} embedded songs, top-{top_k}, median of {repeats} runs\n")
+    print(f"{'pool':>8}{'chained ms':>14}{'hybrid ms':>12}")
+    report = {}
+    for size in pool_sizes:
+        pool = synthetic_pool(metadatas, size)
+        timings = {"chained": [], "hybrid": []}
+        error = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            try:
+                chained_selection(collection, pool, prompt_embedding, top_k)
+                timings["chained"].append(time.perf_counter() - started)
+            except chromadb.errors.ChromaError as e:
+                # large $or filters exceed Chroma's expression depth limit
+                timings["chained"].append(np.nan)
+                error = e
+
+            started = time.perf_counter()
+            hybrid_selection(collection, pool, prompt_embedding, params, top_k)
+            timings["hybrid"].append(time.perf_counter() - started)
+
+        report[size] = {name: np.median(t) * 1000 for name, t in timings.items()}
+        print(
+            f"{size:>8}{report[size]['chained']:>14.1f}"
+            f"{report[size]['hybrid']:>12.1f}"
+        )
+        if error:
+            print(f"{'':>8}chained selection failed: {error}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus-size", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--pools", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    run_benchmark(args.corpus_size, args.dim, args.pools, top_k=args.top_k)
@@ -0,0 +1,116 @@
+"""
+Per-invocation setup cost of the heavyweight Lambda handler: cold
+invocations (secrets fetched and Orchestrator built, as on every invocation
+before the warm state) versus warm invocations reusing the container's
+secrets and Orchestrator.
+
+Secrets Manager and S3 are replaced by in-memory fakes with a simulated
+round trip, and the plan itself is not run, so only the handler's setup is
+measured. Requires the dataset (backend/data_management/data/kaggle):
+
+    python -m backend.benchmarks.lambda_warm_benchmark --invocations 10
+"""
+
+import argparse
+import json
+import os
+import time
+
+
+class FakeSecretsManager:
+    def __init__(self, latency_sec):
+        self.latency_sec = latency_sec
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        time.sleep(self.latency_sec)
+        self.calls += 1
+        return {
+            "SecretString": json.dumps(
+                {
+                    "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-benchmark"),
+                    "GENIUS_API_KEY": "genius-benchmark",
+                    "YOUTUBE_API_KEY": "youtube-benchmark",
+                }
+            )
+        }
+
+
+class FakeS3Client:
+    def __init__(self, latency_sec):
+        self.latency_sec = latency_sec
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        time.sleep(self.latency_sec)
+        self.objects[Key] = Body
+
+
+def load_handler(latency_sec):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("S3_BUCKET_NAME", "benchmark-bucket")
+    os.environ.setdefault("SECRET_NAME", "benchmark-secret")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    from backend.core.orchestrator import Orchestrator
+    from backend.deployment.aws.lambda_heavy import app
+
+    secretsmanager = FakeSecretsManager(latency_sec)
+    app.secrets_cache._client = secretsmanager
+    app.s3_client = FakeS3Client(latency_sec)
+    # setup only: the plan (LLM calls, searches, downloads) is not run
+    Orchestrator.run_planning_agent = (
+        lambda self, *args, **kwargs: app.get_mock_playlist()
+    )
+    return app, secretsmanager
+
+
+def invoke(app, job_id):
+    started = time.perf_counter()
+    app.lambda_handler({"job_id": job_id, "description": "benchmark"}, None)
+    return time.perf_counter() - started
+
+
+def run(invocations, latency_sec):
+    from backend.deployment.aws.warm_state import WarmOrchestrator
+
+    app, secretsmanager = load_handler(latency_sec)
+
+    cold = []
+    for i in range(invocations):
+        # a new container: no cached secrets nor Orchestrator
+        app.secrets_cache._secrets = None
+        app.warm_orchestrator = WarmOrchestrator()
+        cold.append(invoke(app, f"cold-{i}"))
+
+    warm = [invoke(app, f"warm-{i}") for i in range(invocations)]
+    return {
+        "cold_mean_sec": sum(cold) / len(cold),
+        "warm_mean_sec": sum(warm) / len(warm),
+        "secrets_calls": secretsmanager.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--invocations", type=int, default=5)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=30.0,
+        help="Simulated Secrets Manager / S3 round trip.",
+    )
+    args = parser.parse_args()
+
+    result = run(args.invocations, args.latency_ms / 1000)
+    print(f"\nHeavy handler, {args.invocations} invocations each:")
+    print(f"   cold: {result['cold_mean_sec'] * 1000:9.1f} ms / invocation")
+    print(f"   warm: {result['warm_mean_sec'] * 1000:9.1f} ms / invocation")
+    print(
+        f"   speedup: {result['cold_mean_sec'] / result['warm_mean_sec']:.1f}x, "
+        f"{result['secrets_calls']} Secrets Manager calls"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Latency and recall of the NumPy vector index against ChromaDB.
+
+Runs on the local corpus (`--corpus`) or on synthetic ada-002 sized vectors:
+
+    python -m backend.benchmarks.vector_index_benchmark --size 5000
+"""
+
+import argparse
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from backend import config
+from backend.corpus.embeddings.vector_index import NumpyVectorIndex
+
+
+def percentile_ms(latencies, q):
+    return float(np.percentile(latencies, q) * 1000)
+
+
+def time_queries(run_query, queries):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(run_query(query))
+        latencies.append(time.perf_counter() - started)
+    return latencies, results
+
+
+def recall_at_k(results, exact_results):
+    hits = [
+        len(set(ids) & set(exact_ids)) / max(len(exact_ids), 1)
+        for ids, exact_ids in zip(results, exact_results)
+    ]
+    return float(np.mean(hits))
+
+
+def load_corpus():
+    chroma_client = chromadb.PersistentClient(path=str(config.EMBEDDINGS_DB_PATH))
+    collection = chroma_client.get_collection(name="genius_embeddings")
+    existing = collection.get(include=["embeddings", "metadatas"])
+    return existing["ids"], np.asarray(existing["embeddings"]), existing["metadatas"]
+
+
+def synthetic_corpus(size, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    # clustered vectors resemble text embeddings better than pure noise
+    centers = rng.normal(size=(max(size // 50, 1), dim))
+    embeddings = centers[rng.integers(len(centers), size=size)]
+    embeddings += 0.5 * rng.normal(size=(size, dim))
+    ids = [f"Artist {i} - Track {i}.txt" for i in range(size)]
+    metadatas = [
+        {"artists": f"Artist {i}", "track_name": f"Track {i}"} for i in range(size)
+    ]
+    return ids, embeddings.astype(np.float32), metadatas
+
+
+def run_benchmark(ids, embeddings, metadatas, num_queries=200, top_k=10, pool=50):
+    rng = np.random.default_rng(1)
+    query_rows = rng.integers(len(ids), size=num_queries)
+    queries = embeddings[query_rows] + 0.3 * rng.normal(
+        size=(num_queries, embeddings.shape[1])
+    )
+    candidate_rows = rng.choice(len(ids), size=min(pool, len(ids)), replace=False)
+    where = {
+        "$or": [
+            {
+                "$and": [
+                    {"artists": {"$eq": metadatas[row]["artists"]}},
+                    {"track_name": {"$eq": metadatas[row]["track_name"]}},
+                ]
+            }
+            for row in candidate_rows
+        ]
+    }
+
+    chroma_collection = chromadb.Client().get_or_create_collection(
+        name="vector_index_benchmark",
+        metadata={"hnsw:space": "cosine", "hnsw:num_threads": 1},
+    )
+    for start in range(0, len(ids), 5000):
+        chroma_collection.add(
+            ids=ids[start : start + 5000],
+            embeddings=embeddings[start : start + 5000],
+            metadatas=metadatas[start : start + 5000],
+        )
+
+    backends = {"chroma": chroma_collection}
+    with tempfile.TemporaryDirectory() as index_dir:
+        for dtype in ("float32", "float16"):
+            backends[f"numpy-{dtype}"] = NumpyVectorIndex.build(
+                f"{index_dir}/{dtype}", ids, embeddings, metadatas, dtype=dtype
+            )
+
+        report = {}
+        exact = None
+        for name, backend in backends.items():
+            latencies, results = time_queries(
+                lambda q: backend.query(
+                    query_embeddings=[q], n_results=top_k, include=["distances"]
+                )["ids"][0],
+                queries,
+            )
+            restricted_latencies, _ = time_queries(
+                lambda q: backend.query(
+                    query_embeddings=[q],
+                    n_results=top_k,
+                    where=where,
+                    include=["distances"],
+                ),
+                queries[:20],
+            )
+            if name == "numpy-float32":
+                exact = results
+            report[name] = {
+                "results": results,
+                "p50_ms": percentile_ms(latencies, 50),
+                "p95_ms": percentile_ms(latencies, 95),
+                "restricted_p50_ms": percentile_ms(restricted_latencies, 50),
+            }
+
+    print(
+        f"\n{len(ids)} vectors x {embeddings.shape[1]} dims, {num_queries} queries, "
+        f"top-{top_k}, restricted queries over {len(candidate_rows)} candidates\n"
+    )
+    print(
+        f"{'backend':<16}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'restricted p50 ms':>20}{'recall@k':>10}"
+    )
+    for name, stats in report.items():
+        print(
+            f"{name:<16}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            f"{stats['restricted_p50_ms']:>20.2f}"
+            f"{recall_at_k(stats['results'], exact):>10.3f}"
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", action="store_true", help="use the local corpus")
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus()
+    else:
+        corpus = synthetic_corpus(args.size, args.dim)
+    run_benchmark(*corpus, num_queries=args.queries, top_k=args.top_k)
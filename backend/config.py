@@ -13,13 +13,107 @@ FILE_PATH = PROJECT_ROOT / "data_management" / "data" / "kaggle" / "dataset.csv"
 FFMPEG_PATH = PROJECT_ROOT / "resources" / "bin" / "ffmpeg.exe"
 TRACKS_DIR = PROJECT_ROOT / "output" / "audio" / "downloaded_tracks"
 PLAYLISTS_DIR = PROJECT_ROOT / "output" / "playlists"
+# TrackDownloader pipeline: concurrent downloads (network pool) and
+# concurrent ffmpeg conversions (CPU pool, None = number of cores)
+DOWNLOAD_WORKERS = 4
+TRANSCODE_WORKERS = None
+# yt-dlp retries of an interrupted download (resumed from its .part file)
+DOWNLOAD_RETRIES = 10
+# A converted track may be this much shorter than its source (seconds,
+# or 2%) before it is treated as truncated
+DURATION_TOLERANCE_SEC = 2.0
+# Downloaded track format ("mp3" or "m4a"; m4a sources are stream-copied)
+AUDIO_OUTPUT_FORMAT = "mp3"
+# Let ffmpeg read HTTP(S) audio streams directly instead of a temp file.
+# Streamed tracks skip the download but restart from zero when interrupted;
+# downloaded ones resume from their yt-dlp .part file
+STREAM_TO_FFMPEG = False
+# Converted songs shared across playlist folders, LRU-evicted over budget
+AUDIO_CACHE_ENABLED = True
+AUDIO_CACHE_DIR = PROJECT_ROOT / "output" / "audio" / "cache"
+AUDIO_CACHE_MAX_BYTES = 2 * 1024**3
+# Normalize_Loudness: two-pass EBU R128 targets, concurrent ffmpeg jobs
+# (None = number of cores) and measurements shared across playlists
+LOUDNESS_TARGET_LUFS = -14.0
+LOUDNESS_TRUE_PEAK_DB = -1.0
+LOUDNESS_RANGE_LU = 11.0
+LOUDNESS_SAMPLE_RATE = 44100
+LOUDNESS_WORKERS = None
+LOUDNESS_CACHE_PATH = AUDIO_CACHE_DIR / "loudness.db"
+# Concurrent YouTube Data API searches when resolving a playlist's links
+YOUTUBE_SEARCH_WORKERS = 8
+# Persistent (artist, track) / track_id -> YouTube video id cache
+VIDEO_ID_CACHE_ENABLED = True
+VIDEO_ID_CACHE_PATH = PROJECT_ROOT / "output" / "youtube_video_ids.db"
+VIDEO_ID_CACHE_TTL_SEC = 30 * 24 * 3600
+# YouTube Data API quota (units per day, per search, kept in reserve);
+# searches spill to at most YT_DLP_SEARCH_WORKERS concurrent yt-dlp searches
+YOUTUBE_DAILY_QUOTA_UNITS = 10000
+YOUTUBE_SEARCH_COST_UNITS = 100
+YOUTUBE_QUOTA_RESERVE_UNITS = 500
+# Per-container SQLite ledger, unless the YOUTUBE_QUOTA_BUCKET environment
+# variable names an S3 bucket shared by all Lambda containers
+YOUTUBE_QUOTA_LEDGER_PATH = PROJECT_ROOT / "output" / "youtube_quota.db"
+YT_DLP_SEARCH_WORKERS = 4
+SEARCH_LATENCY_WINDOW = 100
 
 
 # Corpus and Embedding Paths
-CORPUS_DIR = PROJECT_ROOT / "corpus" / "genius_corpus"
 CORPUS_METADATA_PATH = PROJECT_ROOT / "corpus" / "corpus_metadata.csv"
 EMBEDDINGS_DIR = PROJECT_ROOT / "corpus" / "embeddings"
 EMBEDDINGS_DB_PATH = PROJECT_ROOT / "corpus" / "embeddings" / "genius_corpus_db"
+# Vector store backend: "chroma" (persistent ChromaDB), "numpy"
+# (in-process, memory-mapped exact index exported from ChromaDB) or
+# "compressed" (PCA/int8 codes built from the numpy index)
+VECTOR_BACKEND = "chroma"
+NUMPY_INDEX_DIR = PROJECT_ROOT / "corpus" / "embeddings" / "numpy_index"
+NUMPY_INDEX_DTYPE = "float32"
+COMPRESSED_INDEX_DIR = PROJECT_ROOT / "corpus" / "embeddings" / "compressed_index"
+EMBEDDING_PCA_DIM = 256
+EMBEDDING_QUANTIZATION = "int8"
+# On Lambda, open the numpy/compressed index and the context store in place
+# (read-only, memory-mapped) with small writable overlays in /tmp instead of
+# copying them to /tmp on every cold start
+READ_ONLY_SERVING = True
+# Compressed candidates rescored exactly (0 = off). Rescoring recovers most of
+# the recall lost to compression but ships and maps a second copy of the
+# vectors: a float16 index in RESCORE_INDEX_DIR, half the float32 size
+RESCORE_CANDIDATES = 0
+RESCORE_INDEX_DIR = PROJECT_ROOT / "corpus" / "embeddings" / "rescore_index"
+CONTEXT_STORE_PATH = PROJECT_ROOT / "corpus" / "song_contexts.db"
+CORPUS_BUILD_MANIFEST_PATH = PROJECT_ROOT / "corpus" / "corpus_build_manifest.jsonl"
+CORPUS_WARMER_MANIFEST_PATH = PROJECT_ROOT / "corpus" / "corpus_warmer_manifest.jsonl"
+CORPUS_WARMER_BUDGET = 1000
+
+# Negative cache for songs Genius does not have
+NEGATIVE_CACHE_PATH = PROJECT_ROOT / "corpus" / "genius_negative_cache.db"
+NEGATIVE_CACHE_TTL_SEC = 30 * 24 * 3600
+
+# Refine: candidate pool handed from Filter to the hybrid scorer, and the
+# weights of its audio / semantic / popularity scores
+REFINE_CANDIDATE_POOL = 200
+HYBRID_WEIGHTS = {"audio": 0.4, "semantic": 0.5, "popularity": 0.1}
+# Seconds Refine may spend before skipping the LLM rerank (None = no budget)
+REFINE_LATENCY_BUDGET_SEC = None
+# LLM latency estimate: prior before the first call, then recent calls
+LLM_LATENCY_PRIOR_SEC = 8.0
+LLM_LATENCY_WINDOW = 20
+
+# Independent actions of a plan (e.g. the recommendation table and the
+# downloads) run concurrently on this many threads
+ACTION_WORKERS = 4
+
+# Warm Lambda containers re-read the API keys from Secrets Manager at most
+# this often (seconds), so rotated keys are picked up
+SECRETS_REFRESH_SEC = 15 * 60
+
+# Per-stage tracing of run_planning_agent (backend/core/tracing.py): spans
+# are exported as JSON lines ("jsonl"), to an OpenTelemetry collector over
+# OTLP/gRPC with the OpenTelemetry SDK ("otlp") or not at all (None); the
+# trace summary is kept anyway
+TRACE_EXPORTER = None
+TRACE_JSONL_PATH = PROJECT_ROOT / "output" / "traces.jsonl"
+TRACE_OTLP_ENDPOINT = "http://localhost:4317"
 
 # memory file
 MEMORY_FILE_PATH = PROJECT_ROOT / "core" / "conversation_memory.json"
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class ActionGraph:
+    def __init__(self, actions, specs):
+        """
+        Dependency graph of an ordered action list, compiled from the state
+        keys each action reads and writes. An action waits for the latest
+        earlier action writing one of its inputs, and for the earlier
+        actions reading or writing one of its outputs, so running the graph
+        gives the same result as running the list in order while
+        independent actions overlap.
+
+        Parameters:
+            actions (list of str): Ordered action names.
+            specs (dict): Action name -> {"inputs": keys read,
+                          "outputs": keys written,
+                          "outputs_if_missing": keys written only when no
+                          earlier action writes them}.
+        """
+        self.actions = list(actions)
+        self.dependencies = []
+
+        last_writer = {}
+        readers = defaultdict(list)
+        for index, action in enumerate(self.actions):
+            spec = specs[action]
+            inputs = spec.get("inputs", ())
+            outputs = list(spec.get("outputs", ())) + [
+                key
+                for key in spec.get("outputs_if_missing", ())
+                if key not in last_writer
+            ]
+
+            dependencies = {last_writer[key] for key in inputs if key in last_writer}
+            for key in outputs:
+                if key in last_writer:
+                    dependencies.add(last_writer[key])
+                dependencies.update(readers[key])
+            dependencies.discard(index)
+            self.dependencies.append(dependencies)
+
+            for key in inputs:
+                readers[key].append(index)
+            for key in outputs:
+                last_writer[key] = index
+                readers[key] = []
+
+    def run(self, run_action, max_workers=4):
+        """
+        Runs every action once its dependencies have completed, up to
+        `max_workers` at a time.
+
+        An action returning False (a failed precondition) or raising stops
+        the scheduling of further actions: its dependents are never started
+        and submitted actions still queued in the pool are cancelled. The
+        running ones finish first, then the exception is re-raised.
+
+        Parameters:
+            run_action (callable): run_action(index, action) -> bool.
+
+        Returns:
+            tuple: (True if every action ran, timings) where timings lists
+                   (action, start_sec, end_sec) relative to the start.
+        """
+        started = time.monotonic()
+        timings = []
+        timings_lock = threading.Lock()
+
+        def timed(index):
+            action_started = time.monotonic() - started
+            try:
+                return run_action(index, self.actions[index])
+            finally:
+                with timings_lock:
+                    timings.append(
+                        (
+                            self.actions[index],
+                            action_started,
+                            time.monotonic() - started,
+                        )
+                    )
+
+        pending = set(range(len(self.actions)))
+        completed = set()
+        running = {}
+        failed = False
+        error = None
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            while True:
+                if not failed and error is None:
+                    for index in sorted(pending):
+                        if self.dependencies[index] <= completed:
+                            pending.discard(index)
+                            running[pool.submit(timed, index)] = index
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = running.pop(future)
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    if ok:
+                        completed.add(index)
+                    else:
+                        failed = True
+
+                if failed or error is not None:
+                    for future in list(running):
+                        if future.cancel():
+                            pending.add(running.pop(future))
+
+        if pending:
+            skipped = ", ".join(self.actions[index] for index in sorted(pending))
+            print(f"Skipped after a failed action: {skipped}")
+        if error is not None:
+            raise error
+        timings.sort(key=lambda timing: timing[1])
+        return not failed and not pending, timings
+
+
+def print_action_timeline(timings):
+    """
+    Prints when each action ran; overlapping bars ran concurrently.
+    """
+    if not timings:
+        return
+    total = max(end for _, _, end in timings) or 1e-9
+    width = 40
+    print("\nAction timeline:")
+    for action, start, end in timings:
+        offset = min(int(width * start / total), width - 1)
+        length = max(1, min(int(width * (end - start) / total), width - offset))
+        print(
+            f"   {action:<28} {start:7.2f}s → {end:7.2f}s "
+            f"|{' ' * offset}{'#' * length}{' ' * (width - offset - length)}|"
+        )
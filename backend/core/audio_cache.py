@@ -0,0 +1,206 @@
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from backend import config
+
+
+class AudioCache:
+    def __init__(self, root=None, max_bytes=None):
+        """
+        Content-addressed store of converted audio files shared by all
+        playlist folders, keyed by Spotify track_id (or video id).
+
+        Stored files are linked into playlist folders (hardlink, else copy),
+        so a song is downloaded and converted once. Entries are evicted
+        least-recently-used first when the store exceeds `max_bytes`;
+        playlist files survive eviction.
+
+        Parameters:
+            root (str or Path): Store directory with an SQLite index.
+                                Defaults to config.AUDIO_CACHE_DIR
+                                (/tmp/audio_cache on Lambda).
+            max_bytes (int): Disk budget of the store.
+                             Defaults to config.AUDIO_CACHE_MAX_BYTES.
+        """
+        if root is None:
+            root = (
+                Path("/tmp") / "audio_cache"
+                if os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+                else config.AUDIO_CACHE_DIR
+            )
+        self.root = Path(root)
+        self.max_bytes = (
+            config.AUDIO_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(
+            str(self.root / "index.db"), check_same_thread=False
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS audio_cache ("
+            "key TEXT PRIMARY KEY, filename TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _path_for(self, key, suffix):
+        safe_key = re.sub(r"[^\w.-]", "_", key)
+        # keys usually carry the extension already ("<track_id>.mp3")
+        filename = safe_key if safe_key.endswith(suffix) else f"{safe_key}{suffix}"
+        return self.root / safe_key[:2] / filename
+
+    def get(self, key):
+        """
+        Returns the stored file of `key`, or None.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT filename, size FROM audio_cache WHERE key = ?", (key,)
+            ).fetchone()
+            path = self.root / row[0] if row else None
+            if path is not None and not path.exists():
+                self.conn.execute("DELETE FROM audio_cache WHERE key = ?", (key,))
+                path = None
+
+            if path is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_saved += row[1]
+                self.conn.execute(
+                    "UPDATE audio_cache SET last_access = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+            self.conn.commit()
+        return path
+
+    def add(self, key, source_path):
+        """
+        Stores a copy of `source_path` (hardlinked when possible) under `key`.
+        """
+        source_path = Path(source_path)
+        path = self._path_for(key, source_path.suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO audio_cache "
+                "(key, filename, size, last_access) VALUES (?, ?, ?, ?)",
+                (
+                    key,
+                    path.relative_to(self.root).as_posix(),
+                    path.stat().st_size,
+                    time.time(),
+                ),
+            )
+            self.conn.commit()
+        self.evict()
+        return path
+
+    @staticmethod
+    def link(path, destination):
+        """
+        Places `path` at `destination` as a hardlink, or a copy across
+        filesystems. Never a symlink: it would dangle once `path` is evicted.
+
+        Returns:
+            str: "hardlink" or "copy".
+        """
+        destination = Path(destination)
+        destination.unlink(missing_ok=True)
+        try:
+            os.link(path, destination)
+            return "hardlink"
+        except OSError:
+            shutil.copyfile(path, destination)
+            return "copy"
+
+    def link_into(self, key, destination):
+        """
+        Links the stored file of `key` to `destination`.
+
+        Returns:
+            bool: True on a cache hit.
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+        self.link(path, destination)
+        return True
+
+    def total_bytes(self):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM audio_cache"
+            ).fetchone()
+        return row[0]
+
+    def evict(self):
+        """
+        Removes least-recently-used entries until the store fits its budget.
+
+        Returns:
+            int: Number of evicted entries.
+        """
+        evicted = 0
+        with self._lock:
+            total = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM audio_cache"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+
+            rows = self.conn.execute(
+                "SELECT key, filename, size FROM audio_cache "
+                "ORDER BY last_access, rowid"
+            ).fetchall()
+            for key, filename, size in rows:
+                if total <= self.max_bytes:
+                    break
+                (self.root / filename).unlink(missing_ok=True)
+                self.conn.execute("DELETE FROM audio_cache WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            self.conn.commit()
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM audio_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "entries": entries[0],
+            "bytes": self.total_bytes(),
+        }
+
+    def report(self):
+        stats = self.stats()
+        print(
+            f"Audio cache: {stats['hits']}/{stats['lookups']} hits "
+            f"({stats['hit_rate']:.0%}), {stats['bytes_saved'] / 1e6:.1f} MB "
+            f"not downloaded again; {stats['entries']} songs, "
+            f"{stats['bytes'] / 1e6:.1f}/{self.max_bytes / 1e6:.0f} MB used."
+        )
@@ -0,0 +1,162 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.core import tracing
+
+_DONE = object()
+
+
+class DownloadPipeline:
+    def __init__(
+        self,
+        fetch,
+        transcode,
+        network_workers=4,
+        cpu_workers=None,
+        queue_size=None,
+    ):
+        """
+        Two-stage producer/consumer pipeline: a network pool fetches audio
+        sources into a bounded queue while a CPU pool transcodes what has
+        already arrived, so downloads and encodes overlap.
+
+        Parameters:
+            fetch (callable): fetch(job) -> source dict, {"path", "acodec",
+                              "duration"} for a downloaded file or {"url",
+                              "http_headers", "acodec", "duration"} for a
+                              stream, or None if there is nothing to
+                              transcode (e.g. already present).
+            transcode (callable): transcode(job, source), run by the CPU pool.
+            network_workers (int): Concurrent fetches.
+            cpu_workers (int): Concurrent transcodes.
+                               Defaults to the number of available cores.
+            queue_size (int): Fetched-but-not-transcoded items allowed to
+                              wait; fetchers block when the queue is full.
+                              Defaults to 2 * cpu_workers.
+        """
+        self.fetch = fetch
+        self.transcode = transcode
+        self.network_workers = max(1, network_workers)
+        self.cpu_workers = max(1, cpu_workers or os.cpu_count() or 1)
+        self.queue_size = queue_size or 2 * self.cpu_workers
+        self._lock = threading.Lock()
+
+    def _record(self, stats, stage, seconds):
+        with self._lock:
+            stage_stats = stats[stage]
+            stage_stats["jobs"] += 1
+            stage_stats["busy_sec"] += seconds
+            stage_stats["max_sec"] = max(stage_stats["max_sec"], seconds)
+
+    def _fail(self, results, job, stage, error):
+        with self._lock:
+            results.append((job, stage, error))
+
+    def run(self, jobs):
+        """
+        Runs every job through both stages. A job failing in one stage is
+        recorded and does not stop the others.
+
+        Returns:
+            dict: 'elapsed_sec', per-stage 'fetch' and 'transcode' stats
+                  (jobs, busy_sec, max_sec), 'queue_wait_sec' (time fetched
+                  items waited for a CPU worker), 'backpressure_sec' (time
+                  fetchers were blocked on a full queue), 'transcoded',
+                  'skipped' and 'failures' as (job, stage, error) tuples.
+        """
+        jobs = list(jobs)
+        stats = {
+            "fetch": {"jobs": 0, "busy_sec": 0.0, "max_sec": 0.0},
+            "transcode": {"jobs": 0, "busy_sec": 0.0, "max_sec": 0.0},
+            "queue_wait_sec": 0.0,
+            "backpressure_sec": 0.0,
+            "transcoded": 0,
+            "skipped": 0,
+        }
+        failures = []
+        fetched = queue.Queue(maxsize=self.queue_size)
+        started = time.monotonic()
+
+        def fetch_one(job):
+            fetch_started = time.monotonic()
+            try:
+                source = self.fetch(job)
+            except Exception as e:
+                self._fail(failures, job, "fetch", e)
+                return
+            finally:
+                self._record(stats, "fetch", time.monotonic() - fetch_started)
+
+            if source is None:
+                with self._lock:
+                    stats["skipped"] += 1
+                return
+
+            put_started = time.monotonic()
+            fetched.put((job, source, time.monotonic()))
+            with self._lock:
+                stats["backpressure_sec"] += time.monotonic() - put_started
+
+        def transcode_worker():
+            while True:
+                item = fetched.get()
+                if item is _DONE:
+                    return
+                job, source, queued_at = item
+                transcode_started = time.monotonic()
+                with self._lock:
+                    stats["queue_wait_sec"] += transcode_started - queued_at
+                try:
+                    self.transcode(job, source)
+                    with self._lock:
+                        stats["transcoded"] += 1
+                except Exception as e:
+                    self._fail(failures, job, "transcode", e)
+                finally:
+                    self._record(
+                        stats, "transcode", time.monotonic() - transcode_started
+                    )
+
+        consumers = [
+            threading.Thread(target=tracing.propagate(transcode_worker), daemon=True)
+            for _ in range(self.cpu_workers)
+        ]
+        for consumer in consumers:
+            consumer.start()
+
+        with ThreadPoolExecutor(max_workers=self.network_workers) as network_pool:
+            list(network_pool.map(tracing.propagate(fetch_one), jobs))
+
+        for _ in consumers:
+            fetched.put(_DONE)
+        for consumer in consumers:
+            consumer.join()
+
+        stats["failures"] = failures
+        stats["elapsed_sec"] = time.monotonic() - started
+        return stats
+
+
+def print_pipeline_report(stats):
+    """
+    Prints the per-stage timings of a DownloadPipeline run.
+    """
+    print(
+        f"Pipeline finished in {stats['elapsed_sec']:.1f}s "
+        f"({stats['transcoded']} transcoded, {stats['skipped']} skipped, "
+        f"{len(stats['failures'])} failed)."
+    )
+    for stage in ("fetch", "transcode"):
+        stage_stats = stats[stage]
+        print(
+            f"   {stage:<10} {stage_stats['jobs']} jobs, "
+            f"{stage_stats['busy_sec']:.1f}s busy, "
+            f"slowest {stage_stats['max_sec']:.1f}s"
+        )
+    print(
+        f"   queue wait {stats['queue_wait_sec']:.1f}s, "
+        f"backpressure {stats['backpressure_sec']:.1f}s"
+    )
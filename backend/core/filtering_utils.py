@@ -1,5 +1,7 @@
 import pandas as pd
 
+from backend import config
+
 
 def filtering_logic(params_explicit, dataset, top_n=10):
     margins = {
@@ -81,7 +83,9 @@ def filtering_logic(params_explicit, dataset, top_n=10):
     return filtered_tracks.head(top_n)
 
 
-def filter_tracks_by_audio_params(dataset, params, folder_name, num_tracks=10):
+def filter_tracks_by_audio_params(
+    dataset, params, folder_name, num_tracks=10, num_shown=None
+):
     """
     Filters tracks from the Kaggle dataset based on numeric audio parameters
     derived from user input.
@@ -93,6 +97,10 @@ def filter_tracks_by_audio_params(dataset, params, folder_name, num_tracks=10):
             from this filtering step.
         num_tracks (int, optional, default=10):
             Maximum number of tracks to retrieve from numeric filtering.
+        num_shown (int, optional):
+            Tracks listed in the output, e.g. the playlist length when a
+            wider candidate pool is retrieved for Refine (the whole pool
+            is listed with config.VERBOSE). Defaults to num_tracks.
     Returns:
         pd.DataFrame:
             DataFrame containing tracks that match numeric filtering criteria,
@@ -112,8 +120,17 @@ def filter_tracks_by_audio_params(dataset, params, folder_name, num_tracks=10):
     unique_tracks_count = (
         filtered_tracks[["track_name", "artists"]].drop_duplicates().shape[0]
     )
-    print(f"\n {unique_tracks_count} Selected Tracks :")
-    for idx, row in filtered_tracks.iterrows():
+    shown_tracks = filtered_tracks
+    if num_shown is not None and not config.VERBOSE:
+        shown_tracks = filtered_tracks.head(num_shown)
+    if len(shown_tracks) < len(filtered_tracks):
+        print(
+            f"\n {unique_tracks_count} Selected Tracks "
+            f"(top {len(shown_tracks)} by popularity):"
+        )
+    else:
+        print(f"\n {unique_tracks_count} Selected Tracks :")
+    for idx, row in shown_tracks.iterrows():
         print(f"    -{idx} {row['track_name']} – {row['artists']}")
         # print(f"   • Tempo: {row['tempo']}")
         # print(f"   • Energy: {row['energy']}")
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from backend import config
+
+# Value ranges of the Analyze audio parameters, used to normalize distances
+FEATURE_RANGES = {
+    "tempo": (0, 200),
+    "energy": (0, 1),
+    "danceability": (0, 1),
+    "valence": (0, 1),
+    "loudness": (-60, 0),
+    "speechiness": (0, 1),
+    "instrumentalness": (0, 1),
+    "acousticness": (0, 1),
+    "liveness": (0, 1),
+}
+
+
+class HybridScorer:
+    def __init__(self, weights=None):
+        """
+        Scores a candidate pool in one vectorized pass as a weighted sum of:
+            - audio: 1 - mean normalized distance of the audio features to
+                     the midpoints of the Analyze parameter ranges,
+            - semantic: prompt/song embedding similarity, min-max scaled
+                        over the pool (songs without an embedding get the
+                        pool median, i.e. a neutral score),
+            - popularity: Spotify popularity / 100.
+
+        Parameters:
+            weights (dict): Weights of "audio", "semantic" and "popularity".
+                            Defaults to config.HYBRID_WEIGHTS.
+        """
+        self.weights = dict(config.HYBRID_WEIGHTS if weights is None else weights)
+
+    @staticmethod
+    def audio_scores(tracks, params):
+        distances = []
+        for feature, (low, high) in FEATURE_RANGES.items():
+            target = (params or {}).get(feature)
+            if feature not in tracks or not isinstance(target, (list, tuple)):
+                continue
+            midpoint = (target[0] + target[1]) / 2
+            values = tracks[feature].to_numpy(dtype=np.float64)
+            distances.append(np.abs(values - midpoint) / (high - low))
+
+        if not distances:
+            return np.ones(len(tracks))
+        return 1.0 - np.clip(np.mean(distances, axis=0), 0.0, 1.0)
+
+    @staticmethod
+    def semantic_scores(similarities):
+        similarities = np.asarray(similarities, dtype=np.float64)
+        known = ~np.isnan(similarities)
+        if not known.any():
+            return np.full(len(similarities), 0.5)
+
+        low, high = similarities[known].min(), similarities[known].max()
+        scores = np.full(len(similarities), 0.5)
+        if high > low:
+            scores[known] = (similarities[known] - low) / (high - low)
+            scores[~known] = np.median(scores[known])
+        return scores
+
+    def score(self, tracks, params, similarities=None):
+        """
+        Adds 'audio_score', 'semantic_score', 'popularity_score' and
+        'hybrid_score' columns to a copy of `tracks`.
+
+        Parameters:
+            tracks (pd.DataFrame): Candidate pool with audio feature columns.
+            params (dict): Analyze output, feature -> [min, max].
+            similarities (array-like): Cosine similarity per track, NaN for
+                                       tracks without an embedding.
+        """
+        if similarities is None:
+            similarities = np.full(len(tracks), np.nan)
+
+        scored = tracks.copy()
+        scored["audio_score"] = self.audio_scores(tracks, params)
+        scored["semantic_score"] = self.semantic_scores(similarities)
+        scored["popularity_score"] = (
+            tracks["popularity"].to_numpy(dtype=np.float64) / 100
+            if "popularity" in tracks
+            else 0.0
+        )
+        scored["hybrid_score"] = (
+            self.weights.get("audio", 0) * scored["audio_score"]
+            + self.weights.get("semantic", 0) * scored["semantic_score"]
+            + self.weights.get("popularity", 0) * scored["popularity_score"]
+        )
+        return scored
+
+    def top_n(self, tracks, params, similarities=None, n=10):
+        """
+        Returns the `n` best-scoring tracks, best first.
+        """
+        if tracks.empty:
+            return pd.DataFrame([])
+
+        scored = self.score(tracks, params, similarities)
+        scores = scored["hybrid_score"].to_numpy()
+        n = min(n, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return scored.iloc[top].reset_index(drop=True)
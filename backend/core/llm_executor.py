@@ -1,5 +1,8 @@
 import json
 import os
+import threading
+import time
+from collections import deque
 
 from dotenv import load_dotenv
 from langchain.chains import ConversationChain
@@ -9,6 +12,9 @@ from langchain.memory import ConversationBufferMemory
 from langchain_openai import ChatOpenAI
 from openai import OpenAI
 
+from backend import config
+from backend.core import tracing
+
 
 class LLMExecutor:
     def __init__(self, model_name="gpt-3.5-turbo", temperature=0.2, open_ai_key=None):
@@ -23,7 +29,43 @@ class LLMExecutor:
         self.model_name = model_name
         self.temperature = temperature
 
-    def execute(self, messages):
+        # call kind -> rolling window of recent successful call latencies
+        # (seconds); planning, structuring and rerank prompts differ in size
+        self.latencies = {}
+        self._latency_lock = threading.Lock()
+
+    def record_latency(self, kind, seconds):
+        with self._latency_lock:
+            self.latencies.setdefault(
+                kind, deque(maxlen=config.LLM_LATENCY_WINDOW)
+            ).append(seconds)
+
+    def estimated_latency(self, kind="default", percentile=90):
+        """
+        Estimated duration of the next LLM call of `kind`: a high percentile
+        of the recent successful calls of that kind, or
+        config.LLM_LATENCY_PRIOR_SEC before any such call succeeded.
+        """
+        with self._latency_lock:
+            latencies = sorted(self.latencies.get(kind, ()))
+        if not latencies:
+            return config.LLM_LATENCY_PRIOR_SEC
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+        return latencies[index]
+
+    def execute(self, messages, kind="default"):
+        """
+        Sends `messages` to the chat model.
+
+        Parameters:
+            kind (str): Call kind, e.g. "planning" or "rerank". Latencies are
+                        tracked per kind (see estimated_latency).
+
+        Returns:
+            dict or list or str or None: The parsed JSON reply, else the raw
+                                         text; None if the call failed.
+        """
+        started = time.monotonic()
         try:
             openai_messages = [
                 {
@@ -33,11 +75,22 @@ class LLMExecutor:
                 for msg in messages
             ]
 
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=openai_messages,
-                temperature=self.temperature,
-            )
+            with tracing.span(
+                "openai.chat", kind="client", model=self.model_name
+            ) as span:
+                response = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=openai_messages,
+                    temperature=self.temperature,
+                )
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    span.set_attributes(
+                        prompt_tokens=usage.prompt_tokens,
+                        completion_tokens=usage.completion_tokens,
+                    )
+            # failed calls return early and would drag the estimate down
+            self.record_latency(kind, time.monotonic() - started)
 
             content = response.choices[0].message.content.strip()
 
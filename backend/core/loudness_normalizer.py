@@ -0,0 +1,329 @@
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from backend import config
+from backend.core import tracing
+from backend.core.track_downloader import AUDIO_FORMATS
+
+MEASURED_FIELDS = ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")
+
+
+def file_digest(path):
+    """
+    Content hash of an audio file, so measurements follow the audio and
+    not its (playlist-specific) file name.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_loudnorm_output(stderr):
+    """
+    Returns the measurement printed by ffmpeg's loudnorm filter
+    (print_format=json) at the end of its log.
+    """
+    start = stderr.rfind("{")
+    end = stderr.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No loudnorm measurement in ffmpeg output.")
+    measured = json.loads(stderr[start : end + 1])
+    return {field: float(measured[field]) for field in MEASURED_FIELDS}
+
+
+def loudnorm_target(target):
+    return f"I={target['integrated']}:TP={target['true_peak']}:LRA={target['range']}"
+
+
+def measure_loudness(ffmpeg_path, path, target):
+    """
+    First loudnorm pass: analyzes `path` without writing any audio.
+    """
+    result = subprocess.run(
+        [
+            str(ffmpeg_path),
+            "-nostdin",
+            "-hide_banner",
+            "-i",
+            str(path),
+            "-af",
+            f"loudnorm={loudnorm_target(target)}:print_format=json",
+            "-f",
+            "null",
+            "-",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return parse_loudnorm_output(result.stderr)
+
+
+def apply_loudnorm(ffmpeg_path, path, measured, target):
+    """
+    Second loudnorm pass: rewrites `path` with the linear gain derived from
+    the first-pass measurement. The file is replaced atomically.
+    """
+    path = Path(path)
+    encoder = AUDIO_FORMATS.get(path.suffix.lstrip("."), {}).get("encoder", [])
+    tmp_path = path.with_name(f"{path.stem}.loudnorm{path.suffix}")
+    loudnorm = (
+        f"loudnorm={loudnorm_target(target)}"
+        f":measured_I={measured['input_i']}"
+        f":measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}"
+        f":measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}"
+        ":linear=true:print_format=summary"
+    )
+    try:
+        subprocess.run(
+            [
+                str(ffmpeg_path),
+                "-nostdin",
+                "-i",
+                str(path),
+                "-vn",
+                "-af",
+                loudnorm,
+                # loudnorm works at 192 kHz internally
+                "-ar",
+                str(config.LOUDNESS_SAMPLE_RATE),
+                *encoder,
+                "-y",
+                str(tmp_path),
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+
+
+def normalize_one(ffmpeg_path, path, target, measured=None):
+    """
+    Normalizes one file (worker of the process pool), measuring it first
+    unless a cached measurement is given.
+
+    Returns:
+        tuple: (measurement of the source, digest of the normalized file)
+    """
+    if measured is None:
+        measured = measure_loudness(ffmpeg_path, path, target)
+    apply_loudnorm(ffmpeg_path, path, measured, target)
+    return measured, file_digest(path)
+
+
+class LoudnessCache:
+    def __init__(self, db_path=None):
+        """
+        Loudness measurements keyed by audio content digest and target,
+        shared by all playlist folders next to the AudioCache. A file
+        already normalized to the target is recorded as such and skipped.
+
+        Parameters:
+            db_path (str or Path): SQLite file.
+                                   Defaults to config.LOUDNESS_CACHE_PATH
+                                   (/tmp on Lambda).
+        """
+        if db_path is None:
+            db_path = (
+                Path("/tmp") / config.LOUDNESS_CACHE_PATH.name
+                if os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+                else config.LOUDNESS_CACHE_PATH
+            )
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS loudness ("
+            "digest TEXT, target TEXT, measured TEXT, normalized INTEGER, "
+            "PRIMARY KEY (digest, target))"
+        )
+        self.conn.commit()
+
+    def get(self, digest, target):
+        """
+        Returns (measurement or None, normalized flag) of a file digest.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT measured, normalized FROM loudness "
+                "WHERE digest = ? AND target = ?",
+                (digest, loudnorm_target(target)),
+            ).fetchone()
+        if row is None:
+            return None, False
+        return (json.loads(row[0]) if row[0] else None), bool(row[1])
+
+    def put(self, digest, target, measured=None, normalized=False):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO loudness "
+                "(digest, target, measured, normalized) VALUES (?, ?, ?, ?)",
+                (
+                    digest,
+                    loudnorm_target(target),
+                    json.dumps(measured) if measured else None,
+                    int(normalized),
+                ),
+            )
+            self.conn.commit()
+
+
+class LoudnessNormalizer:
+    def __init__(self, ffmpeg_path=None, cache=None, max_workers=None, target=None):
+        """
+        Two-pass EBU R128 loudness normalization (ffmpeg loudnorm) of the
+        downloaded playlists, one ffmpeg job per core.
+
+        Parameters:
+            ffmpeg_path (str or Path): Defaults to config.FFMPEG_PATH.
+            cache (LoudnessCache): Measurements shared across playlists.
+            max_workers (int): Concurrent files. Defaults to
+                               config.LOUDNESS_WORKERS (None = cores).
+            target (dict): 'integrated' LUFS, 'true_peak' dBTP and 'range'
+                           LU. Defaults to the config.LOUDNESS_* values.
+        """
+        self.ffmpeg_path = config.FFMPEG_PATH if ffmpeg_path is None else ffmpeg_path
+        self.TRACKS_DIR = config.TRACKS_DIR
+        self.cache = LoudnessCache() if cache is None else cache
+        self.max_workers = max(
+            1, max_workers or config.LOUDNESS_WORKERS or os.cpu_count() or 1
+        )
+        self.target = target or {
+            "integrated": config.LOUDNESS_TARGET_LUFS,
+            "true_peak": config.LOUDNESS_TRUE_PEAK_DB,
+            "range": config.LOUDNESS_RANGE_LU,
+        }
+
+    def _executor(self):
+        # Lambda has no /dev/shm for multiprocessing; ffmpeg runs in its
+        # own process either way
+        if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+            return ThreadPoolExecutor(max_workers=self.max_workers)
+        return ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def normalize_files(self, paths):
+        """
+        Normalizes `paths` in place. Files already normalized to the target
+        are skipped; files measured before only run the second pass.
+
+        Returns:
+            dict: 'total', 'normalized', 'measure_cached', 'skipped',
+                  'failed' counts, 'failures' (file name, error) and
+                  'elapsed_sec'.
+        """
+        started = time.monotonic()
+        summary = {
+            "total": 0,
+            "normalized": 0,
+            "measure_cached": 0,
+            "skipped": 0,
+            "failed": 0,
+            "failures": [],
+        }
+
+        pending = []
+        for path in map(Path, paths):
+            summary["total"] += 1
+            digest = file_digest(path)
+            measured, normalized = self.cache.get(digest, self.target)
+            if normalized:
+                summary["skipped"] += 1
+                continue
+            if measured is not None:
+                summary["measure_cached"] += 1
+            pending.append((path, digest, measured))
+
+        def record(path, digest, measured, normalized_digest):
+            self.cache.put(digest, self.target, measured)
+            self.cache.put(normalized_digest, self.target, normalized=True)
+            summary["normalized"] += 1
+            print(f"Normalized loudness: {path.name}")
+
+        def fail(path, error):
+            print(f"Failed to normalize '{path.name}': {error}")
+            summary["failed"] += 1
+            summary["failures"].append((path.name, str(error)))
+
+        # the ffmpeg passes may run in worker processes, so they are traced
+        # as one span
+        with tracing.span("ffmpeg.loudnorm", kind="client", files=len(pending)) as span:
+            if self.max_workers == 1 or len(pending) <= 1:
+                for path, digest, measured in pending:
+                    try:
+                        result = normalize_one(
+                            self.ffmpeg_path, path, self.target, measured
+                        )
+                    except Exception as e:
+                        fail(path, e)
+                        continue
+                    record(path, digest, *result)
+            elif pending:
+                with self._executor() as pool:
+                    futures = [
+                        (
+                            path,
+                            digest,
+                            pool.submit(
+                                normalize_one,
+                                self.ffmpeg_path,
+                                path,
+                                self.target,
+                                measured,
+                            ),
+                        )
+                        for path, digest, measured in pending
+                    ]
+                    for path, digest, future in futures:
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            fail(path, e)
+                            continue
+                        record(path, digest, *result)
+            span.set_attributes(failed=summary["failed"])
+
+        summary["failures"].sort()
+        summary["elapsed_sec"] = time.monotonic() - started
+        return summary
+
+    def normalize_playlist(self, folder_name):
+        """
+        Normalizes the loudness of a playlist downloaded by
+        Retrieve_and_Convert (config.TRACKS_DIR / folder_name).
+        """
+        folder_path = Path(self.TRACKS_DIR) / folder_name
+        paths = sorted(folder_path.glob(f"*.{config.AUDIO_OUTPUT_FORMAT}"))
+
+        # for CI/CD tests (GitActions): the downloaded files are dummies
+        if os.getenv("GITHUB_ACTIONS") == "true":
+            print("Skipping loudness normalization in GitHub Actions.")
+            return None
+        print(
+            f"\nNormalizing loudness of {len(paths)} tracks in '{folder_path}' "
+            f"to {self.target['integrated']} LUFS..."
+        )
+        summary = self.normalize_files(paths)
+        print(
+            f"\nLoudness normalization finished in {summary['elapsed_sec']:.1f}s: "
+            f"{summary['normalized']} normalized ({summary['measure_cached']} "
+            f"with cached measurements), {summary['skipped']} already "
+            f"normalized, {summary['failed']} failed (of {summary['total']})."
+        )
+        return summary
@@ -0,0 +1,121 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from backend import config
+from backend.core.song_utils import normalize_track_key
+
+
+class NegativeCache:
+    def __init__(self, db_path=None, ttl_sec=None):
+        """
+        Persistent cache of (artist, track) pairs Genius has no match for.
+
+        Parameters:
+            db_path (str or Path): SQLite file holding the cache entries.
+                                   Defaults to config.NEGATIVE_CACHE_PATH
+                                   (or a /tmp copy of it on Lambda).
+            ttl_sec (int): Seconds an entry stays valid before the song is
+                           looked up on Genius again.
+        """
+        if db_path is None:
+            db_path = self._default_db_path()
+        self.db_path = Path(db_path)
+        self.ttl_sec = config.NEGATIVE_CACHE_TTL_SEC if ttl_sec is None else ttl_sec
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS negative_cache ("
+            "key TEXT PRIMARY KEY, artist TEXT, track_name TEXT, "
+            "reason TEXT, created_at REAL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _default_db_path():
+        if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+            return config.NEGATIVE_CACHE_PATH
+
+        # Lambda: seed the writable /tmp copy from the cache shipped in the image
+        lambda_db_path = Path("/tmp") / config.NEGATIVE_CACHE_PATH.name
+        if not lambda_db_path.exists() and config.NEGATIVE_CACHE_PATH.exists():
+            shutil.copyfile(config.NEGATIVE_CACHE_PATH, lambda_db_path)
+        return lambda_db_path
+
+    @staticmethod
+    def make_key(artist, track_name):
+        return " - ".join(normalize_track_key(artist, track_name))
+
+    def contains(self, artist, track_name):
+        """
+        Returns True if the song is a known, non-expired Genius miss.
+        Every call is counted towards the hit rate.
+        """
+        key = self.make_key(artist, track_name)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT created_at FROM negative_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and time.time() - row[0] < self.ttl_sec:
+                self.hits += 1
+                return True
+
+            self.misses += 1
+            return False
+
+    def add(self, artist, track_name, reason="not_found"):
+        key = self.make_key(artist, track_name)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO negative_cache "
+                "(key, artist, track_name, reason, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, artist, track_name, reason, time.time()),
+            )
+            self.conn.commit()
+
+    def remove(self, artist, track_name):
+        key = self.make_key(artist, track_name)
+        with self._lock:
+            self.conn.execute("DELETE FROM negative_cache WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM negative_cache WHERE created_at <= ?",
+                (time.time() - self.ttl_sec,),
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute(
+                "SELECT COUNT(*) FROM negative_cache"
+            ).fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def report(self):
+        stats = self.stats()
+        print(
+            f"Genius negative cache: {stats['hits']}/{stats['lookups']} hits "
+            f"({stats['hit_rate']:.0%}), {stats['entries']} songs cached."
+        )
+        return stats
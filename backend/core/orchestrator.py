@@ -1,11 +1,15 @@
+import copy
 import warnings
 
 from dotenv import load_dotenv
 from langchain_core._api.deprecation import LangChainDeprecationWarning
 
 from backend import config
+from backend.core import tracing
+from backend.core.action_graph import ActionGraph, print_action_timeline
 from backend.core.filtering_utils import filter_tracks_by_audio_params
 from backend.core.llm_executor import LLMExecutor
+from backend.core.loudness_normalizer import LoudnessNormalizer
 from backend.core.memory_manager import MemoryManager
 from backend.core.output_parser import OutputParser
 from backend.core.playlist_utils import YouTubeSearcher
@@ -22,6 +26,30 @@ warnings.filterwarnings("ignore", category=LangChainDeprecationWarning)
 
 load_dotenv()
 
+# State read and written by each action of action_mapping; execute_actions
+# compiles the action list into a dependency graph from these
+ACTION_SPECS = {
+    "Analyze": {"inputs": ("user_prompt",), "outputs": ("params", "folder_name")},
+    "Filter": {"inputs": ("params", "folder_name"), "outputs": ("tracks",)},
+    "Refine": {
+        "inputs": ("tracks", "folder_name", "params"),
+        "outputs": ("tracks", "folder_name", "refine_degraded"),
+    },
+    "Create_Recommendation_Table": {
+        "inputs": ("tracks", "folder_name", "refine_degraded"),
+        "outputs": ("playlist",),
+    },
+    # parses the tracks from the user's prompt when nothing produced them
+    "Retrieve_and_Convert": {
+        "inputs": ("tracks", "folder_name"),
+        "outputs": ("downloaded",),
+        "outputs_if_missing": ("tracks", "folder_name"),
+    },
+    "Normalize_Loudness": {"inputs": ("downloaded", "folder_name")},
+    # summarizes the final playlist, after the table and downloads
+    "Summarize": {"inputs": ("tracks", "playlist", "downloaded")},
+}
+
 
 class Orchestrator:
     def __init__(
@@ -30,13 +58,22 @@ class Orchestrator:
         genius_api_key=None,
         youtube_api_key=None,
         clear_memory=None,
+        dataset=None,
     ):
+        """
+        Parameters:
+            clear_memory (bool): Default of run_planning_agent's clear_memory.
+            dataset (pd.DataFrame): Already loaded track dataset, e.g. kept
+                                    by a warm Lambda container. Loaded with
+                                    ExtractFile if omitted.
+        """
         self.clear_memory = clear_memory
         self.llm_executor = LLMExecutor(open_ai_key=open_ai_key)
         self.prompt_engineer = PromptEngineer()
         self.parser = OutputParser()
         self.downloader = TrackDownloader()
-        self.dataset = ExtractFile().load_data()
+        self.loudness_normalizer = LoudnessNormalizer()
+        self.dataset = ExtractFile().load_data() if dataset is None else dataset
         self.filter_tracks_by_audio_params = filter_tracks_by_audio_params
         self.prompt_to_audio_params = prompt_to_audio_params
         self.semantic_refiner = RAGSemanticRefiner(
@@ -46,6 +83,8 @@ class Orchestrator:
         )
         self.memory = None
         self.existing_summary = None
+        self.last_action_timings = []
+        self.last_trace = None
 
         # memory
         self.memory_manager = MemoryManager()
@@ -63,22 +102,51 @@ class Orchestrator:
             "Filter": self.filter_tracks_by_audio_params,
             "Refine": self.semantic_refiner.hybrid_refine_tracks,
             "Retrieve_and_Convert": self.downloader.retrieve_and_convert,
+            "Normalize_Loudness": self.loudness_normalizer.normalize_playlist,
             "Create_Recommendation_Table": self.create_recommendation_table,
             "Summarize": self.summarize_results,
         }
 
-    def run_planning_agent(self, user_prompt, num_tracks=20):
+    def run_planning_agent(
+        self, user_prompt, num_tracks=20, on_progress=None, clear_memory=None
+    ):
+        """
+        Plans and executes the actions for `user_prompt`.
+
+        Each stage and outbound call is traced (see backend.core.tracing);
+        the finished trace is kept in `last_trace`.
 
+        Parameters:
+            clear_memory (bool): Per-request memory reset, so one orchestrator
+                                 can serve several requests. Defaults to the
+                                 constructor's clear_memory.
+        """
+        if clear_memory is None:
+            clear_memory = self.clear_memory
+
+        with tracing.trace("run_planning_agent", num_tracks=num_tracks) as root:
+            try:
+                return self._run_planning_agent(
+                    user_prompt, num_tracks, on_progress, clear_memory
+                )
+            finally:
+                self.last_trace = root
+
+    def _run_planning_agent(self, user_prompt, num_tracks, on_progress, clear_memory):
         print("\n\n" + "#" * 100)
         print(
             "### Step 1: Loading existing memory (if available) "
             "and constructing the combined prompt:"
         )
-        # Initialize memory
-        self.memory_manager.initialize_memory(clear_memory=self.clear_memory)
+        with tracing.span("memory.load") as span:
+            # Initialize memory
+            self.memory_manager.initialize_memory(clear_memory=clear_memory)
 
-        # Create refined prompt using memory context
-        prompt_with_memory = self.memory_manager.create_prompt_with_memory(user_prompt)
+            # Create refined prompt using memory context
+            prompt_with_memory = self.memory_manager.create_prompt_with_memory(
+                user_prompt
+            )
+            span.set_attributes(with_memory=prompt_with_memory != user_prompt)
 
         # Planning
         print("\n\n" + "#" * 100)
@@ -86,11 +154,16 @@ class Orchestrator:
             "### Step 2: LLM is analyzing user request and generating the "
             "textual plan of actions...:"
         )
-        planning_prompt = self.prompt_engineer.construct_planning_prompt(
-            prompt_with_memory
-        )
-        messages_plan = planning_prompt.format_messages(user_prompt=prompt_with_memory)
-        textual_action_plan = self.llm_executor.execute(messages_plan)
+        with tracing.span("planning"):
+            planning_prompt = self.prompt_engineer.construct_planning_prompt(
+                prompt_with_memory
+            )
+            messages_plan = planning_prompt.format_messages(
+                user_prompt=prompt_with_memory
+            )
+            textual_action_plan = self.llm_executor.execute(
+                messages_plan, kind="planning"
+            )
 
         if textual_action_plan is None:
             raise ValueError(
@@ -104,34 +177,48 @@ class Orchestrator:
             "### Step 3: LLM is converting textual plan of actions "
             "to the structured one..."
         )
-        structuring_prompt = self.prompt_engineer.construct_action_structuring_prompt(
-            textual_action_plan
-        )
-        messages_structured = structuring_prompt.format_messages(
-            explicit_plan=textual_action_plan
-        )
-        structured_actions_json = self.llm_executor.execute(messages_structured)
-
-        if structured_actions_json is None or "actions" not in structured_actions_json:
-            raise ValueError(
-                "LLM returned None or invalid response during structuring "
-                "actions step."
+        with tracing.span("structuring") as span:
+            structuring_prompt = (
+                self.prompt_engineer.construct_action_structuring_prompt(
+                    textual_action_plan
+                )
+            )
+            messages_structured = structuring_prompt.format_messages(
+                explicit_plan=textual_action_plan
+            )
+            structured_actions_json = self.llm_executor.execute(
+                messages_structured, kind="structuring"
             )
 
-        actions_list = structured_actions_json["actions"]
+            if (
+                structured_actions_json is None
+                or "actions" not in structured_actions_json
+            ):
+                raise ValueError(
+                    "LLM returned None or invalid response during structuring "
+                    "actions step."
+                )
+
+            actions_list = structured_actions_json["actions"]
+            span.set_attributes(actions=len(actions_list))
         print("\nStructured Plan of Actions:\n", structured_actions_json)
 
         print("\n\n" + "#" * 100)
         print("### Step 4: Executing actions...")
 
-        playlist = self.execute_actions(actions_list, prompt_with_memory, num_tracks)
+        playlist = self.execute_actions(
+            actions_list, prompt_with_memory, num_tracks, on_progress=on_progress
+        )
 
         # update memory
-        self.memory_manager.update_memory(user_prompt)
+        with tracing.span("memory.update"):
+            self.memory_manager.update_memory(user_prompt)
 
         return playlist
 
-    def execute_actions(self, actions_list, user_prompt, num_tracks=20):
+    def execute_actions(
+        self, actions_list, user_prompt, num_tracks=20, on_progress=None
+    ):
         """
         Executes a structured list of actions generated by the
         LLM-based planning workflow.
@@ -148,6 +235,8 @@ class Orchestrator:
                                  Artist names, Track names, and Official YouTube links.
             - "Retrieve_and_Convert": Downloads tracks from YouTube and
                                       converts them to MP3.
+            - "Normalize_Loudness": Normalizes the loudness of the
+                                    downloaded tracks (EBU R128).
             - "Summarize": Summarizes and displays the
                            final playlist results.
 
@@ -161,66 +250,156 @@ class Orchestrator:
             num_tracks (int, optional, default=10):
                 Maximum number of tracks.
 
-        Returns:
-            None:
-        """
-        playlist = None
-        params = folder_name = tracks = None
+            on_progress (callable, optional):
+                Receives the partial playlist JSON each time a track's
+                YouTube link resolves in "Create_Recommendation_Table".
 
-        for i_a, action in enumerate(actions_list):
-            print("\n" + "-" * 50)
-            print(f"Action # {i_a + 1}. {action}")
+        Actions run as a dependency graph of the state they read and write
+        (ACTION_SPECS): an action starts once the earlier actions it depends
+        on are done, so e.g. the recommendation table and the downloads
+        overlap. The first failing action stops the remaining ones.
 
-            # Check  frontend_old mode
-            if config.FRONTEND_MODE and action == "Retrieve_and_Convert":
-                print("Skipping 'Retrieve_and_Convert' due to FRONTEND_MODE=True.")
+        Returns:
+            dict: The playlist JSON of "Create_Recommendation_Table", or None.
+        """
+        state = {
+            "user_prompt": user_prompt,
+            "params": None,
+            "folder_name": None,
+            "tracks": None,
+            "playlist": None,
+            "refine_degraded": None,
+            "downloaded": False,
+        }
+        # each track is searched on YouTube once per request, then shared by
+        # the recommendation table, the downloads and the summary
+        resolver = self.YouTubeSearcher.new_resolver()
+
+        # Check  frontend_old mode
+        actions = []
+        for action in actions_list:
+            if config.FRONTEND_MODE and action in (
+                "Retrieve_and_Convert",
+                "Normalize_Loudness",
+            ):
+                print(f"Skipping '{action}' due to FRONTEND_MODE=True.")
                 continue
-
-            action_method = self.action_mapping.get(action)
-            if not action_method:
+            if action not in self.action_mapping:
                 print(f"Error: Unknown action '{action}'.")
                 return
+            actions.append(action)
+
+        def run_action(index, action):
+            """
+            Runs one action on the shared state. Returns False on a failed
+            precondition.
+            """
+            print("\n" + "-" * 50)
+            print(f"Action # {index + 1}. {action}")
+            action_method = self.action_mapping[action]
+            tracks = state["tracks"]
 
             # Invoke the action method with appropriate parameters:
             if action == "Analyze":
-                params, folder_name = action_method(user_prompt)
+                state["params"], state["folder_name"] = action_method(user_prompt)
 
             elif action == "Filter":
-                if params is None:
+                if state["params"] is None:
                     print("Error: 'Analyze' step missing.")
-                    return
-                tracks = action_method(self.dataset, params, folder_name, num_tracks)
+                    return False
+                # Refine scores a wider pool; Filter relaxes a copy of the
+                # Analyze ranges so that Refine still sees the original target
+                pool_size = num_tracks
+                if "Refine" in actions:
+                    pool_size = max(num_tracks, config.REFINE_CANDIDATE_POOL)
+                state["tracks"] = action_method(
+                    self.dataset,
+                    copy.deepcopy(state["params"]),
+                    state["folder_name"],
+                    pool_size,
+                    num_shown=num_tracks,
+                )
 
             elif action == "Refine":
                 if tracks is None or tracks.empty:
                     print("Error: No tracks to refine.")
-                    return
-                tracks, folder_name = action_method(user_prompt, tracks, folder_name)
+                    return False
+                (
+                    state["tracks"],
+                    state["folder_name"],
+                    state["refine_degraded"],
+                ) = action_method(
+                    user_prompt,
+                    tracks,
+                    state["folder_name"],
+                    params=state["params"],
+                    latency_budget_sec=config.REFINE_LATENCY_BUDGET_SEC,
+                )
 
             elif action == "Create_Recommendation_Table":
                 if tracks is None or tracks.empty:
                     print("Error: No tracks available for recommendation table.")
-                    return
-                playlist = action_method(tracks, folder_name)
+                    return False
+                playlist = action_method(
+                    tracks,
+                    state["folder_name"],
+                    resolver=resolver,
+                    on_progress=on_progress,
+                )
+                if state["refine_degraded"] is not None:
+                    # LLM rerank skipped under the Refine latency budget
+                    playlist["degraded"] = state["refine_degraded"]
+                state["playlist"] = playlist
 
             elif action == "Retrieve_and_Convert":
                 if tracks is None:
                     tracks = parse_user_prompt_to_dataframe(user_prompt)
-                    folder_name = "user_provided_tracks"
+                    state["tracks"] = tracks
+                    state["folder_name"] = "user_provided_tracks"
                     if tracks.empty:
                         print("Error: No valid tracks  provided by user.")
-                        return
-                action_method(tracks, folder_name)
+                        return False
+                action_method(tracks, state["folder_name"], resolver=resolver)
+                state["downloaded"] = True
+
+            elif action == "Normalize_Loudness":
+                if not state["downloaded"]:
+                    print("Error: 'Retrieve_and_Convert' step missing.")
+                    return False
+                action_method(state["folder_name"])
 
             elif action == "Summarize":
                 if tracks is None or tracks.empty:
                     print("Error: No tracks to summarize.")
-                    return
-                action_method(tracks)
+                    return False
+                action_method(tracks, resolver=resolver)
+
+            return True
+
+        # independent actions (e.g. the recommendation table and the
+        # downloads) run concurrently, see ACTION_SPECS
+        def traced_action(index, action):
+            with tracing.span(f"action.{action}") as span:
+                ok = run_action(index, action)
+                tracks = state["tracks"]
+                span.set_attributes(
+                    ok=bool(ok), tracks=0 if tracks is None else len(tracks)
+                )
+                return ok
+
+        graph = ActionGraph(actions, ACTION_SPECS)
+        with tracing.span("execute_actions", actions=len(actions)):
+            # the action threads open their spans under this one
+            ok, self.last_action_timings = graph.run(
+                tracing.propagate(traced_action), max_workers=config.ACTION_WORKERS
+            )
+        print_action_timeline(self.last_action_timings)
+        if not ok:
+            return
 
         print("\nAll actions executed successfully!")
 
-        return playlist
+        return state["playlist"]
 
 
 # Example Usage
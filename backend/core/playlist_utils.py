@@ -1,28 +1,76 @@
 import json
 import os
+import threading
 
 import pandas as pd
 from googleapiclient.discovery import build
 from yt_dlp import YoutubeDL
 
 from backend import config
+from backend.core.search_scheduler import QuotaLedger, SearchScheduler
+from backend.core.track_resolver import TrackResolver, youtube_link
+from backend.core.video_id_cache import VideoIdCache
 
 
 class YouTubeSearcher:
-    def __init__(self, youtube_api_key=None):
+    def __init__(self, youtube_api_key=None, video_id_cache=None):
         if youtube_api_key is None:
             self.youtube_api_key = os.getenv("YOUTUBE_API_KEY")
         else:
             self.youtube_api_key = youtube_api_key
+        self._clients = threading.local()
+        # search results persisted across requests (not the CI dummy ids)
+        if (
+            video_id_cache is None
+            and config.VIDEO_ID_CACHE_ENABLED
+            and os.getenv("GITHUB_ACTIONS") != "true"
+        ):
+            video_id_cache = VideoIdCache()
+        self.video_id_cache = video_id_cache
+        # Data API while the daily quota lasts, yt-dlp afterwards
+        self.search_scheduler = SearchScheduler(
+            self.search_video_id,
+            self.search_video_id_yt_dlp,
+            ledger=(
+                QuotaLedger(":memory:")
+                if os.getenv("GITHUB_ACTIONS") == "true"
+                else None
+            ),
+        )
 
-    def search_top_result(self, query):
-        if os.getenv("GITHUB_ACTIONS") == "true":
-            return "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    def new_resolver(self):
+        """
+        Returns a per-request TrackResolver backed by the video id cache and
+        the quota-aware search scheduler.
+        """
+        return TrackResolver(self.search_scheduler.search, cache=self.video_id_cache)
+
+    def _client(self):
+        """
+        Returns the YouTube Data API client of the calling thread, built once
+        from the bundled discovery document and then reused, so its HTTP
+        connection stays open across searches (httplib2 connections are not
+        thread-safe, hence one client per thread).
+        """
+        youtube = getattr(self._clients, "youtube", None)
+        if youtube is None:
+            youtube = build(
+                "youtube",
+                "v3",
+                developerKey=self.youtube_api_key,
+                static_discovery=True,
+                cache_discovery=False,
+            )
+            self._clients.youtube = youtube
+        return youtube
 
-        youtube = build("youtube", "v3", developerKey=self.youtube_api_key)
+    def search_video_id(self, query):
+        if os.getenv("GITHUB_ACTIONS") == "true":
+            return "dQw4w9WgXcQ"
 
         search_response = (
-            youtube.search()
+            self._client()
+            .search()
             .list(q=query, part="id,snippet", maxResults=1, type="video")
             .execute()
         )
@@ -31,33 +79,48 @@ class YouTubeSearcher:
         if not items:
             return None
 
-        video_id = items[0]["id"]["videoId"]
-        youtube_link = f"https://www.youtube.com/watch?v={video_id}"
+        return items[0]["id"]["videoId"]
 
-        return youtube_link
+    def search_top_result(self, query):
+        return youtube_link(self.search_video_id(query))
 
-    def youtube_search_top_result_yt_dlp(self, query):
+    def search_video_id_yt_dlp(self, query):
+        """
+        Quota-free (but slower) search of the top result with yt-dlp.
+        """
         if os.getenv("GITHUB_ACTIONS") == "true":
-            return "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+            return "dQw4w9WgXcQ"
 
         ydl_opts = {
             "default_search": "ytsearch1",
             "quiet": True,
             "no_warnings": True,
             "skip_download": True,
+            # search results only, without fetching each video page
+            "extract_flat": "in_playlist",
             "ffmpeg_location": "",
             "logger": None,
         }
 
         with YoutubeDL(ydl_opts) as ydl:
             info_dict = ydl.extract_info(query, download=False)
-            video_url = info_dict["entries"][0]["webpage_url"]
-            return video_url
+            entries = info_dict.get("entries") or []
+            return entries[0]["id"] if entries else None
+
+    def youtube_search_top_result_yt_dlp(self, query):
+        return youtube_link(self.search_video_id_yt_dlp(query))
 
     @staticmethod
-    def summarize_results(tracks: pd.DataFrame) -> None:
+    def summarize_results(tracks: pd.DataFrame, resolver=None) -> None:
         print("\nFinal Recommendations:")
         for track_number, (_, row) in enumerate(tracks.iterrows(), start=1):
+            # links already resolved for the table or the downloads
+            video_id = (
+                resolver.resolved(row["artists"], row["track_name"])
+                if resolver is not None
+                else None
+            )
+            link = f"\n   YouTube: {youtube_link(video_id)}" if video_id else ""
             print(
                 f"{track_number}. {row['track_name']} by {row['artists']} | "
                 f"\n   Popularity: {row['popularity']} | Tempo: {row['tempo']} BPM | "
@@ -69,21 +132,49 @@ class YouTubeSearcher:
                 f"Instrumentalness: {row['instrumentalness']} | "
                 f"Liveness: {row['liveness']} | Valence: {row['valence']} | "
                 f"Time Signature: {row['time_signature']} | "
-                f"Genre: {row['track_genre']}\n"
+                f"Genre: {row['track_genre']}{link}\n"
             )
 
-    def create_recommendation_table(self, tracks, folder_name):
+    @staticmethod
+    def playlist_entry(row, video_id):
+        return {
+            "artist": row["artists"],
+            "track": row["track_name"],
+            "youtube_link": youtube_link(video_id),
+        }
+
+    def create_recommendation_table(
+        self, tracks, folder_name, resolver=None, on_progress=None
+    ):
+        """
+        Builds the playlist table with an official YouTube link per track.
+
+        Parameters:
+            resolver (TrackResolver): Per-request resolver shared with the
+                                      downloader, so each track is searched
+                                      once. A new one is used if omitted.
+            on_progress (callable): on_progress(partial_playlist_json),
+                                    called each time a link resolves with
+                                    the entries resolved so far, in
+                                    playlist order.
+        """
         tracks = tracks.copy()
+        if resolver is None:
+            resolver = self.new_resolver()
 
-        if os.getenv("GITHUB_ACTIONS") == "true":
-            tracks["youtube_link"] = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
-        else:
-            tracks["youtube_link"] = tracks.apply(
-                lambda row: self.search_top_result(
-                    f"{row['artists']} {row['track_name']}"
-                ),
-                axis=1,
-            )
+        entries = [None] * len(tracks)
+
+        def entry_resolved(position, video_id):
+            entries[position] = self.playlist_entry(tracks.iloc[position], video_id)
+            on_progress({"playlist": [entry for entry in entries if entry]})
+
+        video_ids = resolver.resolve_many(
+            tracks, on_resolved=entry_resolved if on_progress is not None else None
+        )
+        tracks["youtube_link"] = [youtube_link(video_id) for video_id in video_ids]
+        if resolver.cache is not None:
+            resolver.cache.report()
+        self.search_scheduler.report()
 
         table_df = tracks[["artists", "track_name", "youtube_link"]].copy()
         table_df.columns = ["Artist", "Track Name", "Official YouTube Link"]
@@ -132,6 +132,8 @@ class PromptEngineer:
             actions_available += (
                 "\n    6. Retrieve_and_Convert:"
                 "Retrieve audio tracks from YouTube and convert them to MP3."
+                "\n    7. Normalize_Loudness:"
+                "Normalize the loudness of the downloaded tracks to a common level."
             )
 
         system_message = SystemMessage(
@@ -153,6 +155,9 @@ class PromptEngineer:
           recommendations formatted as a table or playlist.
         - Include "Retrieve_and_Convert" only if if config.FRONTEND_MODE is False and
           requested or implied by the user's prompt.
+        - Include "Normalize_Loudness" right after "Retrieve_and_Convert" only if
+          the user asks or implies a consistent volume across tracks
+          (e.g. workouts, parties, running).
         - Always include "Summarize" at the end if playlist was created by
           Create_Recommendation_Table or Retrieve_and_Convert actions.
 
@@ -171,6 +176,7 @@ class PromptEngineer:
         3. Refine semantically (if required explicitly).
         4. Create_Recommendation_Table.
         5. Retrieve_and_Convert (optional).
+        6. Normalize_Loudness (optional, after Retrieve_and_Convert).
 
         Return numbered list of actions.
         """
@@ -201,6 +207,7 @@ class PromptEngineer:
         - "Create_Recommendation_Table" - create a table with selected tracks.
         - "Retrieve_and_Convert": retrieve tracks from YouTube and convert
                                   them to MP3 format.
+        - "Normalize_Loudness": normalize the loudness of the downloaded tracks.
         - "Summarize": summarize the final playlist.
 
         Instructions given:
@@ -1,8 +1,14 @@
+import time
+
+import numpy as np
 import pandas as pd
 
 from backend import config
+from backend.core.hybrid_scorer import HybridScorer
 from backend.core.output_parser import OutputParser
 from backend.core.prompt_engineer import PromptEngineer
+from backend.core.song_utils import normalize_track_key
+from backend.corpus.context_store import song_id_for
 from backend.corpus.embeddings.semantic_retrieval import SemanticRetrieval
 
 
@@ -15,27 +21,46 @@ class RAGSemanticRefiner:
             open_ai_key=open_ai_key, genius_api_key=genius_api_key
         )
 
-        # Set ChromaDB collection
-        self.collection = self.SemanticRetrieval.set_collection()
+        # Share the vector store opened by SemanticRetrieval
+        self.collection = self.SemanticRetrieval.collection
 
         self.embed_user_prompt = self.SemanticRetrieval.embed_user_prompt
+        self.hybrid_scorer = HybridScorer()
+
+    @staticmethod
+    def _track_ids(tracks):
+        if "track_id" not in tracks:
+            return [None] * len(tracks)
+        return [
+            track_id if isinstance(track_id, str) else None
+            for track_id in tracks["track_id"]
+        ]
 
     def retrieve_semantic_context(self, tracks):
         """
         Retrieves semantic context for each track.
+        Stored contexts are read from the context store in one batch;
+        only the remaining tracks are looked up individually.
         """
         verbose = config.VERBOSE
-        semantic_contexts = []
-        for _, track in tracks.iterrows():
-            artist = track["artists"].split(";")[0].strip()
-            track_name = track["track_name"]
+        candidates = [
+            (artist.split(";")[0].strip(), track_name, track_id)
+            for artist, track_name, track_id in zip(
+                tracks["artists"], tracks["track_name"], self._track_ids(tracks)
+            )
+        ]
+        stored_contexts = self.SemanticRetrieval.get_song_contexts(candidates)
 
+        semantic_contexts = []
+        for artist, track_name, track_id in candidates:
             if verbose:
                 print(f"\nRetrieving semantic context for: {artist} - {track_name}")
 
-            song_text = self.SemanticRetrieval.get_or_create_song_embedding(
-                artist, track_name
-            )
+            song_text = stored_contexts.get((artist, track_name))
+            if song_text is None:
+                song_text = self.SemanticRetrieval.get_or_create_song_embedding(
+                    artist, track_name, track_id
+                )
 
             if song_text:
                 # print(f"Semantic context retrieved for '{track_name}'.")
@@ -54,50 +79,42 @@ class RAGSemanticRefiner:
 
         return semantic_contexts
 
-    def reorder_tracks_by_semantic_ranking(self, original_tracks, ranked_playlist):
-
+    @staticmethod
+    def reorder_tracks_by_semantic_ranking(original_tracks, ranked_playlist):
+        """
+        Reorders `original_tracks` to follow the LLM's `ranked_playlist`
+        (entries with 'artist' and 'track_name'), matching on
+        normalize_track_key. The join goes through a key -> row dict built
+        once, so it is linear in both inputs; neither input is modified.
+        """
         verbose = config.VERBOSE
 
-        ranked_df = pd.DataFrame(ranked_playlist)
-
-        # Normalize strings to ensure accurate matching
-        ranked_df["track_name"] = ranked_df["track_name"].str.lower().str.strip()
-        ranked_df["artist"] = ranked_df["artist"].str.lower().str.strip()
-
-        original_tracks["normalized_track_name"] = (
-            original_tracks["track_name"].str.lower().str.strip()
-        )
-        original_tracks["normalized_artist"] = (
-            original_tracks["artists"].str.lower().str.split(";").str[0].str.strip()
-        )
+        # first row per normalized key, as with the previous mask lookup
+        row_of = {}
+        for row, key in enumerate(
+            map(
+                normalize_track_key,
+                original_tracks["artists"],
+                original_tracks["track_name"],
+            )
+        ):
+            row_of.setdefault(key, row)
 
-        # Reorder by explicitly iterating through ranked_df
         ordered_rows = []
         missing_tracks = []
-
-        for _, ranked_row in ranked_df.iterrows():
-            mask = (
-                original_tracks["normalized_track_name"] == ranked_row["track_name"]
-            ) & (original_tracks["normalized_artist"] == ranked_row["artist"])
-            match = original_tracks[mask]
-
-            if not match.empty:
-                ordered_rows.append(match.iloc[0])
+        for ranked_track in ranked_playlist:
+            key = normalize_track_key(
+                ranked_track.get("artist", ""), ranked_track.get("track_name", "")
+            )
+            if key in row_of:
+                ordered_rows.append(row_of[key])
             else:
-                missing_tracks.append((ranked_row["artist"], ranked_row["track_name"]))
-
-        # Combine ordered rows into final DataFrame
-        ordered_df = pd.DataFrame(ordered_rows).reset_index(drop=True)
+                missing_tracks.append(key)
 
         if verbose and missing_tracks:
             print(f"Missing tracks: {missing_tracks}")
 
-        # Drop temporary normalization columns
-        ordered_df = ordered_df.drop(
-            columns=["normalized_track_name", "normalized_artist"], errors="ignore"
-        )
-
-        return ordered_df
+        return original_tracks.iloc[ordered_rows].reset_index(drop=True)
 
     def refine_tracks_with_rag(
         self, user_prompt, tracks, folder_name, embedding_top_k=None
@@ -174,7 +191,7 @@ class RAGSemanticRefiner:
             " relevance to user prompt..."
         )
         ranked_playlist, refined_folder_name = self.parser.parse_ranked_playlist(
-            self.llm_executor.execute(messages)
+            self.llm_executor.execute(messages, kind="rerank")
         )
 
         if ranked_playlist:
@@ -189,54 +206,111 @@ class RAGSemanticRefiner:
 
         return tracks, folder_name
 
+    def embedding_similarities(self, user_embedding, tracks):
+        """
+        Cosine similarity of each track's stored embedding to the prompt
+        embedding. The candidates' embeddings are bulk-fetched by song id
+        and scored with one matrix-vector product.
+
+        Returns:
+            np.ndarray: One similarity per row of `tracks`, NaN for tracks
+                        without a stored embedding.
+        """
+        user_embedding = np.asarray(user_embedding, dtype=np.float32)
+        song_ids = [
+            song_id_for(artist, track_name)
+            for artist, track_name in zip(tracks["artists"], tracks["track_name"])
+        ]
+        stored_embeddings = self.SemanticRetrieval.get_song_embeddings(song_ids)
+
+        similarities = np.full(len(song_ids), np.nan)
+        rows = [
+            row for row, song_id in enumerate(song_ids) if song_id in stored_embeddings
+        ]
+        if rows:
+            matrix = np.stack([stored_embeddings[song_ids[row]] for row in rows])
+            similarities[rows] = (matrix @ user_embedding) / (
+                np.linalg.norm(matrix, axis=1) * np.linalg.norm(user_embedding) + 1e-12
+            )
+        return similarities
+
+    def embed_missing_candidates(self, tracks, similarities, params, deadline):
+        """
+        Fetches and embeds the candidates without a stored embedding, best
+        audio match first, until the next one would likely end after
+        `deadline` (a time.monotonic() value).
+
+        Returns:
+            int: Number of candidates embedded.
+        """
+        missing = np.flatnonzero(np.isnan(similarities))
+        audio_scores = self.hybrid_scorer.audio_scores(tracks, params)
+        missing = missing[np.argsort(-audio_scores[missing], kind="stable")]
+        track_ids = self._track_ids(tracks)
+
+        embedded = 0
+        slowest_sec = 0.0
+        for row in missing:
+            fetch_started = time.monotonic()
+            if fetch_started + slowest_sec > deadline:
+                break
+            song_context = self.SemanticRetrieval.get_or_create_song_embedding(
+                tracks["artists"].iloc[row],
+                tracks["track_name"].iloc[row],
+                track_ids[row],
+            )
+            slowest_sec = max(slowest_sec, time.monotonic() - fetch_started)
+            embedded += bool(song_context)
+        return embedded
+
+    @staticmethod
+    def report_missing_candidates(tracks, similarities):
+        """
+        Prints the candidates scored without an embedding.
+        """
+        missing = np.flatnonzero(np.isnan(similarities))
+        if not len(missing):
+            return
+        print(
+            f"{len(missing)}/{len(tracks)} candidate tracks have no embedding "
+            "and are scored on audio features and popularity only."
+        )
+        if config.VERBOSE:
+            for row in missing:
+                print(
+                    f"   - {tracks['track_name'].iloc[row]} by "
+                    f"{tracks['artists'].iloc[row]}"
+                )
+
     def rank_tracks_by_embedding_similarity(
         self, user_prompt, tracks, top_k=50, verbose=False
     ):
 
         # Step 1 Ensure embeddings exist
-        for artist, track_name in zip(tracks["artists"], tracks["track_name"]):
-            self.SemanticRetrieval.get_or_create_song_embedding(artist, track_name)
+        for artist, track_name, track_id in zip(
+            tracks["artists"], tracks["track_name"], self._track_ids(tracks)
+        ):
+            self.SemanticRetrieval.get_or_create_song_embedding(
+                artist, track_name, track_id
+            )
 
         # Step 2 Embed user prompt explicitly
         user_embedding = self.embed_user_prompt(user_prompt)
 
-        # Step 3  Construct ChromaDB metadata filter
-        track_metadata_conditions = [
-            {
-                "$and": [
-                    {"artists": {"$eq": artist}},
-                    {"track_name": {"$eq": track_name}},
-                ]
-            }
-            for artist, track_name in zip(tracks["artists"], tracks["track_name"])
-        ]
-
-        # Step 4 explicitly: Perform ChromaDB semantic embedding search
-        results = self.collection.query(
-            query_embeddings=[user_embedding],
-            n_results=min(top_k, len(track_metadata_conditions)),
-            where={"$or": track_metadata_conditions},
-            include=["metadatas", "distances"],
-        )
-
-        retrieved_metadatas = results["metadatas"][0]
-        retrieved_distances = results["distances"][0]
-
-        if not retrieved_metadatas:
+        # Step 3 Exact cosine distances to the stored candidate embeddings
+        similarities = self.embedding_similarities(user_embedding, tracks)
+        if np.isnan(similarities).all():
             if verbose:
-                print("No tracks matched the metadata conditions.")
+                print("No candidate tracks have an embedding.")
             return pd.DataFrame([])
 
-        # Step 5 : Build DataFrame from retrieved metadata
-        embedding_df = pd.DataFrame(retrieved_metadatas)
-        embedding_df["distance"] = retrieved_distances
+        final_df = tracks.assign(distance=1.0 - similarities)
+        final_df = final_df[final_df["distance"].notna()]
+        final_df = final_df.drop_duplicates(subset=["artists", "track_name"])
 
-        # Step 6 : Merge with numeric-filtered tracks
-        final_df = embedding_df.merge(tracks, on=["artists", "track_name"], how="left")
-
-        # Step 7: Sort final DataFrame by semantic distance
-        final_df.sort_values("distance", inplace=True)
-        final_df.reset_index(drop=True, inplace=True)
+        # Step 4 Sort final DataFrame by semantic distance
+        final_df = final_df.sort_values("distance", kind="stable")
+        final_df = final_df.reset_index(drop=True)
 
         # limit to top_k tracks
         final_df = final_df.head(top_k)
@@ -249,26 +323,98 @@ class RAGSemanticRefiner:
         tracks,
         folder_name="hybrid_recommendations",
         embedding_top_k=10,
+        params=None,
+        latency_budget_sec=None,
     ):
+        """
+        Selects the top `embedding_top_k` candidates, then ranks them with
+        the LLM (refine_tracks_with_rag).
+
+        With the Analyze `params`, the selection is a single HybridScorer
+        pass over the whole candidate pool (audio-feature distance, stored
+        embedding similarity and popularity). Without them, candidates are
+        ranked by embedding similarity alone, embedding missing songs first.
+
+        With `latency_budget_sec`, hybrid scoring first embeds candidates
+        missing from the corpus (best audio match first) while the budget
+        leaves room for the LLM rerank; the candidates still missing are
+        reported and scored without the semantic term. The LLM rerank is
+        skipped when the remaining budget cannot cover the executor's
+        rolling latency estimate. The selection order is returned instead
+        and the result is flagged as degraded.
 
+        Returns:
+            tuple: (tracks DataFrame, folder name, degraded flag).
+        """
+        started = time.monotonic()
+        if params is not None:
+            selection = (
+                f"\n   1. Hybrid Scoring: Score all {len(tracks)} candidate tracks "
+                "on audio features, embedding similarity to the user's prompt "
+                f"and popularity, and select the top {embedding_top_k} tracks."
+            )
+        else:
+            selection = (
+                "\n   1. Embedding Ranking: Rank candidate tracks based on "
+                "embedding similarity to the user's prompt embedding and select "
+                f"the top {embedding_top_k} tracks."
+            )
         print(
             "\nRanking tracks using the hybrid method:"
-            f"\n   1. Embedding Ranking: Rank candidate tracks based on embedding "
-            f"similarity to the user's prompt embedding and select "
-            f"the top {embedding_top_k} tracks."
-            "\n   2. Refine the ranking of selected tracks using LLM-based "
+            + selection
+            + "\n   2. Refine the ranking of selected tracks using LLM-based "
             "semantic relevance (RAG) to the user's prompt.\n"
         )
 
-        # Step 1: rank_tracks_by_embedding_similarity
-        print("----- Performing Embedding Ranking...  -------")
-        embedding_filtered_tracks = self.rank_tracks_by_embedding_similarity(
-            user_prompt, tracks, top_k=embedding_top_k
-        )
+        if params is not None:
+            # Step 1: one vectorized scoring pass over the candidate pool
+            print("----- Performing Hybrid Scoring...  -------")
+            user_embedding = self.embed_user_prompt(user_prompt)
+            similarities = self.embedding_similarities(user_embedding, tracks)
+            # the stored embeddings just fetched give the corpus coverage
+            embedded = int(np.isfinite(similarities).sum())
+            print(
+                f"Corpus coverage: {embedded}/{len(tracks)} candidate tracks "
+                f"already embedded ({embedded / max(len(tracks), 1):.0%})."
+            )
+            if latency_budget_sec is not None and embedded < len(tracks):
+                # keep room for the LLM rerank
+                deadline = (
+                    started
+                    + latency_budget_sec
+                    - self.llm_executor.estimated_latency("rerank")
+                )
+                if self.embed_missing_candidates(
+                    tracks, similarities, params, deadline
+                ):
+                    similarities = self.embedding_similarities(user_embedding, tracks)
+            self.report_missing_candidates(tracks, similarities)
+            embedding_filtered_tracks = self.hybrid_scorer.top_n(
+                tracks, params, similarities, n=embedding_top_k
+            )
+        else:
+            # Step 1: rank_tracks_by_embedding_similarity
+            print("----- Performing Embedding Ranking...  -------")
+            embedding_filtered_tracks = self.rank_tracks_by_embedding_similarity(
+                user_prompt, tracks, top_k=embedding_top_k
+            )
+        self.SemanticRetrieval.negative_cache.report()
+
+        if latency_budget_sec is not None:
+            remaining_sec = latency_budget_sec - (time.monotonic() - started)
+            estimated_sec = self.llm_executor.estimated_latency("rerank")
+            if estimated_sec > remaining_sec:
+                print(
+                    f"Skipping LLM ranking: estimated {estimated_sec:.1f}s exceeds "
+                    f"the remaining latency budget ({remaining_sec:.1f}s). "
+                    "Returning the embedding ranking (degraded)."
+                )
+                return embedding_filtered_tracks, folder_name, True
+
         print("----- Performing LLM-based semantic relevance ranking ----- ...\n\n")
         # Step 2: Perform final LLM ranking (existing function)
         final_ranked_tracks, folder_name = self.refine_tracks_with_rag(
             user_prompt, embedding_filtered_tracks, folder_name=folder_name
         )
 
-        return final_ranked_tracks, folder_name
+        return final_ranked_tracks, folder_name, False
@@ -0,0 +1,48 @@
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate_per_sec, burst=1):
+        """
+        Thread-safe token-bucket rate limiter shared by concurrent workers.
+
+        Parameters:
+            rate_per_sec (float): Sustained number of calls allowed per second.
+                                  None or 0 disables limiting.
+            burst (int): Number of calls allowed back-to-back after idling.
+        """
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a call is allowed.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if not self.rate_per_sec:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._last_refill) * self.rate_per_sec,
+                )
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+
+                delay = (1 - self._tokens) / self.rate_per_sec
+
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,376 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from botocore.exceptions import BotoCoreError, ClientError
+from googleapiclient.errors import HttpError
+
+from backend import config
+from backend.core import tracing
+
+# The YouTube Data API daily quota resets at midnight Pacific Time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+def is_quota_exceeded(error):
+    """
+    Returns True if `error` is the Data API refusing a call for quota.
+    """
+    return (
+        isinstance(error, HttpError)
+        and error.status_code == 403
+        and b"quotaExceeded" in error.content
+    )
+
+
+class QuotaLedgerBackend(abc.ABC):
+    """
+    Storage of the QuotaLedger: quota day -> units spent.
+    """
+
+    @abc.abstractmethod
+    def get(self, day):
+        """
+        Returns the units spent on `day`.
+        """
+
+    @abc.abstractmethod
+    def update(self, day, change):
+        """
+        Atomically replaces the units spent on `day` by change(units).
+        `change` returns None to leave them unchanged.
+
+        Returns:
+            int or None: The new units, or None if nothing was changed.
+        """
+
+
+class SQLiteQuotaBackend(QuotaLedgerBackend):
+    def __init__(self, db_path):
+        if str(db_path) != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota_ledger ("
+            "day TEXT PRIMARY KEY, units INTEGER NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _get(self, day):
+        row = self.conn.execute(
+            "SELECT units FROM quota_ledger WHERE day = ?", (day,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, day):
+        with self._lock:
+            return self._get(day)
+
+    def update(self, day, change):
+        with self._lock:
+            units = change(self._get(day))
+            if units is None:
+                return None
+            self.conn.execute(
+                "INSERT OR REPLACE INTO quota_ledger (day, units) VALUES (?, ?)",
+                (day, units),
+            )
+            self.conn.commit()
+        return units
+
+
+class S3QuotaBackend(QuotaLedgerBackend):
+    # S3 answers a failed IfMatch / IfNoneMatch condition with these codes
+    CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict")
+
+    def __init__(self, bucket, prefix="youtube_quota/", s3_client=None, attempts=10):
+        """
+        One small JSON object per quota day, shared by every Lambda
+        container. Updates are conditional writes (If-Match on the ETag
+        read), retried when another container wrote first.
+
+        Parameters:
+            bucket (str): S3 bucket of the ledger.
+            prefix (str): Key prefix of the ledger objects.
+            s3_client: boto3 S3 client (or a stand-in with get_object and
+                       put_object). Created if omitted.
+            attempts (int): Conditional writes tried per update.
+        """
+        if s3_client is None:
+            import boto3
+
+            s3_client = boto3.client("s3")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.attempts = attempts
+
+    def _object_key(self, day):
+        return f"{self.prefix}{day}.json"
+
+    def _read(self, day):
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket, Key=self._object_key(day)
+            )
+        except self.s3_client.exceptions.NoSuchKey:
+            return 0, None
+        return json.loads(response["Body"].read())["units"], response["ETag"]
+
+    def get(self, day):
+        try:
+            return self._read(day)[0]
+        except (ClientError, BotoCoreError) as e:
+            print(f"[QuotaLedger]: S3 read of '{day}' failed: {e}")
+            return 0
+
+    def update(self, day, change):
+        try:
+            for _ in range(self.attempts):
+                units, etag = self._read(day)
+                units = change(units)
+                if units is None:
+                    return None
+                condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+                try:
+                    self.s3_client.put_object(
+                        Bucket=self.bucket,
+                        Key=self._object_key(day),
+                        Body=json.dumps({"units": units}),
+                        ContentType="application/json",
+                        **condition,
+                    )
+                    return units
+                except ClientError as e:
+                    if e.response["Error"]["Code"] not in self.CONFLICT_CODES:
+                        raise
+            print(f"[QuotaLedger]: Gave up updating '{day}' after conflicts.")
+        except (ClientError, BotoCoreError) as e:
+            print(f"[QuotaLedger]: S3 update of '{day}' failed: {e}")
+        # unrecorded: the ledger is advisory, quotaExceeded still stops spending
+        return change(0)
+
+
+class QuotaLedger:
+    def __init__(self, db_path=None, daily_units=None, backend=None):
+        """
+        Count of the YouTube Data API units spent per quota day.
+
+        The ledger is advisory: it spreads the daily budget over requests,
+        but the API's quotaExceeded response is the source of truth (see
+        SearchScheduler.search). With the default SQLite file each Lambda
+        container keeps its own count, so set YOUTUBE_QUOTA_BUCKET to share
+        one count between all the containers using the same API key.
+
+        Parameters:
+            db_path (str or Path): SQLite file of the ledger (":memory:" for
+                                   a throwaway one).
+            daily_units (int): Daily quota of the API key.
+                               Defaults to config.YOUTUBE_DAILY_QUOTA_UNITS.
+            backend (QuotaLedgerBackend): Ledger storage, instead of
+                                          `db_path`. Defaults to an
+                                          S3QuotaBackend if the
+                                          YOUTUBE_QUOTA_BUCKET environment
+                                          variable is set, else SQLite at
+                                          config.YOUTUBE_QUOTA_LEDGER_PATH
+                                          (/tmp on Lambda).
+        """
+        if backend is None:
+            backend = (
+                self._default_backend()
+                if db_path is None
+                else SQLiteQuotaBackend(db_path)
+            )
+        self.backend = backend
+        self.daily_units = (
+            config.YOUTUBE_DAILY_QUOTA_UNITS if daily_units is None else daily_units
+        )
+
+    @staticmethod
+    def _default_backend():
+        bucket = os.getenv("YOUTUBE_QUOTA_BUCKET")
+        if bucket:
+            return S3QuotaBackend(bucket)
+        if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+            return SQLiteQuotaBackend(
+                Path("/tmp") / config.YOUTUBE_QUOTA_LEDGER_PATH.name
+            )
+        return SQLiteQuotaBackend(config.YOUTUBE_QUOTA_LEDGER_PATH)
+
+    @staticmethod
+    def today():
+        return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+    def spent(self, day=None):
+        return self.backend.get(day or self.today())
+
+    def remaining(self):
+        return max(0, self.daily_units - self.spent())
+
+    def try_spend(self, units, reserve=0):
+        """
+        Records `units` as spent today if at least `reserve` units would
+        remain afterwards.
+
+        Returns:
+            bool: True if the units were recorded.
+        """
+
+        def spend(spent):
+            if spent + units > self.daily_units - reserve:
+                return None
+            return spent + units
+
+        return self.backend.update(self.today(), spend) is not None
+
+    def refund(self, units):
+        """
+        Takes back `units` recorded today for a call that did not go
+        through (network error, server error).
+        """
+        self.backend.update(self.today(), lambda spent: max(0, spent - units))
+
+    def exhaust(self):
+        """
+        Marks today's quota as used up (the API reported quotaExceeded).
+        """
+        self.backend.update(self.today(), lambda spent: max(spent, self.daily_units))
+
+
+class SearchScheduler:
+    def __init__(
+        self,
+        api_search,
+        fallback_search,
+        ledger=None,
+        cost_units=None,
+        reserve_units=None,
+        fallback_workers=None,
+    ):
+        """
+        Routes video searches to the quota-limited YouTube Data API while
+        today's budget lasts and spills them to a bounded pool of yt-dlp
+        searches when the budget runs low, is exhausted, or an API call
+        fails.
+
+        Parameters:
+            api_search (callable): api_search(query) -> video id or None.
+            fallback_search (callable): Quota-free search, same signature.
+            ledger (QuotaLedger): Units spent per day.
+            cost_units (int): Units per API search.
+                              Defaults to config.YOUTUBE_SEARCH_COST_UNITS.
+            reserve_units (int): Units kept unspent for other API calls.
+                                 Defaults to config.YOUTUBE_QUOTA_RESERVE_UNITS.
+            fallback_workers (int): Concurrent fallback searches.
+                                    Defaults to config.YT_DLP_SEARCH_WORKERS.
+        """
+        self.api_search = api_search
+        self.fallback_search = fallback_search
+        self.ledger = QuotaLedger() if ledger is None else ledger
+        self.cost_units = (
+            config.YOUTUBE_SEARCH_COST_UNITS if cost_units is None else cost_units
+        )
+        self.reserve_units = (
+            config.YOUTUBE_QUOTA_RESERVE_UNITS
+            if reserve_units is None
+            else reserve_units
+        )
+        fallback_workers = fallback_workers or config.YT_DLP_SEARCH_WORKERS
+        self._fallback_slots = threading.BoundedSemaphore(fallback_workers)
+
+        self._lock = threading.Lock()
+        self._usage = {
+            backend: {
+                "calls": 0,
+                "failures": 0,
+                "latencies": deque(maxlen=config.SEARCH_LATENCY_WINDOW),
+            }
+            for backend in ("api", "yt_dlp")
+        }
+
+    def _timed(self, backend, search, query):
+        started = time.monotonic()
+        try:
+            with tracing.span("youtube.search", kind="client", backend=backend):
+                return search(query)
+        except Exception:
+            with self._lock:
+                self._usage[backend]["failures"] += 1
+            raise
+        finally:
+            with self._lock:
+                usage = self._usage[backend]
+                usage["calls"] += 1
+                usage["latencies"].append(time.monotonic() - started)
+
+    def search(self, query):
+        """
+        Returns the video id of the top result of `query`, or None (also
+        when the fallback search fails).
+        """
+        if self.ledger.try_spend(self.cost_units, reserve=self.reserve_units):
+            try:
+                return self._timed("api", self.api_search, query)
+            except Exception as e:
+                if is_quota_exceeded(e):
+                    print("YouTube Data API quota exceeded, switching to yt-dlp.")
+                    self.ledger.exhaust()
+                else:
+                    # the failed call did not use the quota
+                    self.ledger.refund(self.cost_units)
+                    print(f"YouTube Data API search failed ({e}), using yt-dlp.")
+
+        with self._fallback_slots:
+            try:
+                return self._timed("yt_dlp", self.fallback_search, query)
+            except Exception as e:
+                print(f"yt-dlp search failed for '{query}': {e}")
+                return None
+
+    __call__ = search
+
+    def stats(self):
+        """
+        Returns per-backend 'calls', 'failures' and recent 'mean_sec' and
+        'p90_sec' latencies, plus today's 'quota_spent' and 'quota_remaining'.
+        """
+        stats = {}
+        with self._lock:
+            for backend, usage in self._usage.items():
+                latencies = np.array(usage["latencies"])
+                stats[backend] = {
+                    "calls": usage["calls"],
+                    "failures": usage["failures"],
+                    "mean_sec": float(latencies.mean()) if latencies.size else 0.0,
+                    "p90_sec": (
+                        float(np.percentile(latencies, 90)) if latencies.size else 0.0
+                    ),
+                }
+        stats["quota_spent"] = self.ledger.spent()
+        stats["quota_remaining"] = self.ledger.remaining()
+        return stats
+
+    def report(self):
+        stats = self.stats()
+        for backend in ("api", "yt_dlp"):
+            usage = stats[backend]
+            print(
+                f"YouTube search [{backend}]: {usage['calls']} calls, "
+                f"{usage['failures']} failed, mean {usage['mean_sec']:.2f}s, "
+                f"p90 {usage['p90_sec']:.2f}s"
+            )
+        print(
+            f"YouTube Data API quota: {stats['quota_spent']} units spent today, "
+            f"{stats['quota_remaining']} remaining."
+        )
+        return stats
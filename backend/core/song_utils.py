@@ -7,13 +7,39 @@ from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
 from backend import config
+from backend.core import tracing
 
 # Load environment variables
 load_dotenv()
 
 
+class GeniusRequestError(Exception):
+    """
+    A Genius lookup failed (network error, 429/5xx response, invalid JSON),
+    as opposed to Genius not having the song.
+    """
+
+
+def normalize_track_key(artist, track_name):
+    """
+    Returns a case- and whitespace-insensitive (artist, track_name) key.
+    Only the first artist of a ';'-separated artists field is kept.
+    """
+    artist = " ".join(str(artist).split(";")[0].lower().split())
+    track_name = " ".join(str(track_name).lower().split())
+    return artist, track_name
+
+
 class SongContextGenerator:
-    def __init__(self, genius_api_key=None, timeout=15, verbose=False):
+    def __init__(
+        self,
+        genius_api_key=None,
+        timeout=15,
+        verbose=False,
+        negative_cache=None,
+        rate_limiter=None,
+        api_base_url="https://api.genius.com",
+    ):
         """
         Initializes the SongContextGenerator class.
 
@@ -21,8 +47,17 @@ class SongContextGenerator:
             genius_api_key (str): Genius API key .
             timeout (int): Timeout for Genius API requests.
             verbose (bool): controls verbosity.
+            negative_cache (NegativeCache): Optional cache of songs Genius
+                                            does not have.
+            rate_limiter (RateLimiter): Optional limiter shared by all workers
+                                        calling Genius concurrently.
+            api_base_url (str): Genius API root (overridden in offline tests).
         """
         self.verbose = verbose or config.VERBOSE
+        self.negative_cache = negative_cache
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.api_base_url = api_base_url.rstrip("/")
 
         # Set Genius API key
         if genius_api_key is None:
@@ -36,15 +71,25 @@ class SongContextGenerator:
         #     genius_api_key, timeout=timeout, verbose=self.verbose
         # )
 
+    def _get(self, url, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        with tracing.span("genius.request", kind="client") as span:
+            response = requests.get(url, timeout=self.timeout, **kwargs)
+            span.set_attributes(status_code=str(response.status_code))
+        return response
+
     def search_song(self, title, artist):
         headers = {"Authorization": f"Bearer {self.genius_api_key}"}
-        search_url = f"https://api.genius.com/search?q={artist}%20{title}"
+        search_url = f"{self.api_base_url}/search?q={artist}%20{title}"
 
-        response = requests.get(search_url, headers=headers)
+        response = self._get(search_url, headers=headers)
         if response.status_code != 200:
             if self.verbose:
                 print(f"Genius API explicitly failed: {response.status_code}")
-            return None
+            raise GeniusRequestError(
+                f"Genius search returned HTTP {response.status_code}"
+            )
 
         data = response.json()
         hits = data.get("response", {}).get("hits", [])
@@ -52,6 +97,8 @@ class SongContextGenerator:
         if not hits:
             if self.verbose:
                 print("No song matches found explicitly")
+            if self.negative_cache is not None:
+                self.negative_cache.add(artist, title)
             return None
 
         # Pick the best match
@@ -70,8 +117,15 @@ class SongContextGenerator:
     import requests
     from bs4 import BeautifulSoup
 
+    @staticmethod
+    def _raise_for_failure(response):
+        # rate limited or server errors are failures, not missing pages
+        if response.status_code == 429 or response.status_code >= 500:
+            raise GeniusRequestError(f"Genius returned HTTP {response.status_code}")
+
     def get_lyrics_from_url(self, song_url):
-        page = requests.get(song_url)
+        page = self._get(song_url)
+        self._raise_for_failure(page)
         if page.status_code != 200:
             if self.verbose:
                 print(f"Failed to retrieve lyrics page explicitly: {page.status_code}")
@@ -110,7 +164,8 @@ class SongContextGenerator:
         """
         Fetches song description from Genius URL.
         """
-        response = requests.get(song_url)
+        response = self._get(song_url)
+        self._raise_for_failure(response)
         soup = BeautifulSoup(response.text, "html.parser")
         description_div = soup.find(
             "div", class_=lambda x: x and x.startswith("RichText__Container")
@@ -121,13 +176,21 @@ class SongContextGenerator:
             else "No description found."
         )
 
-    def generate_song_context(self, artist, track_name):
+    def generate_song_context(
+        self, artist, track_name, check_negative_cache=True, raise_errors=False
+    ):
         """
         Generates a comprehensive textual context for a song.
 
         Parameters:
             artist (str): Name of the song's artist.
             track_name (str): Name of the song.
+            check_negative_cache (bool): Skip the Genius round trips for songs
+                                         recorded as missing. Callers that
+                                         already checked the cache pass False.
+            raise_errors (bool): Raise GeniusRequestError when the lookup
+                                 fails instead of returning None, so callers
+                                 can retry failures but not misses.
 
         Returns :
             str or None: Complete textual context (track_name, artist, album,
@@ -144,23 +207,38 @@ class SongContextGenerator:
             )
             description = "Make love not war"
         else:
+            if (
+                check_negative_cache
+                and self.negative_cache is not None
+                and self.negative_cache.contains(artist, track_name)
+            ):
+                if self.verbose:
+                    print(f"'{track_name}' by '{artist}' is a known Genius miss.")
+                return None
+
             try:
                 # song = self.genius.search_song(title=track_name, artist=artist)
                 song = self.search_song(title=track_name, artist=artist)
+                if song:
+                    description = self.get_song_description(song.url)
 
             except requests.exceptions.RequestException as e:
                 print(f"Network-related error during Genius API call: {str(e)}")
+                if raise_errors:
+                    raise GeniusRequestError(str(e)) from e
                 return None
             except json.JSONDecodeError as e:
                 print(f"JSON decoding error from Genius API: {str(e)}")
+                if raise_errors:
+                    raise GeniusRequestError(str(e)) from e
                 return None
             except Exception as e:
                 print(f"Unexpected error from Genius API: {str(e)}")
+                if raise_errors:
+                    raise GeniusRequestError(str(e)) from e
                 return None
 
-            if song:
-                description = self.get_song_description(song.url)
-            else:
+            if not song:
                 if self.verbose:
                     print(f"Genius did not find '{track_name}' by '{artist}'.")
                 return None
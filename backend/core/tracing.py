@@ -0,0 +1,372 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import SpanContext, SpanKind, TraceFlags
+from opentelemetry.trace.status import Status, StatusCode
+
+from backend import config
+
+# innermost open span of the calling context (thread or pool task)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, kind="internal", attributes=None):
+        """
+        A timed stage of a trace. Spans nest through the calling context, so
+        a span opened while another is open becomes its child.
+
+        Parameters:
+            name (str): Stage name, e.g. "planning" or "openai.chat".
+            parent (Span): Enclosing span, None for the root of a trace.
+            kind (str): "internal" for pipeline stages, "client" for
+                        outbound calls (OpenAI, Genius, YouTube, ...).
+            attributes (dict): e.g. token or track counts.
+        """
+        self.name = name
+        self.parent = parent
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.error = None
+        self.start_time = time.time()
+        self.duration_sec = None
+        self._started = time.perf_counter()
+        # children are added by concurrent actions and pool workers
+        self._lock = threading.Lock()
+        if parent is not None:
+            with parent._lock:
+                parent.children.append(self)
+
+    def set_attributes(self, **attributes):
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.duration_sec = time.perf_counter() - self._started
+
+    def iter_spans(self):
+        """
+        Yields this span and its descendants, depth first.
+        """
+        yield self
+        with self._lock:
+            children = list(self.children)
+        for child in children:
+            yield from child.iter_spans()
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_sec": self.duration_sec,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoSpan:
+    """
+    Stands in for a span outside of any trace, so instrumented code costs
+    next to nothing when nothing is traced.
+    """
+
+    def set_attributes(self, **attributes):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current_span():
+    return _current_span.get()
+
+
+def set_attributes(**attributes):
+    """
+    Sets attributes on the innermost open span, if any.
+    """
+    span_ = _current_span.get()
+    if span_ is not None:
+        span_.set_attributes(**attributes)
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """
+    Times the enclosed block as a child of the current span. Outside of a
+    trace (see `trace`) nothing is recorded.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield _NO_SPAN
+        return
+    child = Span(name, parent=parent, kind=kind, attributes=attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(error=e)
+        raise
+    else:
+        child.end()
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace(name, exporter=None, **attributes):
+    """
+    Starts a trace rooted at a span `name`, exported when it ends. Inside
+    an open trace it is a nested span instead.
+
+    Parameters:
+        exporter: JsonLinesExporter, OtlpExporter, or False to export
+                  nothing. Defaults to default_exporter().
+
+    Yields:
+        Span: The root span, see summarize.
+    """
+    if _current_span.get() is not None:
+        with span(name, **attributes) as nested:
+            yield nested
+        return
+
+    root = Span(name, attributes=attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.end(error=e)
+        raise
+    else:
+        root.end()
+    finally:
+        _current_span.reset(token)
+        exporter = default_exporter() if exporter is None else exporter
+        if exporter:
+            try:
+                exporter.export(list(root.iter_spans()))
+            except Exception as e:
+                # tracing never fails the traced request
+                print(f"Failed to export trace {root.trace_id}: {e}")
+
+
+def propagate(fn):
+    """
+    Wraps `fn` to run in the calling context, so the spans it opens from a
+    pool thread nest under the current span (threads do not inherit
+    context variables).
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # one copy per call: a context can only be entered by one thread
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def summarize(root):
+    """
+    Compact summary of a finished trace, e.g. for a job record: the
+    pipeline stages with their durations and attributes, and the outbound
+    calls aggregated per name.
+
+    Returns:
+        dict: 'trace_id', 'duration_sec', 'stages' (list of 'name',
+              'duration_sec', 'attributes' and 'error' when set) and
+              'calls' (name -> 'count', 'errors', 'total_sec', 'max_sec'
+              and the summed numeric attributes, e.g. tokens).
+    """
+    if root is None:
+        return None
+    stages = []
+    calls = {}
+    for span_ in root.iter_spans():
+        duration = round(span_.duration_sec or 0.0, 4)
+        if span_.kind != "client":
+            stage = {
+                "name": span_.name,
+                "duration_sec": duration,
+                "attributes": span_.attributes,
+            }
+            if span_.error:
+                stage["error"] = span_.error
+            stages.append(stage)
+            continue
+        call = calls.setdefault(
+            span_.name, {"count": 0, "errors": 0, "total_sec": 0.0, "max_sec": 0.0}
+        )
+        call["count"] += 1
+        call["errors"] += span_.error is not None
+        call["total_sec"] = round(call["total_sec"] + duration, 4)
+        call["max_sec"] = max(call["max_sec"], duration)
+        for key, value in span_.attributes.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                call[key] = call.get(key, 0) + value
+    return {
+        "trace_id": root.trace_id,
+        "duration_sec": round(root.duration_sec or 0.0, 4),
+        "stages": stages,
+        "calls": calls,
+    }
+
+
+class JsonLinesExporter:
+    def __init__(self, path=None):
+        """
+        Appends one JSON line per span (see Span.to_dict).
+
+        Parameters:
+            path (str or Path): Defaults to config.TRACE_JSONL_PATH
+                                (/tmp on Lambda).
+        """
+        if path is None:
+            path = (
+                Path("/tmp") / config.TRACE_JSONL_PATH.name
+                if os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+                else config.TRACE_JSONL_PATH
+            )
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = "".join(
+            json.dumps(span_.to_dict(), default=str) + "\n" for span_ in spans
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otel_attribute(value):
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class OtlpExporter:
+    # OpenTelemetry span kinds
+    KINDS = {"internal": SpanKind.INTERNAL, "client": SpanKind.CLIENT}
+
+    def __init__(
+        self, endpoint=None, service_name="fitbeat", timeout=2, span_exporter=None
+    ):
+        """
+        Sends spans to an OpenTelemetry collector with the OpenTelemetry SDK:
+        an OTLP/gRPC OTLPSpanExporter behind a BatchSpanProcessor, so spans
+        are exported from a background thread (see flush).
+
+        Parameters:
+            endpoint (str): Defaults to config.TRACE_OTLP_ENDPOINT.
+            timeout (int): Seconds per export request.
+            span_exporter (SpanExporter): SDK exporter used instead of OTLP.
+        """
+        if span_exporter is None:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+                OTLPSpanExporter,
+            )
+
+            span_exporter = OTLPSpanExporter(
+                endpoint=config.TRACE_OTLP_ENDPOINT if endpoint is None else endpoint,
+                timeout=timeout,
+            )
+        self.resource = Resource.create({"service.name": service_name})
+        self.scope = InstrumentationScope("backend.core.tracing")
+        self.processor = BatchSpanProcessor(span_exporter)
+
+    @staticmethod
+    def _context(span_):
+        return SpanContext(
+            trace_id=int(span_.trace_id, 16),
+            span_id=int(span_.span_id, 16),
+            is_remote=False,
+            trace_flags=TraceFlags(TraceFlags.SAMPLED),
+        )
+
+    def readable_spans(self, spans):
+        """
+        Converts spans to SDK ReadableSpans.
+        """
+        readable = []
+        for span_ in spans:
+            start_ns = int(span_.start_time * 1e9)
+            readable.append(
+                ReadableSpan(
+                    name=span_.name,
+                    context=self._context(span_),
+                    parent=self._context(span_.parent) if span_.parent else None,
+                    resource=self.resource,
+                    attributes={
+                        key: _otel_attribute(value)
+                        for key, value in span_.attributes.items()
+                    },
+                    kind=self.KINDS.get(span_.kind, SpanKind.INTERNAL),
+                    status=(
+                        Status(StatusCode.ERROR, span_.error)
+                        if span_.error
+                        else Status(StatusCode.UNSET)
+                    ),
+                    start_time=start_ns,
+                    end_time=start_ns + int((span_.duration_sec or 0) * 1e9),
+                    instrumentation_scope=self.scope,
+                )
+            )
+        return readable
+
+    def export(self, spans):
+        for readable in self.readable_spans(spans):
+            self.processor.on_end(readable)
+
+    def flush(self, timeout_millis=5000):
+        """
+        Exports the queued spans, e.g. before a Lambda container is frozen.
+        """
+        return self.processor.force_flush(timeout_millis)
+
+
+# one OTLP exporter (and its export thread) per process
+_otlp_exporter = None
+_otlp_lock = threading.Lock()
+
+
+def default_exporter():
+    """
+    Exporter selected by config.TRACE_EXPORTER ("jsonl", "otlp" or None).
+    """
+    if config.TRACE_EXPORTER == "jsonl":
+        return JsonLinesExporter()
+    global _otlp_exporter
+    if config.TRACE_EXPORTER == "otlp":
+        with _otlp_lock:
+            if _otlp_exporter is None:
+                _otlp_exporter = OtlpExporter()
+        return _otlp_exporter
+    return None
+
+
+def flush():
+    """
+    Exports the spans still queued by the OTLP exporter, if any.
+    """
+    if _otlp_exporter is not None:
+        _otlp_exporter.flush()
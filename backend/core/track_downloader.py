@@ -1,17 +1,56 @@
+import glob
 import os
 import re
+import shutil
 import subprocess
 from pathlib import Path
 
 from yt_dlp import YoutubeDL
 
 from backend import config
+from backend.core import tracing
+from backend.core.audio_cache import AudioCache
+from backend.core.download_pipeline import DownloadPipeline, print_pipeline_report
+from backend.core.track_resolver import youtube_link
+
+# Output formats: codec of compatible sources (stream-copied), encoder
+# arguments otherwise, and the yt-dlp format preferring compatible sources
+AUDIO_FORMATS = {
+    "mp3": {
+        "codec": "mp3",
+        "encoder": ["-acodec", "libmp3lame"],
+        "format": "bestaudio[acodec=mp3]/bestaudio/best",
+    },
+    "m4a": {
+        "codec": "mp4a",
+        "encoder": ["-acodec", "aac"],
+        "format": "bestaudio[ext=m4a]/bestaudio/best",
+    },
+}
+STREAMABLE_PROTOCOLS = ("http", "https")
+
+
+def ffmpeg_audio_args(source_codec, output_format):
+    """
+    Returns the ffmpeg audio codec arguments converting a `source_codec`
+    stream (as reported by yt-dlp, e.g. "opus" or "mp4a.40.2") to
+    `output_format`: a stream copy when the codec already matches, a
+    transcode otherwise (or when the codec is unknown).
+    """
+    output = AUDIO_FORMATS[output_format]
+    if source_codec and source_codec.split(".")[0] == output["codec"]:
+        return ["-acodec", "copy"]
+    return list(output["encoder"])
 
 
 class TrackDownloader:
-    def __init__(self):
+    def __init__(self, audio_cache=None):
         self.ffmpeg_path = config.FFMPEG_PATH
         self.TRACKS_DIR = config.TRACKS_DIR
+        # songs converted once are linked into later playlists
+        if audio_cache is None and config.AUDIO_CACHE_ENABLED:
+            audio_cache = AudioCache()
+        self.audio_cache = audio_cache
 
     def _safe_filename(self, track_name, artist_name, track_index=None):
         safe_name = re.sub(r'[\\/*?:"<>|]', "_", f"{artist_name} - {track_name}")
@@ -19,89 +58,411 @@ class TrackDownloader:
             return f"{track_index:02d} - {safe_name}"
         return safe_name
 
-    # TODO: replace by unittest.mock
-    def download_and_convert(
-        self, track_name, artist_name, subfolder, track_index=None
+    def fetch_audio(
+        self, track_name, artist_name, save_folder, filename_safe, video_id=None
     ):
-        filename_safe = self._safe_filename(track_name, artist_name, track_index)
-        save_folder = Path(subfolder)
-        save_folder.mkdir(parents=True, exist_ok=True)
-        output_mp3 = save_folder / f"{filename_safe}.mp3"
+        """
+        Resolves a YouTube video (`video_id`, or else the top search result)
+        to an audio source (network-bound).
 
-        # Check if the file already exists
-        if output_mp3.exists():
-            print(f"'{output_mp3.name}' already exists, skipping download.")
-            return
+        yt-dlp is asked for a format already in the output codec when one
+        exists, and downloads it to `save_folder` in its native container.
+        An interrupted download keeps its yt-dlp .part file and the next
+        attempt resumes it.
 
+        With config.STREAM_TO_FFMPEG, a plain HTTP(S) stream is not
+        downloaded at all: ffmpeg reads it directly, so no intermediate
+        file is written, but an interrupted track restarts from zero. A
+        partial download left by an earlier attempt is still resumed.
+
+        Returns:
+            dict: {"url", "http_headers", "acodec", "duration"} for a
+                  streamed source or {"path", "acodec", "duration"} for a
+                  downloaded file.
+        """
         query = f"{track_name} {artist_name} audio"
+        ydl_opts = {
+            "format": AUDIO_FORMATS[config.AUDIO_OUTPUT_FORMAT]["format"],
+            # distinct from the converted file, even for a source in the
+            # output format
+            "outtmpl": f"{save_folder}/{filename_safe}.source.%(ext)s",
+            "quiet": True,
+            # an interrupted download resumes from its .part file
+            "continuedl": True,
+            "nopart": False,
+            "retries": config.DOWNLOAD_RETRIES,
+        }
+
+        target = youtube_link(video_id) if video_id else f"ytsearch1:{query}"
+        with (
+            tracing.span("youtube.fetch", kind="client") as span,
+            YoutubeDL(ydl_opts) as ydl,
+        ):
+            info = ydl.extract_info(target, download=False)
+            if "entries" in info:
+                info = info["entries"][0]
+
+            if (
+                config.STREAM_TO_FFMPEG
+                and not self.has_partial_source(save_folder, filename_safe)
+                and info.get("url")
+                and info.get("protocol") in STREAMABLE_PROTOCOLS
+            ):
+                span.set_attributes(streamed=True)
+                return {
+                    "url": info["url"],
+                    "http_headers": info.get("http_headers") or {},
+                    "acodec": info.get("acodec"),
+                    "duration": info.get("duration"),
+                }
+
+            span.set_attributes(streamed=False)
+            # downloads the format extracted above, without extracting the
+            # video a second time
+            info = ydl.process_ie_result(info, download=True)
+            downloads = info.get("requested_downloads") or [{}]
+            downloaded_file = Path(
+                downloads[0].get("filepath") or ydl.prepare_filename(info)
+            )
+
+        return {
+            "path": downloaded_file,
+            "acodec": info.get("acodec"),
+            "duration": info.get("duration"),
+        }
+
+    @staticmethod
+    def has_partial_source(save_folder, filename_safe):
+        """
+        Whether an interrupted yt-dlp download of the track can be resumed.
+        """
+        pattern = f"{glob.escape(filename_safe)}.source.*.part"
+        return any(Path(save_folder).glob(pattern))
+
+    @staticmethod
+    def partial_path(output_path):
+        output_path = Path(output_path)
+        return output_path.with_name(f"{output_path.stem}.part{output_path.suffix}")
+
+    def probe_duration(self, path):
+        """
+        Returns the duration in seconds ffmpeg reads from the headers of
+        `path` (without decoding it), or None if it is not valid audio.
+        """
+        try:
+            result = subprocess.run(
+                [self.ffmpeg_path, "-nostdin", "-hide_banner", "-i", str(path)],
+                capture_output=True,
+                text=True,
+            )
+        except OSError:
+            return None
+        match = re.search(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)", result.stderr)
+        if match is None:
+            return None
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def verify_audio(self, path, expected_duration=None):
+        """
+        Lightweight integrity check of a converted file: non-empty, readable
+        by ffmpeg and, when the source duration is known, not truncated.
+        Without ffmpeg (e.g. CI), only the size is checked.
+        """
+        path = Path(path)
+        if not path.exists() or path.stat().st_size == 0:
+            return False
+        if not Path(self.ffmpeg_path).exists() and not shutil.which(
+            str(self.ffmpeg_path)
+        ):
+            return True
+
+        duration = self.probe_duration(path)
+        if duration is None or duration <= 0:
+            return False
+        if expected_duration:
+            tolerance = max(
+                config.DURATION_TOLERANCE_SEC, 0.02 * float(expected_duration)
+            )
+            return duration >= float(expected_duration) - tolerance
+        return True
+
+    def convert_audio(self, source, output_path):
+        """
+        Writes `source` (see fetch_audio) to `output_path` with ffmpeg,
+        stream-copying when the source codec already matches the output
+        format and encoding otherwise. A downloaded source file is removed.
+
+        ffmpeg writes a .part file that is verified (see verify_audio) and
+        then renamed into place, so an interrupted conversion never leaves
+        a truncated file at `output_path`.
+        """
+        if isinstance(source, (str, Path)):
+            source = {"path": source}
+        output_path = Path(output_path)
+        partial_path = self.partial_path(output_path)
+
+        command = [self.ffmpeg_path, "-nostdin"]
+        if "url" in source:
+            headers = "".join(
+                f"{name}: {value}\r\n"
+                for name, value in source.get("http_headers", {}).items()
+            )
+            if headers:
+                command += ["-headers", headers]
+            # reconnect dropped HTTP streams instead of ending the track early
+            command += [
+                "-reconnect",
+                "1",
+                "-reconnect_streamed",
+                "1",
+                "-reconnect_delay_max",
+                "5",
+            ]
+            command += ["-i", source["url"]]
+        else:
+            command += ["-i", str(source["path"])]
+        command += ["-vn"]
+        command += ffmpeg_audio_args(source.get("acodec"), config.AUDIO_OUTPUT_FORMAT)
+        command += ["-y", str(partial_path)]
+
+        try:
+            with tracing.span(
+                "ffmpeg.convert",
+                kind="client",
+                source="stream" if "url" in source else "file",
+            ):
+                subprocess.run(
+                    command,
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            if not self.verify_audio(partial_path, source.get("duration")):
+                raise RuntimeError(f"'{output_path.name}' failed the integrity check")
+        except BaseException:
+            partial_path.unlink(missing_ok=True)
+            raise
+        os.replace(partial_path, output_path)
+
+        if "path" in source:
+            Path(source["path"]).unlink(missing_ok=True)
+
+    def _fetch_job(self, job):
+        """
+        Network stage of retrieve_and_convert. Returns the audio source, or
+        None if there is nothing to convert.
+        """
+        output_path = job["output_path"]
+
+        # leftover of a conversion interrupted by a crashed worker (an
+        # interrupted download keeps its own .part file, see fetch_audio)
+        self.partial_path(output_path).unlink(missing_ok=True)
+
+        # Check if the file already exists (and is not a truncated leftover)
+        if output_path.exists():
+            if self.verify_audio(output_path):
+                print(f"'{output_path.name}' already exists, skipping download.")
+                job["status"] = "skipped"
+                return None
+            print(f"'{output_path.name}' is incomplete, downloading it again.")
+            output_path.unlink()
 
         # for CI/CD tests (GitActions)
         if os.getenv("GITHUB_ACTIONS") == "true":
             print(
-                f"Skipping actual YouTube download for query '{query}'"
-                f" in GitHub Actions."
+                f"Skipping actual YouTube download for "
+                f"'{job['artist']} - {job['track_name']}' in GitHub Actions."
             )
             # create a dummy mp3 file to simulate the process
-            with open(output_mp3, "wb") as f:
+            with open(output_path, "wb") as f:
                 f.write(b"\0")  # write empty content or dummy bytes
+            job["status"] = "downloaded"
+            return None
 
-        else:
-            ydl_opts = {
-                "format": "bestaudio/best",
-                "outtmpl": f"{save_folder}/{filename_safe}.%(ext)s",
-                "quiet": True,
-            }
-
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([f"ytsearch1:{query}"])
-
-            # find the downloaded file
-            downloaded_file = next(save_folder.glob(f"{filename_safe}.*"))
-
-            subprocess.run(
-                [
-                    self.ffmpeg_path,
-                    "-i",
-                    str(downloaded_file),
-                    "-vn",
-                    "-acodec",
-                    "libmp3lame",
-                    "-y",
-                    str(output_mp3),
-                ],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
+        # the video found for the recommendation table, if any
+        if job["resolver"] is not None:
+            job["video_id"] = job["resolver"].resolve(job["artist"], job["track_name"])
+        job["cache_key"] = self._cache_key(job)
+
+        if job["cache_key"] and self.audio_cache.link_into(
+            job["cache_key"], output_path
+        ):
+            print(f"'{output_path.name}' linked from the audio cache.")
+            job["status"] = "cached"
+            return None
+
+        return self.fetch_audio(
+            job["track_name"],
+            job["artist"],
+            job["folder"],
+            job["filename"],
+            video_id=job["video_id"],
+        )
+
+    def _transcode_job(self, job, source):
+        """
+        CPU stage of retrieve_and_convert.
+        """
+        self.convert_audio(source, job["output_path"])
+        if job["cache_key"]:
+            self.audio_cache.add(job["cache_key"], job["output_path"])
+        job["status"] = "downloaded"
+        print(f"Downloaded and converted: {job['output_path'].name}")
+
+    def _cache_key(self, job):
+        """
+        AudioCache key of a job: its Spotify track_id, else its video id.
+        """
+        if self.audio_cache is None:
+            return None
+        content_id = job["track_id"] if isinstance(job["track_id"], str) else None
+        content_id = content_id or job["video_id"]
+        return f"{content_id}.{config.AUDIO_OUTPUT_FORMAT}" if content_id else None
 
-            downloaded_file.unlink(missing_ok=True)
+    def _make_job(
+        self,
+        track_name,
+        artist_name,
+        subfolder,
+        track_index=None,
+        track_id=None,
+        resolver=None,
+    ):
+        filename_safe = self._safe_filename(track_name, artist_name, track_index)
+        save_folder = Path(subfolder)
+        save_folder.mkdir(parents=True, exist_ok=True)
+        return {
+            "track_number": track_index,
+            "artist": artist_name,
+            "track_name": track_name,
+            "folder": save_folder,
+            "filename": filename_safe,
+            "output_path": save_folder
+            / f"{filename_safe}.{config.AUDIO_OUTPUT_FORMAT}",
+            "track_id": track_id,
+            "resolver": resolver,
+            "video_id": None,
+            "cache_key": None,
+            "status": None,
+        }
 
-        print(f"Downloaded and converted: {output_mp3.name}")
+    # TODO: replace by unittest.mock
+    def download_and_convert(
+        self,
+        track_name,
+        artist_name,
+        subfolder,
+        track_index=None,
+        track_id=None,
+        resolver=None,
+    ):
+        job = self._make_job(
+            track_name,
+            artist_name,
+            subfolder,
+            track_index,
+            track_id=track_id,
+            resolver=resolver,
+        )
+        source = self._fetch_job(job)
+        if source is not None:
+            self._transcode_job(job, source)
+        elif job["status"] == "downloaded":
+            print(f"Downloaded and converted: {job['output_path'].name}")
+        return job["status"]
 
-    def retrieve_and_convert(self, tracks, folder_name):
+    def retrieve_and_convert(
+        self, tracks, folder_name, max_workers=None, resolver=None
+    ):
         """
-        Retrieves audio tracks from YouTube and converts them to MP3 format.
+        Retrieves audio tracks from YouTube and converts them to MP3 format
+        (config.AUDIO_OUTPUT_FORMAT).
+        Downloads (network pool) and ffmpeg conversions (CPU pool) run as a
+        pipeline, see DownloadPipeline.
         Parameters:
             tracks (pd.DataFrame): Tracks to retrieve and convert.
             folder_name (str): Folder name for storing MP3 files.
+            max_workers (int): Concurrent downloads.
+                               Defaults to config.DOWNLOAD_WORKERS.
+            resolver (TrackResolver): Per-request resolver shared with the
+                                      recommendation table; tracks are then
+                                      fetched by video id without a search.
         Returns:
-            None
+            dict: Summary with 'total', 'downloaded', 'cached' (linked from
+                  the AudioCache), 'skipped', 'failed' counts, 'failures'
+                  (track number, artist, track name, error), 'elapsed_sec'
+                  and the per-stage pipeline 'stages'.
         Notes:
             - Skips downloading if a track file already exists.
-            - Logs each successful download and conversion.
+            - Track numbers follow the order of `tracks`, whatever order
+              the downloads finish in.
+            - A failing track is reported and does not stop the others.
         """
-        folder_path = os.path.join(config.TRACKS_DIR, folder_name)
+        if max_workers is None:
+            max_workers = config.DOWNLOAD_WORKERS
+        folder_path = os.path.join(self.TRACKS_DIR, folder_name)
         os.makedirs(folder_path, exist_ok=True)
         print(
             f"\nDownloading recommended tracks and converting to MP3...\n"
             f"Saving playlist to folder: '{folder_path}'\n"
         )
-        for idx, track in enumerate(tracks.itertuples()):
-            track_number = idx + 1
-            self.download_and_convert(
-                track.track_name, track.artists, folder_path, track_index=track_number
+
+        jobs = [
+            self._make_job(
+                track.track_name,
+                track.artists,
+                folder_path,
+                track_index=track_number,
+                track_id=getattr(track, "track_id", None),
+                resolver=resolver,
+            )
+            for track_number, track in enumerate(tracks.itertuples(), start=1)
+        ]
+        cpu_workers = config.TRANSCODE_WORKERS
+        if cpu_workers is None and config.STREAM_TO_FFMPEG:
+            # streamed sources are downloaded by ffmpeg in the CPU stage
+            cpu_workers = max(os.cpu_count() or 1, max_workers)
+        pipeline = DownloadPipeline(
+            fetch=self._fetch_job,
+            transcode=self._transcode_job,
+            network_workers=max_workers,
+            cpu_workers=cpu_workers,
+        )
+        stages = pipeline.run(jobs)
+
+        failures = []
+        for job, stage, error in stages["failures"]:
+            print(f"Failed to {stage} '{job['artist']} - {job['track_name']}': {error}")
+            job["status"] = "failed"
+            failures.append(
+                (job["track_number"], job["artist"], job["track_name"], str(error))
             )
 
+        summary = {
+            "total": len(jobs),
+            "downloaded": 0,
+            "cached": 0,
+            "skipped": 0,
+            "failed": 0,
+        }
+        for job in jobs:
+            summary[job["status"]] += 1
+        summary["failures"] = sorted(failures)
+        summary["elapsed_sec"] = stages["elapsed_sec"]
+        summary["stages"] = stages
+
+        print(
+            f"\nDownloads finished in {summary['elapsed_sec']:.1f}s: "
+            f"{summary['downloaded']} downloaded, {summary['cached']} from the "
+            f"audio cache, {summary['skipped']} already present, "
+            f"{summary['failed']} failed (of {summary['total']})."
+        )
+        print_pipeline_report(stages)
+        if self.audio_cache is not None:
+            self.audio_cache.report()
+        return summary
+
 
 #  Example Usage:
 if __name__ == "__main__":
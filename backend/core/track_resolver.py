@@ -0,0 +1,151 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import config
+from backend.core import tracing
+from backend.core.song_utils import normalize_track_key
+
+
+def youtube_link(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}" if video_id else None
+
+
+class TrackResolver:
+    def __init__(self, search, max_workers=None, cache=None):
+        """
+        Per-request resolution of (artist, track) to a YouTube video id,
+        shared by the recommendation table, the downloader and Summarize so
+        that each track is searched once.
+
+        Parameters:
+            search (callable): search(query) -> video id or None, e.g.
+                               YouTubeSearcher.search_video_id.
+            max_workers (int): Concurrent searches in resolve_many.
+                               Defaults to config.YOUTUBE_SEARCH_WORKERS.
+            cache (VideoIdCache): Persistent video ids consulted before
+                                  searching and filled with new results.
+        """
+        self.search = search
+        self.cache = cache
+        self.max_workers = (
+            config.YOUTUBE_SEARCH_WORKERS if max_workers is None else max_workers
+        )
+        self.searches = 0
+        self._video_ids = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._callback_lock = threading.Lock()
+
+    @staticmethod
+    def query_for(artist, track_name):
+        return f"{artist} {track_name}"
+
+    def resolve(self, artist, track_name, track_id=None):
+        """
+        Returns the video id of a track, searching only on the first call
+        (and only if the persistent cache has no entry for it).
+        Concurrent callers for the same track wait for a single search.
+        """
+        return self._resolve(artist, track_name, track_id, use_cache=True)
+
+    def _resolve(self, artist, track_name, track_id, use_cache):
+        key = normalize_track_key(artist, track_name)
+        with self._lock:
+            if key in self._video_ids:
+                return self._video_ids[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._video_ids:
+                    return self._video_ids[key]
+
+            cache_key = video_id = None
+            if self.cache is not None and use_cache:
+                cache_key = self.cache.make_key(artist, track_name, track_id)
+                video_id = self.cache.get_many([cache_key]).get(cache_key)
+            if video_id is None:
+                video_id = self.search(self.query_for(artist, track_name))
+                with self._lock:
+                    self.searches += 1
+                if cache_key is not None:
+                    self.cache.put_many({cache_key: video_id})
+
+            with self._lock:
+                self._video_ids[key] = video_id
+        return video_id
+
+    def resolved(self, artist, track_name):
+        """
+        Returns the video id if the track was already resolved, without
+        searching.
+        """
+        with self._lock:
+            return self._video_ids.get(normalize_track_key(artist, track_name))
+
+    def resolve_many(self, tracks, on_resolved=None):
+        """
+        Resolves every row of a tracks DataFrame ('artists', 'track_name',
+        optionally 'track_id'): cached video ids are read in one bulk
+        lookup, the rest is searched with up to `max_workers` searches at
+        once and written back in bulk.
+
+        Parameters:
+            on_resolved (callable): on_resolved(position, video_id), called
+                                    as each row resolves (in completion
+                                    order, one call at a time).
+
+        Returns:
+            list: Video ids (or None) aligned with the rows of `tracks`.
+                  A row whose search fails is logged and left None.
+        """
+        track_ids = tracks["track_id"] if "track_id" in tracks else [None] * len(tracks)
+        rows = list(zip(tracks["artists"], tracks["track_name"], track_ids))
+
+        cache_keys = {}
+        if self.cache is not None:
+            cache_keys = {
+                normalize_track_key(artist, track_name): self.cache.make_key(
+                    artist, track_name, track_id
+                )
+                for artist, track_name, track_id in rows
+                if self.resolved(artist, track_name) is None
+            }
+            cached = self.cache.get_many(cache_keys.values())
+            with self._lock:
+                for key, cache_key in cache_keys.items():
+                    if cache_key in cached:
+                        self._video_ids.setdefault(key, cached[cache_key])
+
+        def resolve_row(position):
+            try:
+                video_id = self._resolve(*rows[position], use_cache=False)
+            except Exception as e:
+                # one failed search leaves only its row without a link
+                artist, track_name, _ = rows[position]
+                print(f"Failed to resolve '{artist} - {track_name}': {e}")
+                video_id = None
+            if on_resolved is not None:
+                with self._callback_lock:
+                    on_resolved(position, video_id)
+            return video_id
+
+        if self.max_workers <= 1 or len(rows) <= 1:
+            video_ids = [resolve_row(position) for position in range(len(rows))]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(rows))
+            ) as pool:
+                video_ids = list(
+                    pool.map(tracing.propagate(resolve_row), range(len(rows)))
+                )
+
+        if self.cache is not None:
+            self.cache.put_many(
+                {
+                    cache_key: self._video_ids.get(key)
+                    for key, cache_key in cache_keys.items()
+                    if cache_key not in cached
+                }
+            )
+        return video_ids
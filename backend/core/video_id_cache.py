@@ -0,0 +1,242 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from backend import config
+from backend.core.song_utils import normalize_track_key
+
+
+class VideoIdCacheBackend(abc.ABC):
+    """
+    Storage of VideoIdCache entries: key -> (video_id, created_at).
+    """
+
+    @abc.abstractmethod
+    def get_many(self, keys):
+        """
+        Returns {key: (video_id, created_at)} for the stored `keys`.
+        """
+
+    @abc.abstractmethod
+    def put_many(self, entries):
+        """
+        Stores `entries`, a {key: (video_id, created_at)} dict.
+        """
+
+    def delete_expired(self, oldest_created_at):
+        """
+        Removes entries created before `oldest_created_at`, if supported.
+        """
+        return 0
+
+
+class SQLiteVideoIdBackend(VideoIdCacheBackend):
+    # SQLite's default limit of host parameters per statement is 999
+    CHUNK_SIZE = 500
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS video_ids ("
+            "key TEXT PRIMARY KEY, video_id TEXT NOT NULL, created_at REAL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys):
+        keys = list(keys)
+        entries = {}
+        with self._lock:
+            for start in range(0, len(keys), self.CHUNK_SIZE):
+                chunk = keys[start : start + self.CHUNK_SIZE]
+                rows = self.conn.execute(
+                    "SELECT key, video_id, created_at FROM video_ids "
+                    f"WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                entries.update({key: (video_id, at) for key, video_id, at in rows})
+        return entries
+
+    def put_many(self, entries):
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO video_ids (key, video_id, created_at) "
+                "VALUES (?, ?, ?)",
+                [(key, video_id, at) for key, (video_id, at) in entries.items()],
+            )
+            self.conn.commit()
+
+    def delete_expired(self, oldest_created_at):
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM video_ids WHERE created_at < ?", (oldest_created_at,)
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM video_ids").fetchone()[0]
+
+
+class S3VideoIdBackend(VideoIdCacheBackend):
+    def __init__(self, bucket, prefix="video_ids/", s3_client=None, max_workers=8):
+        """
+        One small JSON object per key, shared by every Lambda container.
+
+        Parameters:
+            bucket (str): S3 bucket of the cache.
+            prefix (str): Key prefix of the cache objects.
+            s3_client: boto3 S3 client (or a stand-in with get_object and
+                       put_object). Created if omitted.
+            max_workers (int): Concurrent S3 requests in get_many/put_many.
+        """
+        if s3_client is None:
+            import boto3
+
+            s3_client = boto3.client("s3")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_workers = max_workers
+
+    def _object_key(self, key):
+        return f"{self.prefix}{quote(key, safe='')}.json"
+
+    def _get(self, key):
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket, Key=self._object_key(key)
+            )
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        except (ClientError, BotoCoreError) as e:
+            # throttling, permissions, network: a cache miss, not a failure
+            print(f"[VideoIdCache]: S3 read of '{key}' failed: {e}")
+            return None
+        entry = json.loads(response["Body"].read())
+        return entry["video_id"], entry["created_at"]
+
+    def _put(self, item):
+        key, (video_id, created_at) = item
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self._object_key(key),
+                Body=json.dumps({"video_id": video_id, "created_at": created_at}),
+                ContentType="application/json",
+            )
+        except (ClientError, BotoCoreError) as e:
+            print(f"[VideoIdCache]: S3 write of '{key}' failed: {e}")
+
+    def get_many(self, keys):
+        keys = list(keys)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            entries = list(pool.map(self._get, keys))
+        return {key: entry for key, entry in zip(keys, entries) if entry}
+
+    def put_many(self, entries):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(self._put, entries.items()))
+
+
+class VideoIdCache:
+    def __init__(self, backend=None, ttl_sec=None):
+        """
+        Persistent cache of YouTube search results, keyed by Spotify
+        track_id or by normalized artist/title, so popular tracks are
+        linked without spending search quota.
+
+        Parameters:
+            backend (VideoIdCacheBackend): Entry storage. Defaults to an
+                                           S3VideoIdBackend if the
+                                           VIDEO_ID_CACHE_BUCKET environment
+                                           variable is set, else SQLite at
+                                           config.VIDEO_ID_CACHE_PATH
+                                           (/tmp on Lambda).
+            ttl_sec (int): Seconds a cached video id stays valid.
+                           Defaults to config.VIDEO_ID_CACHE_TTL_SEC.
+        """
+        self.backend = self._default_backend() if backend is None else backend
+        self.ttl_sec = config.VIDEO_ID_CACHE_TTL_SEC if ttl_sec is None else ttl_sec
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _default_backend():
+        bucket = os.getenv("VIDEO_ID_CACHE_BUCKET")
+        if bucket:
+            return S3VideoIdBackend(bucket)
+        if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+            return SQLiteVideoIdBackend(Path("/tmp") / config.VIDEO_ID_CACHE_PATH.name)
+        return SQLiteVideoIdBackend(config.VIDEO_ID_CACHE_PATH)
+
+    @staticmethod
+    def make_key(artist, track_name, track_id=None):
+        if isinstance(track_id, str) and track_id:
+            return f"spotify:{track_id}"
+        return " - ".join(normalize_track_key(artist, track_name))
+
+    def get_many(self, keys):
+        """
+        Returns {key: video_id} for the non-expired entries of `keys`.
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        oldest = time.time() - self.ttl_sec
+        found = {
+            key: video_id
+            for key, (video_id, created_at) in self.backend.get_many(keys).items()
+            if created_at >= oldest
+        }
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, video_ids):
+        """
+        Stores a {key: video_id} dict. Searches without a result are not
+        cached, so they are retried on the next request.
+        """
+        now = time.time()
+        entries = {
+            key: (video_id, now) for key, video_id in video_ids.items() if video_id
+        }
+        if entries:
+            self.backend.put_many(entries)
+
+    def purge_expired(self):
+        return self.backend.delete_expired(time.time() - self.ttl_sec)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def report(self):
+        stats = self.stats()
+        print(
+            f"YouTube video id cache: {stats['hits']}/{stats['lookups']} hits "
+            f"({stats['hit_rate']:.0%})."
+        )
+        return stats
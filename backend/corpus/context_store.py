@@ -0,0 +1,331 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import zstandard
+
+from backend import config
+
+# SQLite limits the number of bound parameters per statement
+_MAX_QUERY_PARAMS = 900
+
+
+def song_id_for(artist, track_name):
+    """
+    Returns the deterministic corpus id of a song, as used for the
+    ChromaDB ids and the corpus metadata filenames.
+    """
+    return f"{artist} - {track_name}.txt"
+
+
+class SongContextStore:
+    def __init__(self, db_path=None, compression_level=10, read_only=False):
+        """
+        Compressed, indexed store of song contexts (track name, artist,
+        album, description and lyrics), keyed by Spotify track_id.
+
+        Contexts are stored as zstd-compressed blobs in a single SQLite file.
+        Songs without a known Spotify track_id (e.g. tracks added at runtime
+        from a user prompt) are keyed by their song id instead.
+
+        Parameters:
+            db_path (str or Path): SQLite file of the store.
+                                   Defaults to config.CONTEXT_STORE_PATH.
+            compression_level (int): zstd compression level for new contexts.
+            read_only (bool): Open an existing store in place as immutable,
+                              e.g. from the read-only Lambda image.
+        """
+        if db_path is None:
+            db_path = self._default_db_path()
+        self.db_path = Path(db_path)
+        self.compression_level = compression_level
+        self.read_only = read_only
+        self._lock = threading.Lock()
+
+        if read_only:
+            self.conn = sqlite3.connect(
+                f"{self.db_path.resolve().as_uri()}?mode=ro&immutable=1",
+                uri=True,
+                check_same_thread=False,
+            )
+            return
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS song_contexts ("
+            "track_id TEXT PRIMARY KEY, song_id TEXT NOT NULL, "
+            "artist TEXT, track_name TEXT, context BLOB NOT NULL, "
+            "updated_at REAL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_song_contexts_song_id "
+            "ON song_contexts (song_id)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _default_db_path():
+        if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+            return config.CONTEXT_STORE_PATH
+
+        # Lambda: a single-file copy to the writable /tmp
+        lambda_db_path = Path("/tmp") / config.CONTEXT_STORE_PATH.name
+        if not lambda_db_path.exists() and config.CONTEXT_STORE_PATH.exists():
+            shutil.copyfile(config.CONTEXT_STORE_PATH, lambda_db_path)
+        return lambda_db_path
+
+    def _compress(self, context):
+        compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        return compressor.compress(context.encode("utf-8"))
+
+    @staticmethod
+    def _decompress(blob):
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+
+    def put(self, track_id, artist, track_name, context):
+        self.put_many(
+            [
+                {
+                    "track_id": track_id,
+                    "artist": artist,
+                    "track_name": track_name,
+                    "context": context,
+                }
+            ]
+        )
+
+    def put_many(self, records):
+        """
+        Stores a batch of contexts in one transaction.
+
+        Parameters:
+            records (iterable of dict): Each with 'track_id' (or None),
+                                        'artist', 'track_name' and 'context'.
+        """
+        if self.read_only:
+            raise RuntimeError(f"Context store '{self.db_path}' is read-only.")
+        rows = []
+        now = time.time()
+        for record in records:
+            song_id = song_id_for(record["artist"], record["track_name"])
+            rows.append(
+                (
+                    record.get("track_id") or song_id,
+                    song_id,
+                    record["artist"],
+                    record["track_name"],
+                    self._compress(record["context"]),
+                    now,
+                )
+            )
+
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO song_contexts "
+                "(track_id, song_id, artist, track_name, context, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+
+    def _select_many(self, column, keys):
+        keys = list(dict.fromkeys(k for k in keys if k is not None))
+        contexts = {}
+        with self._lock:
+            for start in range(0, len(keys), _MAX_QUERY_PARAMS):
+                chunk = keys[start : start + _MAX_QUERY_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT {column}, context FROM song_contexts "
+                    f"WHERE {column} IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    contexts.setdefault(key, blob)
+        return {key: self._decompress(blob) for key, blob in contexts.items()}
+
+    def get(self, track_id):
+        return self.get_many([track_id]).get(track_id)
+
+    def get_many(self, track_ids):
+        """
+        Reads a batch of contexts by Spotify track_id.
+
+        Returns:
+            dict: track_id -> context, for the track_ids found in the store.
+        """
+        return self._select_many("track_id", track_ids)
+
+    def get_by_song_id(self, song_id):
+        return self.get_many_by_song_ids([song_id]).get(song_id)
+
+    def get_many_by_song_ids(self, song_ids):
+        """
+        Reads a batch of contexts by song id ("{artist} - {track_name}.txt").
+
+        Returns:
+            dict: song_id -> context, for the song ids found in the store.
+        """
+        return self._select_many("song_id", song_ids)
+
+    def contains(self, track_id):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM song_contexts WHERE track_id = ?", (track_id,)
+            ).fetchone()
+        return row is not None
+
+    def track_ids(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT track_id FROM song_contexts").fetchall()
+        return [row[0] for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            row = self.conn.execute("SELECT COUNT(*) FROM song_contexts").fetchone()
+        return row[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class OverlayContextStore:
+    def __init__(self, base, overlay):
+        """
+        Read-only base store (opened in place) with a small writable overlay
+        for contexts added at runtime. Reads check the overlay first.
+
+        Parameters:
+            base (SongContextStore): Shipped store, opened with read_only=True.
+            overlay (SongContextStore): Writable store, e.g. in /tmp.
+        """
+        self.base = base
+        self.overlay = overlay
+        self.db_path = overlay.db_path
+
+    def put(self, track_id, artist, track_name, context):
+        self.overlay.put(track_id, artist, track_name, context)
+
+    def put_many(self, records):
+        self.overlay.put_many(records)
+
+    def _merged(self, read_many, keys):
+        keys = list(keys)
+        contexts = read_many(self.overlay, keys)
+        contexts.update(
+            read_many(self.base, [key for key in keys if key not in contexts])
+        )
+        return contexts
+
+    def get(self, track_id):
+        return self.get_many([track_id]).get(track_id)
+
+    def get_many(self, track_ids):
+        return self._merged(SongContextStore.get_many, track_ids)
+
+    def get_by_song_id(self, song_id):
+        return self.get_many_by_song_ids([song_id]).get(song_id)
+
+    def get_many_by_song_ids(self, song_ids):
+        return self._merged(SongContextStore.get_many_by_song_ids, song_ids)
+
+    def contains(self, track_id):
+        return self.overlay.contains(track_id) or self.base.contains(track_id)
+
+    def track_ids(self):
+        return list(dict.fromkeys(self.base.track_ids() + self.overlay.track_ids()))
+
+    def __len__(self):
+        return len(self.track_ids())
+
+    def close(self):
+        self.base.close()
+        self.overlay.close()
+
+
+def open_context_store():
+    """
+    Opens the default context store. On Lambda with config.READ_ONLY_SERVING,
+    the shipped store is opened in place (no copy to /tmp) under a writable
+    /tmp overlay.
+    """
+    if (
+        os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+        and config.READ_ONLY_SERVING
+        and config.CONTEXT_STORE_PATH.exists()
+    ):
+        return OverlayContextStore(
+            base=SongContextStore(config.CONTEXT_STORE_PATH, read_only=True),
+            overlay=SongContextStore(
+                Path("/tmp") / f"{config.CONTEXT_STORE_PATH.stem}_overlay.db"
+            ),
+        )
+    return SongContextStore()
+
+
+# ChromaDB's maximum batch size (client.get_max_batch_size())
+CHROMA_MAX_BATCH_SIZE = 5461
+
+
+def migrate_chroma_documents(
+    collection, store, strip_documents=True, batch_size=CHROMA_MAX_BATCH_SIZE
+):
+    """
+    Moves the song contexts stored as ChromaDB `documents` into the context
+    store. With `strip_documents`, the documents are then blanked in place,
+    keeping ids, embeddings and metadata.
+
+    Nothing is deleted: the contexts are stored before any document is
+    blanked, and the records are rewritten with upserts of at most
+    `batch_size` ids, so an interrupted migration can simply be run again.
+
+    Returns:
+        int: Number of migrated contexts.
+    """
+    existing = collection.get(include=["documents", "metadatas", "embeddings"])
+    records = [
+        {
+            "track_id": (metadata or {}).get("track_id"),
+            "artist": (metadata or {}).get("artists", ""),
+            "track_name": (metadata or {}).get("track_name", ""),
+            "context": document,
+        }
+        for document, metadata in zip(existing["documents"], existing["metadatas"])
+        if document
+    ]
+    store.put_many(records)
+
+    if strip_documents:
+        rows = [row for row, document in enumerate(existing["documents"]) if document]
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            collection.upsert(
+                ids=[existing["ids"][row] for row in batch],
+                embeddings=[existing["embeddings"][row] for row in batch],
+                metadatas=[existing["metadatas"][row] for row in batch],
+                documents=[""] * len(batch),
+            )
+
+    return len(records)
+
+
+if __name__ == "__main__":
+    import chromadb
+
+    chroma_client = chromadb.PersistentClient(path=str(config.EMBEDDINGS_DB_PATH))
+    chroma_collection = chroma_client.get_collection(name="genius_embeddings")
+
+    context_store = SongContextStore()
+    migrated = migrate_chroma_documents(
+        chroma_collection,
+        context_store,
+        batch_size=chroma_client.get_max_batch_size(),
+    )
+    print(
+        f"Migrated {migrated} song contexts into '{context_store.db_path}'. "
+        f"Store now holds {len(context_store)} songs."
+    )
@@ -0,0 +1,161 @@
+import copy
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from backend import config
+from backend.core.dataset_genres import DATASET_GENRES
+from backend.core.rate_limiter import RateLimiter
+from backend.corpus.context_store import song_id_for
+from backend.corpus.create_basic_corpus import BuildManifest
+from backend.data_management.extract.extract_file import ExtractFile
+
+load_dotenv()
+
+
+def popularity_order(dataset, genres=DATASET_GENRES):
+    """
+    Orders dataset tracks for warming: the most popular track of every genre
+    first, then the second most popular of every genre, and so on.
+    Tracks listed under several genres are kept once.
+    """
+    tracks = dataset[dataset["track_genre"].isin(genres)]
+    tracks = tracks.sort_values("popularity", ascending=False).drop_duplicates(
+        subset=["track_name", "artists"]
+    )
+    tracks = tracks.assign(genre_rank=tracks.groupby("track_genre").cumcount())
+    return (
+        tracks.sort_values(["genre_rank", "popularity"], ascending=[True, False])
+        .drop(columns="genre_rank")
+        .reset_index(drop=True)
+    )
+
+
+class CorpusWarmer:
+    def __init__(
+        self,
+        semantic_retrieval,
+        manifest_path=config.CORPUS_WARMER_MANIFEST_PATH,
+        max_workers=4,
+        genius_requests_per_sec=2.0,
+    ):
+        """
+        Background job prefetching song contexts and embeddings into the corpus
+        so that Refine finds them locally instead of fetching them live.
+
+        Parameters:
+            semantic_retrieval (SemanticRetrieval): Corpus to warm.
+            manifest_path (str or Path): Append-only progress manifest, so an
+                                         interrupted run resumes where it stopped.
+            max_workers (int): Songs fetched and embedded concurrently.
+            genius_requests_per_sec (float): Genius requests per second,
+                                             shared by all workers.
+        """
+        self.semantic_retrieval = semantic_retrieval
+        # a rate-limited copy, leaving the serving generator untouched
+        self.song_context_generator = copy.copy(semantic_retrieval.SongContextGenerator)
+        self.song_context_generator.rate_limiter = RateLimiter(genius_requests_per_sec)
+        self.manifest = BuildManifest(manifest_path)
+        self.max_workers = max_workers
+
+    def _warm_track(self, track):
+        # failed lookups raise and are recorded as retryable errors
+        song_context = self.semantic_retrieval.get_or_create_song_embedding(
+            track["artists"],
+            track["track_name"],
+            track["track_id"],
+            song_context_generator=self.song_context_generator,
+            raise_errors=True,
+        )
+        return "saved" if song_context else "not_found"
+
+    def warm(self, dataset, budget=config.CORPUS_WARMER_BUDGET, genres=DATASET_GENRES):
+        """
+        Embeds up to `budget` not-yet-embedded tracks, in popularity order
+        per genre.
+
+        Returns:
+            dict: Counts per status, elapsed time and songs per second.
+        """
+        ordered = popularity_order(dataset, genres)
+        ordered = ordered[~ordered["track_id"].map(self.manifest.is_done)]
+
+        report = {"saved": 0, "not_found": 0, "errors": 0, "already_embedded": 0}
+        started = time.perf_counter()
+
+        # Walk the ordered tracks in chunks until the budget is used up
+        chunk_size = max(budget, 100)
+        selected = []
+        for start in range(0, len(ordered), chunk_size):
+            chunk = ordered.iloc[start : start + chunk_size]
+            embedded = self.semantic_retrieval.embedded_song_ids(
+                song_id_for(artist, track_name)
+                for artist, track_name in zip(chunk["artists"], chunk["track_name"])
+            )
+            for track in chunk.to_dict("records"):
+                if song_id_for(track["artists"], track["track_name"]) in embedded:
+                    report["already_embedded"] += 1
+                    self.manifest.record(track["track_id"], "saved")
+                elif len(selected) < budget:
+                    selected.append(track)
+            if len(selected) >= budget:
+                break
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._warm_track, track): track for track in selected
+            }
+            for future in as_completed(futures):
+                track = futures[future]
+                try:
+                    status = future.result()
+                except Exception as e:
+                    print(f"Error warming {track['artists']} - {track['track_name']}")
+                    self.manifest.record(track["track_id"], "error", error=str(e))
+                    report["errors"] += 1
+                else:
+                    self.manifest.record(track["track_id"], status)
+                    report[status] += 1
+
+        elapsed_sec = time.perf_counter() - started
+        report["elapsed_sec"] = round(elapsed_sec, 3)
+        report["songs_per_sec"] = (
+            round(len(selected) / elapsed_sec, 3) if selected else 0
+        )
+        return report
+
+
+if __name__ == "__main__":
+    from backend.corpus.embeddings.semantic_retrieval import SemanticRetrieval
+
+    semantic_retrieval = SemanticRetrieval(
+        open_ai_key=os.getenv("OPENAI_API_KEY"),
+        genius_api_key=os.getenv("GENIUS_API_KEY"),
+    )
+    dataset = ExtractFile().load_data()
+
+    # Filter returns the most popular matches, so the top tracks per genre
+    # approximate the candidates Refine receives.
+    filter_outputs = pd.concat(
+        genre_tracks.nlargest(20, "popularity")
+        for _, genre_tracks in dataset.groupby("track_genre")
+    )
+    before = semantic_retrieval.corpus_coverage(filter_outputs)
+
+    warmer = CorpusWarmer(semantic_retrieval)
+    report = warmer.warm(dataset)
+
+    after = semantic_retrieval.corpus_coverage(filter_outputs)
+    print(
+        f"Warmed corpus: {report['saved']} embedded, {report['not_found']} not on "
+        f"Genius, {report['errors']} errors, {report['already_embedded']} already "
+        f"embedded ({report['songs_per_sec']:.2f} songs/sec)."
+    )
+    print(
+        f"Corpus coverage of Filter outputs: {before['coverage']:.1%} -> "
+        f"{after['coverage']:.1%} ({after['embedded']}/{after['tracks']} tracks)."
+    )
+    semantic_retrieval.negative_cache.report()
@@ -1,25 +1,237 @@
-import os
+import csv
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
 
-import lyricsgenius
 import pandas as pd
 from dotenv import load_dotenv
 
 from backend import config
-from backend.core.song_utils import generate_song_context
+from backend.core.negative_cache import NegativeCache
+from backend.core.rate_limiter import RateLimiter
+from backend.core.song_utils import SongContextGenerator
+from backend.corpus.context_store import SongContextStore, song_id_for
 
 # Load environment variables
 load_dotenv()
-genius = lyricsgenius.Genius(os.getenv("GENIUS_API_KEY"), timeout=15)
 
 # kaggle dataset path
 DATASET_PATH = config.FILE_PATH
 
-# folders to store corpus and metadata (list of songs in the corpus)
-CORPUS_DIR = config.CORPUS_DIR
+# context store and metadata (list of songs in the corpus)
 CORPUS_METADATA_PATH = config.CORPUS_METADATA_PATH
+CORPUS_BUILD_MANIFEST_PATH = config.CORPUS_BUILD_MANIFEST_PATH
 
-# create folder
-os.makedirs(CORPUS_DIR, exist_ok=True)
+METADATA_COLUMNS = [
+    "track_id",
+    "artist",
+    "track_name",
+    "filename",
+    "tempo",
+    "energy",
+    "danceability",
+    "mode",
+    "valence",
+    "genre",
+]
+
+# Manifest statuses that need no retry on restart ("error", a failed Genius
+# lookup, is retried)
+FINAL_STATUSES = ("saved", "not_found")
+
+
+class BuildManifest:
+    def __init__(self, path):
+        """
+        Append-only JSON-lines log of processed songs, one line per attempt.
+        The latest line of a track wins, so failed songs are retried on
+        restart while saved and not-found songs are skipped.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+                    self.statuses[entry["key"]] = entry["status"]
+
+    def is_done(self, key):
+        return self.statuses.get(key) in FINAL_STATUSES
+
+    def record(self, key, status, **details):
+        entry = {"key": key, "status": status, "ts": time.time(), **details}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+            self.statuses[key] = status
+
+
+class CorpusBuilder:
+    def __init__(
+        self,
+        context_generator=None,
+        context_store=None,
+        manifest_path=CORPUS_BUILD_MANIFEST_PATH,
+        metadata_path=CORPUS_METADATA_PATH,
+        max_workers=4,
+        requests_per_sec=2.0,
+    ):
+        """
+        Builds the song-context corpus with a bounded worker pool.
+
+        Parameters:
+            context_generator (SongContextGenerator): Genius client. By default
+                one sharing a rate limiter of `requests_per_sec` and the
+                negative cache.
+            context_store (SongContextStore): Destination of the contexts.
+            manifest_path (str or Path): Append-only progress manifest.
+            metadata_path (str or Path): Corpus metadata CSV, appended per song.
+            max_workers (int): Number of songs fetched concurrently.
+            requests_per_sec (float): Genius requests per second, all workers.
+        """
+        if context_generator is None:
+            context_generator = SongContextGenerator(
+                negative_cache=NegativeCache(),
+                rate_limiter=RateLimiter(requests_per_sec),
+            )
+        self.context_generator = context_generator
+        if context_store is None:
+            context_store = SongContextStore()
+        self.context_store = context_store
+        self.manifest = BuildManifest(manifest_path)
+        self.metadata_path = Path(metadata_path)
+        self.max_workers = max_workers
+
+    def _fetch(self, track):
+        track_name = track["track_name"].strip()
+        artist = track["artists"].split(";")[0].strip()
+        started = time.perf_counter()
+
+        # a failed lookup raises, so it is recorded as "error" and retried
+        song_context = self.context_generator.generate_song_context(
+            artist, track_name, raise_errors=True
+        )
+        if song_context:
+            self.context_store.put(track["track_id"], artist, track_name, song_context)
+            status = "saved"
+        else:
+            status = "not_found"
+
+        return artist, track_name, status, time.perf_counter() - started
+
+    def _append_metadata(self, track, artist, track_name):
+        record = {
+            "track_id": track["track_id"],
+            "artist": artist,
+            "track_name": track_name,
+            "filename": song_id_for(artist, track_name),
+            "tempo": track["tempo"],
+            "energy": track["energy"],
+            "danceability": track["danceability"],
+            "mode": track["mode"],
+            "valence": track["valence"],
+            "genre": track["track_genre"],
+        }
+
+        write_header = (
+            not self.metadata_path.exists() or self.metadata_path.stat().st_size == 0
+        )
+        if write_header:
+            columns = METADATA_COLUMNS
+        else:
+            # keep the column layout of an existing metadata file
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                columns = next(csv.reader(f))
+
+        with open(self.metadata_path, "a", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            if write_header:
+                writer.writeheader()
+            writer.writerow(record)
+
+    def build(self, tracks):
+        """
+        Fetches and stores the context of every track not yet in the manifest.
+
+        Parameters:
+            tracks (pd.DataFrame): Kaggle rows with 'track_id', 'track_name',
+                                   'artists' and audio features.
+
+        Returns:
+            dict: Throughput report (counts per status, elapsed time and
+                  songs per second).
+        """
+        records = tracks.to_dict("records")
+        pending = [t for t in records if not self.manifest.is_done(t["track_id"])]
+        report = {
+            "total": len(records),
+            "skipped": len(records) - len(pending),
+            "saved": 0,
+            "not_found": 0,
+            "errors": 0,
+        }
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}
+            queue = iter(pending)
+
+            def submit_next():
+                track = next(queue, None)
+                if track is not None:
+                    in_flight[executor.submit(self._fetch, track)] = track
+
+            # bounded window of submitted songs
+            for _ in range(self.max_workers * 2):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    track = in_flight.pop(future)
+                    key = track["track_id"]
+                    try:
+                        artist, track_name, status, elapsed = future.result()
+                    except Exception as e:
+                        print(f"Error processing {track['track_name']}: {e}")
+                        self.manifest.record(key, "error", error=str(e))
+                        report["errors"] += 1
+                    else:
+                        if status == "saved":
+                            self._append_metadata(track, artist, track_name)
+                            print(f"Saved: {artist} - {track_name}")
+                        else:
+                            print(f"Not found on Genius: {artist} - {track_name}")
+                        self.manifest.record(key, status, elapsed_sec=round(elapsed, 3))
+                        report[status] += 1
+                    submit_next()
+
+        elapsed_sec = time.perf_counter() - started
+        processed = report["saved"] + report["not_found"] + report["errors"]
+        report["elapsed_sec"] = round(elapsed_sec, 3)
+        report["songs_per_sec"] = round(processed / elapsed_sec, 3) if processed else 0
+        return report
+
+
+def print_throughput_report(report):
+    print(
+        f"\nCorpus build: {report['saved']} saved, {report['not_found']} not "
+        f"found, {report['errors']} errors, {report['skipped']} already done "
+        f"(of {report['total']})."
+    )
+    print(
+        f"Elapsed: {report['elapsed_sec']:.1f}s, "
+        f"throughput: {report['songs_per_sec']:.2f} songs/sec."
+    )
 
 
 def create_basic_corpus(
@@ -30,6 +242,8 @@ def create_basic_corpus(
     valence=None,
     track_genre=None,
     max_songs=100,
+    max_workers=4,
+    requests_per_sec=2.0,
 ):
     df = pd.read_csv(DATASET_PATH)
 
@@ -60,50 +274,13 @@ def create_basic_corpus(
         max_songs
     )
 
-    metadata_records = []
+    builder = CorpusBuilder(max_workers=max_workers, requests_per_sec=requests_per_sec)
+    report = builder.build(filtered_df)
+    print_throughput_report(report)
 
-    for i, (idx, track) in enumerate(filtered_df.iterrows()):
-        track_name = track["track_name"].strip()
-        artist = track["artists"].split(";")[0].strip()
-        print(f"Processing: {artist} - {track_name}")
-
-        try:
-            # Get song context
-            song_context = generate_song_context(artist, track_name)
-
-            if song_context:
-                filename = f"{artist} - {track_name}.txt"
-                file_path = os.path.join(CORPUS_DIR, filename)
-
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(song_context)
-
-                print(f"Track {i} Saved: {filename}")
-
-                metadata_records.append(
-                    {
-                        "artist": artist,
-                        "track_name": track_name,
-                        "filename": filename,
-                        "tempo": track["tempo"],
-                        "energy": track["energy"],
-                        "danceability": track["danceability"],
-                        "mode": track["mode"],
-                        "valence": track["valence"],
-                        "genre": track["track_genre"],
-                    }
-                )
-            else:
-                print(f"Not found on Genius: {artist} - {track_name}")
-
-        except Exception as e:
-            print(f"Error processing {artist} - {track_name}: {e}")
-
-    metadata_df = pd.DataFrame(metadata_records)
-    metadata_df.to_csv(CORPUS_METADATA_PATH, index=False, encoding="utf-8")
-
-    print(f"\nCorpus creation complete. {len(metadata_records)} songs saved.")
+    print(f"Contexts saved in '{builder.context_store.db_path}'.")
     print(f"Metadata explicitly saved in '{CORPUS_METADATA_PATH}'.")
+    return report
 
 
 # Explicitly call your function with example parameters:
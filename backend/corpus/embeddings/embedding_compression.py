@@ -0,0 +1,244 @@
+from pathlib import Path
+
+import numpy as np
+
+from backend import config
+from backend.corpus.embeddings.vector_index import (
+    IDS_FILE,
+    JOURNAL_FILE,
+    VECTORS_FILE,
+    NumpyVectorIndex,
+    _normalize_rows,
+)
+
+CODEBOOK_FILE = "codebook.npz"
+
+
+class EmbeddingCompressor:
+    def __init__(self, pca_dim=None, quantization=None):
+        """
+        Offline compression of song embeddings: PCA to `pca_dim` dimensions
+        and/or scalar int8 quantization.
+
+        The PCA basis is fitted on the L2-normalized corpus (uncentered, so
+        dot products are preserved by the projection), reduced vectors are
+        re-normalized, and int8 codes use one symmetric scale per dimension.
+        Queries are projected with the same basis but not quantized.
+
+        Parameters:
+            pca_dim (int): Target dimension, or None to keep all dimensions.
+            quantization (str): "int8", or None for float32 codes.
+        """
+        if quantization not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization '{quantization}'.")
+        self.pca_dim = pca_dim
+        self.quantization = quantization
+        self.components = None
+        self.scale = None
+
+    @property
+    def code_dtype(self):
+        return np.dtype(np.int8 if self.quantization == "int8" else np.float32)
+
+    def fit(self, embeddings):
+        vectors = _normalize_rows(embeddings)
+        if self.pca_dim is not None:
+            pca_dim = min(self.pca_dim, *vectors.shape)
+            _, _, basis = np.linalg.svd(vectors, full_matrices=False)
+            self.components = basis[:pca_dim].astype(np.float32)
+            vectors = _normalize_rows(vectors @ self.components.T)
+
+        if self.quantization == "int8":
+            max_abs = np.abs(vectors).max(axis=0)
+            max_abs[max_abs == 0] = 1.0
+            self.scale = (max_abs / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, embeddings):
+        vectors = _normalize_rows(embeddings)
+        if self.components is not None:
+            vectors = _normalize_rows(vectors @ self.components.T)
+        if self.quantization == "int8":
+            return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        return vectors.astype(np.float32)
+
+    def decode(self, codes):
+        """
+        Approximate reconstruction in the original embedding space.
+        """
+        vectors = np.asarray(codes, dtype=np.float32)
+        if self.quantization == "int8":
+            vectors = vectors * self.scale
+        if self.components is not None:
+            vectors = vectors @ self.components
+        return vectors
+
+    def project_query(self, query):
+        query = np.asarray(query, dtype=np.float32)
+        if self.components is not None:
+            query = _normalize_rows(self.components @ query)[0]
+        if self.quantization == "int8":
+            # fold the dequantization scale into the query
+            query = query * self.scale
+        return query
+
+    def scores(self, codes, query):
+        projected = self.project_query(query)
+        if codes.dtype == np.float32:
+            return codes @ projected
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), 8192):
+            block = np.asarray(codes[start : start + 8192], dtype=np.float32)
+            scores[start : start + 8192] = block @ projected
+        return scores
+
+    def save(self, path):
+        np.savez(
+            path,
+            pca_dim=-1 if self.pca_dim is None else self.pca_dim,
+            quantization=self.quantization or "",
+            components=(
+                np.empty(0, np.float32) if self.components is None else self.components
+            ),
+            scale=np.empty(0, np.float32) if self.scale is None else self.scale,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as codebook:
+            pca_dim = int(codebook["pca_dim"])
+            compressor = cls(
+                pca_dim=None if pca_dim < 0 else pca_dim,
+                quantization=str(codebook["quantization"]) or None,
+            )
+            if codebook["components"].size:
+                compressor.components = codebook["components"]
+            if codebook["scale"].size:
+                compressor.scale = codebook["scale"]
+        return compressor
+
+
+class CompressedVectorIndex(NumpyVectorIndex):
+    def __init__(self, path, full_index=None, rescore_candidates=None, read_only=False):
+        """
+        NumpyVectorIndex over compressed codes (see EmbeddingCompressor).
+
+        Parameters:
+            path (str or Path): Index directory, including its codebook.
+            full_index (NumpyVectorIndex): Optional uncompressed index used
+                to rescore the best compressed candidates exactly, typically
+                a float16 copy (config.RESCORE_INDEX_DIR).
+            rescore_candidates (int): Number of compressed candidates rescored
+                against `full_index`. Defaults to config.RESCORE_CANDIDATES.
+            read_only (bool): Open the index without ever writing to `path`.
+        """
+        self.compressor = EmbeddingCompressor.load(Path(path) / CODEBOOK_FILE)
+        self.full_index = full_index
+        self.rescore_candidates = (
+            config.RESCORE_CANDIDATES
+            if rescore_candidates is None
+            else rescore_candidates
+        )
+        super().__init__(
+            path, dtype=self.compressor.code_dtype.name, read_only=read_only
+        )
+
+    @classmethod
+    def build(cls, path, ids, embeddings, metadatas=None, compressor=None, **kwargs):
+        """
+        Fits `compressor` on the embeddings, writes a new compressed index
+        to `path` and returns it opened.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for filename in (VECTORS_FILE, IDS_FILE, JOURNAL_FILE, CODEBOOK_FILE):
+            (path / filename).unlink(missing_ok=True)
+
+        if compressor is None:
+            compressor = EmbeddingCompressor(
+                pca_dim=config.EMBEDDING_PCA_DIM,
+                quantization=config.EMBEDDING_QUANTIZATION,
+            )
+        compressor.fit(embeddings).save(path / CODEBOOK_FILE)
+
+        index = cls(path, **kwargs)
+        index.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+        return index
+
+    def _encode(self, embeddings):
+        return self.compressor.encode(embeddings)
+
+    def _decode(self, vectors):
+        return self.compressor.decode(vectors)
+
+    def _scores(self, vectors, query):
+        return self.compressor.scores(vectors, query)
+
+    def _top_rows(self, vectors, query, mask, n_results):
+        if self.full_index is None or not self.rescore_candidates:
+            return super()._top_rows(vectors, query, mask, n_results)
+
+        # exact rescoring pass over the best compressed candidates
+        top, top_scores = super()._top_rows(
+            vectors, query, mask, max(n_results, self.rescore_candidates)
+        )
+        scores = np.array(top_scores, dtype=np.float32)
+        full_count, full_vectors = self.full_index._snapshot()
+        full_rows = [self.full_index.row_of.get(self.ids[row]) for row in top]
+        rescored = [
+            i
+            for i, full_row in enumerate(full_rows)
+            if full_row is not None and full_row < full_count
+        ]
+        if rescored:
+            full_vectors = full_vectors[[full_rows[i] for i in rescored]]
+            scores[rescored] = np.asarray(full_vectors, dtype=np.float32) @ query
+
+        order = np.argsort(-scores, kind="stable")[:n_results]
+        return top[order], scores[order]
+
+    def nbytes(self):
+        """
+        Bytes of vectors needed to serve queries, including the rescoring
+        index when rescoring is on.
+        """
+        nbytes = self.vectors.nbytes + sum(
+            part.nbytes
+            for part in (self.compressor.components, self.compressor.scale)
+            if part is not None
+        )
+        if self.full_index is not None and self.rescore_candidates:
+            nbytes += self.full_index.vectors.nbytes
+        return nbytes
+
+
+if __name__ == "__main__":
+    full_precision = NumpyVectorIndex(config.NUMPY_INDEX_DIR, read_only=True)
+    everything = full_precision.get(include=["embeddings", "metadatas"])
+
+    compressed = CompressedVectorIndex.build(
+        config.COMPRESSED_INDEX_DIR,
+        ids=everything["ids"],
+        embeddings=everything["embeddings"],
+        metadatas=everything["metadatas"],
+    )
+    if config.RESCORE_CANDIDATES:
+        rescore_index = NumpyVectorIndex.build(
+            config.RESCORE_INDEX_DIR,
+            ids=everything["ids"],
+            embeddings=everything["embeddings"],
+            metadatas=everything["metadatas"],
+            dtype="float16",
+        )
+        print(
+            f"Exported the float16 rescoring index "
+            f"({rescore_index.vectors.nbytes / 1e6:.2f} MB) "
+            f"to '{rescore_index.path}'."
+        )
+    print(
+        f"Compressed {compressed.count()} embeddings to "
+        f"{compressed.nbytes() / 1e6:.2f} MB "
+        f"(full precision: {full_precision.vectors.nbytes / 1e6:.2f} MB) "
+        f"in '{compressed.path}'."
+    )
@@ -7,6 +7,7 @@ import pandas as pd
 from openai import OpenAI
 
 from backend import config
+from backend.corpus.context_store import SongContextStore
 
 # Adjust sys.path explicitly to import project-specific configurations
 sys.path.append(str(Path(__file__).resolve().parents[2]))
@@ -17,6 +18,9 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 # Load corpus metadata (list of songs with associated details)
 metadata_df = pd.read_csv(config.CORPUS_METADATA_PATH)
 
+# Song contexts (zstd-compressed, keyed by Spotify track_id)
+context_store = SongContextStore()
+
 # Initialize ChromaDB client and collection for storing embeddings
 if os.getenv("GITHUB_ACTIONS") == "true":
     # CI environment: in-memory ephemeral storage
@@ -38,12 +42,12 @@ else:
 
 # Iterate over corpus metadata and generate embeddings for each song context
 for idx, row in metadata_df.iterrows():
-    song_path = config.CORPUS_DIR / row["filename"]
-
     try:
-        # Read comprehensive song context from file
-        with open(song_path, "r", encoding="utf-8") as file:
-            song_context = file.read()
+        # Read comprehensive song context from the context store
+        song_context = context_store.get_by_song_id(row["filename"])
+        if not song_context:
+            print(f"No stored context for '{row['filename']}', skipping.")
+            continue
 
         # Generate embedding vector explicitly using OpenAI's embeddings API
         response = client.embeddings.create(
@@ -52,11 +56,10 @@ for idx, row in metadata_df.iterrows():
 
         embedding = response.data[0].embedding
 
-        # Explicitly add embedding to ChromaDB along with clearly defined metadata
+        # Add embedding to ChromaDB; the context itself lives in the context store
         collection.add(
             ids=[row["filename"]],
             embeddings=[embedding],
-            documents=[song_context],
             metadatas=[
                 {
                     "artists": row["artist"],
@@ -5,12 +5,21 @@ import time
 from pathlib import Path
 
 import chromadb
+import numpy as np
 from chromadb.errors import NotFoundError
 from dotenv import load_dotenv
 from openai import OpenAI
 
 from backend import config
+from backend.core import tracing
+from backend.core.negative_cache import NegativeCache
 from backend.core.song_utils import SongContextGenerator
+from backend.corpus.context_store import open_context_store, song_id_for
+from backend.corpus.embeddings.embedding_compression import CompressedVectorIndex
+from backend.corpus.embeddings.vector_index import (
+    NumpyVectorIndex,
+    OverlayVectorIndex,
+)
 
 # Load environment
 load_dotenv()
@@ -27,11 +36,21 @@ class SemanticRetrieval:
     def __init__(self, open_ai_key=None, genius_api_key=None):
         self.client = OpenAI(api_key=open_ai_key)
         self.collection = self.set_collection()
-        self.SongContextGenerator = SongContextGenerator(genius_api_key=genius_api_key)
+        self.context_store = open_context_store()
+        self.negative_cache = NegativeCache()
+        self.SongContextGenerator = SongContextGenerator(
+            genius_api_key=genius_api_key, negative_cache=self.negative_cache
+        )
 
     def set_collection(self):
         collection_name = "genius_embeddings"
 
+        if os.getenv("GITHUB_ACTIONS") != "true":
+            if config.VECTOR_BACKEND == "numpy":
+                return self.set_numpy_index()
+            if config.VECTOR_BACKEND == "compressed":
+                return self.set_compressed_index()
+
         if running_on_lambda():
             lambda_db_source = "/var/task/backend/corpus/embeddings/genius_corpus_db"
             lambda_db_destination = "/tmp/genius_corpus_db"
@@ -66,46 +85,252 @@ class SemanticRetrieval:
             )
         return collection
 
-    def get_openai_embedding(self, text: str):
-        response = self.client.embeddings.create(
-            input=text, model="text-embedding-ada-002"
+    @staticmethod
+    def _index_dir(index_dir, module):
+        if running_on_lambda() and not config.READ_ONLY_SERVING:
+            lambda_index_destination = Path("/tmp") / index_dir.name
+            if not lambda_index_destination.exists():
+                shutil.copytree(index_dir, lambda_index_destination)
+            index_dir = lambda_index_destination
+
+        if not (index_dir / "ids.json").exists():
+            raise RuntimeError(
+                f"Vector index '{index_dir}' does not exist. "
+                f"Build it with `python -m {module}`."
+            )
+        return index_dir
+
+    @staticmethod
+    def _with_overlay(index):
+        """
+        Read-only serving: the shipped index stays memory-mapped in place,
+        runtime additions go to a writable overlay in /tmp.
+        """
+        if not (running_on_lambda() and config.READ_ONLY_SERVING):
+            return index
+        overlay_dir = Path("/tmp") / f"{index.path.name}_overlay"
+        return OverlayVectorIndex(index, NumpyVectorIndex(overlay_dir))
+
+    @classmethod
+    def set_numpy_index(cls):
+        index_dir = cls._index_dir(
+            config.NUMPY_INDEX_DIR, "backend.corpus.embeddings.vector_index"
+        )
+        index = NumpyVectorIndex(
+            index_dir,
+            dtype=config.NUMPY_INDEX_DTYPE,
+            read_only=running_on_lambda() and config.READ_ONLY_SERVING,
+        )
+        return cls._with_overlay(index)
+
+    @classmethod
+    def set_compressed_index(cls):
+        index_dir = cls._index_dir(
+            config.COMPRESSED_INDEX_DIR,
+            "backend.corpus.embeddings.embedding_compression",
+        )
+        full_index = None
+        if config.RESCORE_CANDIDATES:
+            full_index = NumpyVectorIndex(
+                cls._index_dir(
+                    config.RESCORE_INDEX_DIR,
+                    "backend.corpus.embeddings.embedding_compression",
+                ),
+                read_only=True,
+            )
+        index = CompressedVectorIndex(
+            index_dir,
+            full_index=full_index,
+            read_only=running_on_lambda() and config.READ_ONLY_SERVING,
         )
+        return cls._with_overlay(index)
+
+    def get_openai_embedding(self, text: str):
+        with tracing.span(
+            "openai.embedding", kind="client", model="text-embedding-ada-002"
+        ) as span:
+            response = self.client.embeddings.create(
+                input=text, model="text-embedding-ada-002"
+            )
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                span.set_attributes(prompt_tokens=usage.prompt_tokens)
         return response.data[0].embedding
 
     def find_semantically_similar_songs(self, query: str, top_k: int = 5):
         query_embedding = self.get_openai_embedding(query)
-        results = self.collection.query(
-            query_embeddings=[query_embedding], n_results=top_k
-        )
-        return results["documents"][0], results["metadatas"][0]
+        with tracing.span(
+            "vector_store.query", kind="client", backend=config.VECTOR_BACKEND
+        ):
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                include=["metadatas", "documents"],
+            )
+        contexts = self.context_store.get_many_by_song_ids(results["ids"][0])
+        documents = [
+            contexts.get(song_id) or document
+            for song_id, document in zip(results["ids"][0], results["documents"][0])
+        ]
+        return documents, results["metadatas"][0]
 
     def embed_user_prompt(self, user_prompt: str):
         return self.get_openai_embedding(user_prompt)
 
-    def get_or_create_song_embedding(self, artist: str, track_name: str):
+    def embedded_song_ids(self, song_ids):
+        """
+        Returns the subset of `song_ids` that already have an embedding.
+        """
+        song_ids = list(dict.fromkeys(song_ids))
+        embedded = set()
+        with tracing.span(
+            "vector_store.get",
+            kind="client",
+            backend=config.VECTOR_BACKEND,
+            ids=len(song_ids),
+        ):
+            for start in range(0, len(song_ids), 500):
+                existing = self.collection.get(
+                    ids=song_ids[start : start + 500], include=[]
+                )
+                embedded.update(existing["ids"])
+        return embedded
+
+    def get_song_embeddings(self, song_ids):
+        """
+        Bulk-fetches stored embeddings by song id.
+
+        Returns:
+            dict: song_id -> embedding (np.ndarray), for the embedded songs.
+        """
+        song_ids = list(dict.fromkeys(song_ids))
+        embeddings = {}
+        with tracing.span(
+            "vector_store.get",
+            kind="client",
+            backend=config.VECTOR_BACKEND,
+            ids=len(song_ids),
+        ):
+            for start in range(0, len(song_ids), 500):
+                existing = self.collection.get(
+                    ids=song_ids[start : start + 500], include=["embeddings"]
+                )
+                embeddings.update(
+                    zip(
+                        existing["ids"],
+                        np.asarray(existing["embeddings"], np.float32),
+                    )
+                )
+        return embeddings
+
+    def corpus_coverage(self, tracks):
+        """
+        Share of tracks (typically Filter outputs) that already have an
+        embedding, i.e. that Refine ranks without a live Genius/OpenAI call.
+        """
+        song_ids = {
+            song_id_for(artist, track_name)
+            for artist, track_name in zip(tracks["artists"], tracks["track_name"])
+        }
+        embedded = self.embedded_song_ids(song_ids)
+        return {
+            "tracks": len(song_ids),
+            "embedded": len(embedded),
+            "coverage": len(embedded) / len(song_ids) if song_ids else 0.0,
+        }
+
+    def get_song_contexts(self, tracks):
+        """
+        Reads the stored contexts of a batch of tracks in a single query.
+
+        Parameters:
+            tracks (iterable of tuple): (artist, track_name, track_id) triples;
+                                        track_id may be None.
+
+        Returns:
+            dict: (artist, track_name) -> context, for the stored songs.
+        """
+        tracks = list(tracks)
+        by_track_id = self.context_store.get_many(
+            [track_id for _, _, track_id in tracks if track_id]
+        )
+        by_song_id = self.context_store.get_many_by_song_ids(
+            [
+                song_id_for(artist, track_name)
+                for artist, track_name, track_id in tracks
+                if track_id not in by_track_id
+            ]
+        )
+
+        contexts = {}
+        for artist, track_name, track_id in tracks:
+            context = by_track_id.get(track_id) or by_song_id.get(
+                song_id_for(artist, track_name)
+            )
+            if context:
+                contexts[(artist, track_name)] = context
+        return contexts
+
+    def get_or_create_song_embedding(
+        self,
+        artist: str,
+        track_name: str,
+        track_id: str = None,
+        song_context_generator=None,
+        raise_errors=False,
+    ):
+        """
+        Returns the stored context of a song, or fetches it from Genius and
+        embeds it into the corpus when missing.
+
+        Parameters:
+            song_context_generator (SongContextGenerator): Generator used for
+                the Genius lookup. Defaults to self.SongContextGenerator.
+            raise_errors (bool): Raise GeniusRequestError when the lookup
+                                 fails instead of returning None.
+
+        Returns:
+            str or None: The song context, None if Genius does not have it.
+        """
+        if song_context_generator is None:
+            song_context_generator = self.SongContextGenerator
         verbose = config.VERBOSE
-        song_id = f"{artist} - {track_name}.txt"
-        existing = self.collection.get(ids=[song_id])
+        song_id = song_id_for(artist, track_name)
+        existing = self.collection.get(ids=[song_id], include=["documents"])
 
         if existing["ids"]:
             if verbose:
                 print("Song found in collection.")
-            return existing["documents"][0]
+            stored = self.get_song_contexts([(artist, track_name, track_id)])
+            # Collections built before the context store still hold documents
+            return stored.get((artist, track_name)) or existing["documents"][0]
+
+        if self.negative_cache.contains(artist, track_name):
+            if verbose:
+                print(f"Genius is known not to have '{track_name}' by '{artist}'.")
+            return None
 
         if verbose:
             print("Song not found. Fetching dynamically from Genius API...")
 
-        song_context = self.SongContextGenerator.generate_song_context(
-            artist, track_name
+        song_context = song_context_generator.generate_song_context(
+            artist, track_name, check_negative_cache=False, raise_errors=raise_errors
         )
         if song_context:
             embedding = self.get_openai_embedding(song_context)
-            self.collection.add(
-                ids=[song_id],
-                embeddings=[embedding],
-                documents=[song_context],
-                metadatas=[{"artists": artist, "track_name": track_name}],
-            )
+            metadata = {"artists": artist, "track_name": track_name}
+            if track_id:
+                metadata["track_id"] = track_id
+
+            self.context_store.put(track_id, artist, track_name, song_context)
+            with tracing.span(
+                "vector_store.add", kind="client", backend=config.VECTOR_BACKEND
+            ):
+                self.collection.add(
+                    ids=[song_id],
+                    embeddings=[embedding],
+                    metadatas=[metadata],
+                )
             delay_sec = 2
             time.sleep(delay_sec)
             if verbose:
@@ -0,0 +1,498 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.json"
+# ids and metadata added since ids.json was last written, one JSON line each
+JOURNAL_FILE = "ids.jsonl"
+
+
+def _normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _equality_terms(clause):
+    """
+    Returns {field: value} if `clause` is a plain equality (or an $and of
+    equalities), otherwise None.
+    """
+    if "$and" in clause and len(clause) == 1:
+        terms = {}
+        for sub_clause in clause["$and"]:
+            sub_terms = _equality_terms(sub_clause)
+            if sub_terms is None:
+                return None
+            terms.update(sub_terms)
+        return terms
+    if any(key.startswith("$") for key in clause):
+        return None
+    terms = {}
+    for key, condition in clause.items():
+        if isinstance(condition, dict):
+            if set(condition) != {"$eq"}:
+                return None
+            condition = condition["$eq"]
+        terms[key] = condition
+    return terms
+
+
+def compile_where(where):
+    """
+    Compiles the subset of the ChromaDB `where` syntax used by FitBeat
+    ({"field": value}, {"field": {"$eq": value}}, "$and", "$or") into a
+    metadata predicate. An "$or" of equality clauses over the same fields
+    becomes a single set-membership test.
+    """
+    predicates = []
+    for key, condition in where.items():
+        if key == "$and":
+            sub_predicates = [compile_where(clause) for clause in condition]
+            predicates.append(lambda m, ps=sub_predicates: all(p(m) for p in ps))
+        elif key == "$or":
+            terms = [_equality_terms(clause) for clause in condition]
+            fields = tuple(sorted(terms[0])) if terms and terms[0] else None
+            if fields and all(
+                t is not None and tuple(sorted(t)) == fields for t in terms
+            ):
+                allowed = {tuple(t[field] for field in fields) for t in terms}
+                predicates.append(
+                    lambda m, f=fields, a=allowed: tuple(m.get(x) for x in f) in a
+                )
+            else:
+                sub_predicates = [compile_where(clause) for clause in condition]
+                predicates.append(lambda m, ps=sub_predicates: any(p(m) for p in ps))
+        else:
+            expected = (
+                condition.get("$eq") if isinstance(condition, dict) else condition
+            )
+            predicates.append(lambda m, k=key, e=expected: m.get(k) == e)
+    return lambda metadata: all(p(metadata) for p in predicates)
+
+
+class NumpyVectorIndex:
+    def __init__(self, path, dtype="float32", read_only=False):
+        """
+        In-process exact vector index, a drop-in for the parts of the
+        ChromaDB collection API used by SemanticRetrieval.
+
+        L2-normalized embeddings are kept in a memory-mapped `vectors.npy`
+        matrix next to an `ids.json` id/metadata table. The matrix has spare
+        rows, so additions are written in place and journaled to `ids.jsonl`;
+        both files are only rewritten when the matrix doubles. A query is a single
+        matrix-vector product over the mapped matrix; restricted queries
+        mask rows instead of filtering inside an ANN index. Distances are
+        cosine distances (1 - cosine similarity), as with ChromaDB's
+        "cosine" space.
+
+        Parameters:
+            path (str or Path): Index directory.
+            dtype (str): Storage dtype of new indexes. "float16" halves the
+                         index size at the cost of upcasting during queries.
+            read_only (bool): Open the index without ever writing to `path`.
+        """
+        self.path = Path(path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+
+        ids_path = self.path / IDS_FILE
+        if ids_path.exists():
+            with open(ids_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            self.dtype = np.dtype(table.get("dtype", dtype))
+            self.ids = table["ids"]
+            self.metadatas = table["metadatas"]
+            # allocated rows, the first len(self.ids) of which are in use
+            self._storage = np.load(
+                self.path / VECTORS_FILE, mmap_mode="r" if read_only else "r+"
+            )
+        else:
+            self.dtype = np.dtype(dtype)
+            self.ids = []
+            self.metadatas = []
+            self._storage = np.empty((0, 0), dtype=self.dtype)
+
+        self.row_of = {song_id: row for row, song_id in enumerate(self.ids)}
+        self._replay_journal()
+        self.vectors = self._storage[: len(self.ids)]
+
+    @classmethod
+    def build(cls, path, ids, embeddings, metadatas=None, dtype="float32"):
+        """
+        Writes a new index to `path` and returns it opened.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for filename in (VECTORS_FILE, IDS_FILE, JOURNAL_FILE):
+            (path / filename).unlink(missing_ok=True)
+
+        index = cls(path, dtype=dtype)
+        index.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+        return index
+
+    @classmethod
+    def from_collection(cls, collection, path, dtype="float32"):
+        """
+        Exports the embeddings and metadata of a ChromaDB collection.
+        """
+        existing = collection.get(include=["embeddings", "metadatas"])
+        return cls.build(
+            path,
+            ids=existing["ids"],
+            embeddings=existing["embeddings"],
+            metadatas=existing["metadatas"],
+            dtype=dtype,
+        )
+
+    def _record(self, song_id, metadata):
+        row = self.row_of.get(song_id)
+        if row is not None:
+            self.metadatas[row] = metadata
+        else:
+            self.row_of[song_id] = len(self.ids)
+            self.ids.append(song_id)
+            self.metadatas.append(metadata)
+
+    def _replay_journal(self):
+        journal_path = self.path / JOURNAL_FILE
+        if not journal_path.exists():
+            return
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # torn last line of an interrupted add
+                    break
+                if entry["id"] not in self.row_of and len(self.ids) >= len(
+                    self._storage
+                ):
+                    break
+                self._record(entry["id"], entry["metadata"])
+
+    def _grow(self, rows, dim):
+        """
+        Moves the vectors to a new file with room for at least `rows` rows
+        (doubling the allocation, so appends stay amortized O(1)).
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_vectors = self.path / f"{VECTORS_FILE}.tmp.npy"
+        capacity = max(rows, 2 * len(self._storage))
+
+        storage = np.lib.format.open_memmap(
+            tmp_vectors, mode="w+", dtype=self.dtype, shape=(capacity, dim)
+        )
+        if self.ids:
+            storage[: len(self.ids)] = self._storage[: len(self.ids)]
+        storage.flush()
+        del storage
+
+        os.replace(tmp_vectors, self.path / VECTORS_FILE)
+        self._storage = np.load(self.path / VECTORS_FILE, mmap_mode="r+")
+
+    def _save_table(self):
+        tmp_ids = self.path / f"{IDS_FILE}.tmp"
+        with open(tmp_ids, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dtype": self.dtype.name,
+                    "ids": self.ids,
+                    "metadatas": self.metadatas,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_ids, self.path / IDS_FILE)
+        (self.path / JOURNAL_FILE).unlink(missing_ok=True)
+
+    def _append_journal(self, ids, metadatas):
+        lines = "".join(
+            json.dumps({"id": song_id, "metadata": metadata}, ensure_ascii=False) + "\n"
+            for song_id, metadata in zip(ids, metadatas)
+        )
+        with open(self.path / JOURNAL_FILE, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def count(self):
+        return len(self.ids)
+
+    def _encode(self, embeddings):
+        return _normalize_rows(embeddings).astype(self.dtype)
+
+    def _decode(self, vectors):
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _snapshot(self):
+        """
+        Returns (count, vectors): the rows readers may use and their matrix,
+        captured together. add() holds the lock until `ids`, `metadatas`
+        and `vectors` agree again, and only appends to the lists, so rows
+        below `count` stay complete while later adds go on.
+        """
+        with self._lock:
+            return len(self.ids), self.vectors
+
+    def _scores(self, vectors, query):
+        if vectors.dtype == np.float32:
+            return vectors @ query
+
+        # float16 storage: upcast block by block so BLAS is still used
+        # without materializing a float32 copy of the whole matrix
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), 4096):
+            block = np.asarray(vectors[start : start + 4096], dtype=np.float32)
+            scores[start : start + 4096] = block @ query
+        return scores
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        """
+        Adds (or replaces) vectors. Documents are not stored; song contexts
+        live in the SongContextStore.
+
+        Costs O(len(ids)) apart from the occasional doubling of the matrix.
+        """
+        if self.read_only:
+            raise RuntimeError(f"Vector index '{self.path}' is read-only.")
+        if not len(ids):
+            return
+
+        new_vectors = self._encode(embeddings)
+        metadatas = metadatas or [None] * len(ids)
+
+        with self._lock:
+            new_rows = {}
+            rows = []
+            for song_id in ids:
+                row = self.row_of.get(song_id, new_rows.get(song_id))
+                if row is None:
+                    row = new_rows[song_id] = len(self.ids) + len(new_rows)
+                rows.append(row)
+
+            grown = (
+                len(self.ids) + len(new_rows) > len(self._storage)
+                or self._storage.shape[1] != new_vectors.shape[1]
+            )
+            if grown:
+                self._grow(len(self.ids) + len(new_rows), new_vectors.shape[1])
+
+            # vectors first: the table never lists a row that was not written
+            self._storage[rows] = new_vectors
+            self._storage.flush()
+            for song_id, metadata in zip(ids, metadatas):
+                self._record(song_id, metadata)
+
+            if grown:
+                self._save_table()
+            else:
+                self._append_journal(ids, metadatas)
+            self.vectors = self._storage[: len(self.ids)]
+
+    def row_ids(self, ids=None, where=None, count=None):
+        """
+        Returns the row ids matching a list of ids and/or a `where` filter,
+        among the first `count` rows (default: all).
+        """
+        count = len(self.ids) if count is None else count
+        if ids is not None:
+            rows = [self.row_of.get(song_id) for song_id in ids]
+            rows = [row for row in rows if row is not None and row < count]
+        else:
+            rows = range(count)
+        if where:
+            matches = compile_where(where)
+            rows = [row for row in rows if matches(self.metadatas[row] or {})]
+        return np.asarray(list(rows), dtype=np.int64)
+
+    def get(self, ids=None, where=None, include=("metadatas", "documents")):
+        count, vectors = self._snapshot()
+        rows = self.row_ids(ids, where, count)
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "embeddings": (
+                self._decode(vectors[rows]) if "embeddings" in include else None
+            ),
+            "metadatas": (
+                [self.metadatas[row] for row in rows]
+                if "metadatas" in include
+                else None
+            ),
+            "documents": [None] * len(rows) if "documents" in include else None,
+            "included": list(include),
+        }
+
+    def _top_rows(self, vectors, query, mask, n_results):
+        """
+        Returns the best `n_results` rows of `vectors` (allowed by `mask`)
+        and their cosine similarities, best first.
+        """
+        # one BLAS matrix-vector product over the mapped matrix
+        scores = self._scores(vectors, query)
+        if mask is not None:
+            scores[~mask] = -np.inf
+
+        available = len(scores) if mask is None else int(mask.sum())
+        k = min(n_results, available)
+        top = np.argpartition(-scores, k - 1)[:k] if k else np.array([], np.int64)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def query(
+        self,
+        query_embeddings,
+        n_results=10,
+        where=None,
+        include=("metadatas", "documents", "distances"),
+    ):
+        """
+        Exact top-k cosine search, optionally restricted by a `where` filter.
+        """
+        results = {"ids": [], "distances": [], "metadatas": [], "documents": []}
+        count, vectors = self._snapshot()
+        if not count:
+            for key in results:
+                results[key] = [[] for _ in query_embeddings]
+            return results
+
+        mask = None
+        if where:
+            mask = np.zeros(count, dtype=bool)
+            mask[self.row_ids(where=where, count=count)] = True
+
+        queries = _normalize_rows(query_embeddings)
+        for query in queries:
+            top, top_scores = self._top_rows(vectors, query, mask, n_results)
+
+            results["ids"].append([self.ids[row] for row in top])
+            results["distances"].append((1.0 - top_scores).tolist())
+            results["metadatas"].append([self.metadatas[row] for row in top])
+            results["documents"].append([None] * len(top))
+
+        if "embeddings" in include:
+            results["embeddings"] = [
+                self._decode(vectors[self.row_ids(ids, count=count)])
+                for ids in results["ids"]
+            ]
+        return {
+            key: value
+            for key, value in results.items()
+            if key == "ids" or key in include
+        }
+
+
+class OverlayVectorIndex:
+    def __init__(self, base, overlay):
+        """
+        Read-only index opened in place (e.g. shipped in the Lambda image)
+        with a small writable overlay for embeddings added at runtime.
+        Queries search both and merge the results; overlay entries shadow
+        base entries with the same id.
+
+        Parameters:
+            base (NumpyVectorIndex): Shipped index, opened with read_only=True.
+            overlay (NumpyVectorIndex): Writable index, e.g. in /tmp.
+        """
+        self.base = base
+        self.overlay = overlay
+
+    def count(self):
+        return len(self._base_ids()) + self.overlay.count()
+
+    def _base_ids(self, ids=None):
+        ids = self.base.ids if ids is None else ids
+        return [
+            song_id
+            for song_id in ids
+            if song_id in self.base.row_of and song_id not in self.overlay.row_of
+        ]
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        self.overlay.add(ids, embeddings, metadatas=metadatas, documents=documents)
+
+    def get(self, ids=None, where=None, include=("metadatas", "documents")):
+        parts = [
+            self.base.get(ids=self._base_ids(ids), where=where, include=include),
+            self.overlay.get(ids=ids, where=where, include=include),
+        ]
+        merged = {"ids": parts[0]["ids"] + parts[1]["ids"], "included": list(include)}
+        for key in ("embeddings", "metadatas", "documents"):
+            if key not in include:
+                merged[key] = None
+            elif key == "embeddings":
+                merged[key] = np.concatenate(
+                    [part[key] for part in parts if len(part[key])]
+                    or [np.empty((0, 0), np.float32)]
+                )
+            else:
+                merged[key] = parts[0][key] + parts[1][key]
+        return merged
+
+    def query(
+        self,
+        query_embeddings,
+        n_results=10,
+        where=None,
+        include=("metadatas", "documents", "distances"),
+    ):
+        """
+        Queries base and overlay and merges the hits by distance.
+        """
+        search_include = list(dict.fromkeys(list(include) + ["distances"]))
+        base_results = self.base.query(
+            query_embeddings,
+            # shadowed base hits are dropped below
+            n_results=n_results + self.overlay.count(),
+            where=where,
+            include=search_include,
+        )
+        overlay_results = self.overlay.query(
+            query_embeddings, n_results=n_results, where=where, include=search_include
+        )
+
+        results = {key: [] for key in ["ids"] + search_include}
+        for i in range(len(query_embeddings)):
+            hits = [
+                (distance, part, j)
+                for part in (base_results, overlay_results)
+                for j, (song_id, distance) in enumerate(
+                    zip(part["ids"][i], part["distances"][i])
+                )
+                if part is overlay_results or song_id not in self.overlay.row_of
+            ]
+            hits = sorted(hits, key=lambda hit: hit[0])[:n_results]
+
+            for key in ["ids"] + search_include:
+                values = [part[key][i][j] for _, part, j in hits]
+                if key == "embeddings":
+                    values = np.asarray(values, dtype=np.float32)
+                results[key].append(values)
+
+        return {
+            key: value
+            for key, value in results.items()
+            if key == "ids" or key in include
+        }
+
+
+if __name__ == "__main__":
+    import chromadb
+
+    from backend import config
+
+    chroma_client = chromadb.PersistentClient(path=str(config.EMBEDDINGS_DB_PATH))
+    chroma_collection = chroma_client.get_collection(name="genius_embeddings")
+
+    index = NumpyVectorIndex.from_collection(
+        chroma_collection, config.NUMPY_INDEX_DIR, dtype=config.NUMPY_INDEX_DTYPE
+    )
+    print(
+        f"Exported {index.count()} embeddings ({index.dtype.name}) "
+        f"to '{index.path}'."
+    )
@@ -1,10 +1,12 @@
 import json
 import os
+import time
 
 import boto3
 from botocore.exceptions import ClientError
 
-from backend.core.orchestrator import Orchestrator
+from backend.core import tracing
+from backend.deployment.aws.warm_state import CachedSecrets, WarmOrchestrator
 
 # Initialize AWS Secrets Manager and S3 clients
 secretsmanager = boto3.client("secretsmanager")
@@ -13,7 +15,17 @@ s3_client = boto3.client("s3")
 S3_BUCKET_NAME = os.environ["S3_BUCKET_NAME"]
 SECRET_NAME = os.environ["SECRET_NAME"]
 
+# Reused by the warm invocations of this container
+secrets_cache = CachedSecrets(
+    SECRET_NAME,
+    ["OPENAI_API_KEY", "GENIUS_API_KEY", "YOUTUBE_API_KEY"],
+    client=secretsmanager,
+)
+warm_orchestrator = WarmOrchestrator()
+
 USE_MOCK_DATA = False
+# Minimum seconds between partial playlist writes to the job record
+PARTIAL_FLUSH_INTERVAL_SEC = 1.0
 
 
 def get_mock_playlist():
@@ -76,25 +88,45 @@ def get_mock_playlist():
 
 
 def get_secrets():
-    try:
-        secret_value = secretsmanager.get_secret_value(SecretId=SECRET_NAME)
-        secrets = json.loads(secret_value["SecretString"])
-        required_keys = ["OPENAI_API_KEY", "GENIUS_API_KEY", "YOUTUBE_API_KEY"]
-        if not all(key in secrets for key in required_keys):
-            raise KeyError("Missing required API keys in secrets.")
-        return secrets
-    except ClientError as e:
-        print(f"[SecretsManager Error]: {e.response['Error']['Message']}")
-        raise e
-    except KeyError as e:
-        print(f"[Secrets Key Error]: {str(e)}")
-        raise e
+    return secrets_cache.get()
+
+
+def put_job_record(job_id, record):
+    s3_client.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=f"{job_id}.json",
+        Body=json.dumps(record),
+        ContentType="application/json",
+    )
+
+
+def partial_result_writer(job_id, min_interval_sec=PARTIAL_FLUSH_INTERVAL_SEC):
+    """
+    Returns an on_progress callback storing the tracks resolved so far in
+    the job record (status "processing"), at most every `min_interval_sec`,
+    so the status poll can render the playlist progressively.
+    """
+    last_flush = [float("-inf")]
+
+    def on_progress(partial_playlist):
+        now = time.monotonic()
+        if now - last_flush[0] < min_interval_sec:
+            return
+        last_flush[0] = now
+        try:
+            put_job_record(job_id, {"status": "processing", **partial_playlist})
+        except ClientError as e:
+            # partial results are best effort, the final write still happens
+            print(f"[Partial Result Error]: {e.response['Error']['Message']}")
+
+    return on_progress
 
 
 def lambda_handler(event, context):
     job_id = event["job_id"]
     description = event["description"]
     clear_memory = event.get("clear_memory", False)
+    orchestrator = None
 
     try:
         # Retrieve API keys from Secrets Manager
@@ -103,36 +135,47 @@ def lambda_handler(event, context):
         genius_api_key = secrets["GENIUS_API_KEY"]
         youtube_api_key = secrets["YOUTUBE_API_KEY"]
 
-        # Perform heavy processing with orchestrator
-        orchestrator = Orchestrator(
-            openai_api_key, genius_api_key, youtube_api_key, clear_memory
-        )
         if USE_MOCK_DATA:
             print("[INFO] Using mock data for playlist generation.")
             playlist = get_mock_playlist()
         else:
-            playlist = orchestrator.run_planning_agent(description, num_tracks=20)
+            # Perform heavy processing with the container's orchestrator
+            orchestrator = warm_orchestrator.get(
+                open_ai_key=openai_api_key,
+                genius_api_key=genius_api_key,
+                youtube_api_key=youtube_api_key,
+            )
+            playlist = orchestrator.run_planning_agent(
+                description,
+                num_tracks=20,
+                on_progress=partial_result_writer(job_id),
+                clear_memory=clear_memory,
+            )
 
         # print(f"playlist = {playlist}")
         # print(f"json.dumps(playlist) = {json.dumps(playlist)}")
 
-        # Store resulting playlist JSON to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=f"{job_id}.json",
-            Body=json.dumps(playlist),
-            ContentType="application/json",
-        )
+        # Store resulting playlist JSON to S3, with the per-stage latencies
+        # of the job (see backend.core.tracing)
+        if orchestrator is not None and isinstance(playlist, dict):
+            playlist = {
+                **playlist,
+                "trace": tracing.summarize(orchestrator.last_trace),
+            }
+        put_job_record(job_id, playlist)
 
         print(f"[Success]: Job {job_id} completed and playlist stored in S3.")
 
     except Exception as e:
         print(f"[Processing Error]: Job {job_id} failed due to {str(e)}")
         # Optionally store an error message in S3 for client notification
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=f"{job_id}.json",
-            Body=json.dumps({"status": "error", "message": str(e)}),
-            ContentType="application/json",
-        )
+        record = {"status": "error", "message": str(e)}
+        if orchestrator is not None and orchestrator.last_trace is not None:
+            record["trace"] = tracing.summarize(orchestrator.last_trace)
+        put_job_record(job_id, record)
         raise e  # Re-raise exception for logging purposes
+
+    finally:
+        # the container is frozen after the response, so export queued
+        # spans now
+        tracing.flush()
@@ -77,10 +77,17 @@ def lambda_handler(event, context):
 
             playlist_data = json.loads(raw_content)
 
+            # partial playlist flushed while the heavy Lambda is still running
+            status = (
+                "processing"
+                if playlist_data.get("status") == "processing"
+                else "completed"
+            )
+
             return {
                 "statusCode": 200,
                 "body": json.dumps(
-                    {"status": "completed", "playlist": playlist_data["playlist"]}
+                    {"status": status, "playlist": playlist_data["playlist"]}
                 ),
                 "headers": {
                     "Content-Type": "application/json",
@@ -4,29 +4,22 @@ import os
 import boto3
 
 # import requests
-from botocore.exceptions import ClientError
-
-from backend.core.orchestrator import Orchestrator
+from backend.deployment.aws.warm_state import CachedSecrets, WarmOrchestrator
 
 # Initialize AWS Secrets Manager client
 secretsmanager = boto3.client("secretsmanager")
 
+# Reused by the warm invocations of this container
+secrets_cache = CachedSecrets(
+    os.environ.get("SECRET_NAME"),
+    ["OPENAI_API_KEY", "GENIUS_API_KEY"],
+    client=secretsmanager,
+)
+warm_orchestrator = WarmOrchestrator()
+
 
 def get_secrets():
-    secret_name = os.environ["SECRET_NAME"]
-    try:
-        secret_value = secretsmanager.get_secret_value(SecretId=secret_name)
-        secrets = json.loads(secret_value["SecretString"])
-        required_keys = ["OPENAI_API_KEY", "GENIUS_API_KEY"]
-        if not all(key in secrets for key in required_keys):
-            raise KeyError("Missing required API keys in secrets.")
-        return secrets
-    except ClientError as e:
-        print(f"[SecretsManager Error]: {e.response['Error']['Message']}")
-        raise e
-    except KeyError as e:
-        print(f"[Secrets Key Error]: {str(e)}")
-        raise e
+    return secrets_cache.get()
 
 
 def lambda_handler(event, context):
@@ -72,8 +65,12 @@ def lambda_handler(event, context):
         clear_memory = body.get("clear_memory", False)
         # print(f"description = {description}")
 
-        orchestrator = Orchestrator(openai_api_key, genius_api_key, clear_memory)
-        playlist = orchestrator.run_planning_agent(description, num_tracks=20)
+        orchestrator = warm_orchestrator.get(
+            open_ai_key=openai_api_key, genius_api_key=genius_api_key
+        )
+        playlist = orchestrator.run_planning_agent(
+            description, num_tracks=20, clear_memory=clear_memory
+        )
 
         return {
             "statusCode": 200,
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from backend import config
+from backend.core.orchestrator import Orchestrator
+
+
+class CachedSecrets:
+    def __init__(self, secret_name, required_keys, client=None, refresh_sec=None):
+        """
+        API keys from Secrets Manager, fetched on the first invocation of a
+        Lambda container and reused by the warm ones until `refresh_sec`
+        have passed, so rotated keys are still picked up.
+
+        Parameters:
+            secret_name (str): Secrets Manager secret id.
+            required_keys (list of str): Keys the secret must contain.
+            client: Secrets Manager client. Created on first use if omitted.
+            refresh_sec (float): Defaults to config.SECRETS_REFRESH_SEC.
+        """
+        self.secret_name = secret_name
+        self.required_keys = list(required_keys)
+        self._client = client
+        self.refresh_sec = (
+            config.SECRETS_REFRESH_SEC if refresh_sec is None else refresh_sec
+        )
+        self._secrets = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        if self._client is None:
+            self._client = boto3.client("secretsmanager")
+        secret_value = self._client.get_secret_value(SecretId=self.secret_name)
+        secrets = json.loads(secret_value["SecretString"])
+        if not all(key in secrets for key in self.required_keys):
+            raise KeyError("Missing required API keys in secrets.")
+        return secrets
+
+    def get(self):
+        """
+        Returns the cached secrets, fetching them when missing or stale.
+        A failed refresh keeps serving the previous secrets.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._secrets is not None and now - self._fetched_at < self.refresh_sec:
+                return self._secrets
+            try:
+                self._secrets = self._fetch()
+                self._fetched_at = now
+            except (ClientError, KeyError) as e:
+                if isinstance(e, ClientError):
+                    print(f"[SecretsManager Error]: {e.response['Error']['Message']}")
+                else:
+                    print(f"[Secrets Key Error]: {str(e)}")
+                if self._secrets is None:
+                    raise
+                print("[Secrets]: Refresh failed, keeping the cached secrets.")
+                # retry on the next refresh interval, not on every request
+                self._fetched_at = now
+            return self._secrets
+
+
+class WarmOrchestrator:
+    def __init__(self, factory=None):
+        """
+        Orchestrator built on the first invocation of a Lambda container and
+        reused by the warm ones, so the dataset, the vector store and the
+        API clients are loaded once per container. It is rebuilt only when
+        the API keys change (secret rotation), keeping the loaded dataset.
+
+        Parameters:
+            factory (callable): factory(dataset=..., **api_keys) returning
+                                the orchestrator. Defaults to Orchestrator.
+        """
+        self._factory = factory
+        self._orchestrator = None
+        self._api_keys = None
+        self._lock = threading.Lock()
+        self.cold_starts = 0
+
+    def get(self, **api_keys):
+        """
+        Returns the container's orchestrator for `api_keys`
+        (open_ai_key, genius_api_key, youtube_api_key).
+        """
+        with self._lock:
+            if self._orchestrator is not None and api_keys == self._api_keys:
+                return self._orchestrator
+
+            factory = Orchestrator if self._factory is None else self._factory
+            dataset = getattr(self._orchestrator, "dataset", None)
+
+            started = time.monotonic()
+            self._orchestrator = factory(dataset=dataset, **api_keys)
+            self._api_keys = api_keys
+            self.cold_starts += 1
+            print(
+                f"[Warm State]: Orchestrator initialized in "
+                f"{time.monotonic() - started:.1f}s."
+            )
+            return self._orchestrator
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from backend.core.action_graph import ActionGraph
+from backend.core.orchestrator import ACTION_SPECS
+
+PLAN = [
+    "Analyze",
+    "Filter",
+    "Refine",
+    "Create_Recommendation_Table",
+    "Retrieve_and_Convert",
+    "Normalize_Loudness",
+    "Summarize",
+]
+
+
+def test_action_graph_dependencies():
+    graph = ActionGraph(PLAN, ACTION_SPECS)
+
+    assert graph.dependencies == [set(), {0}, {0, 1}, {2}, {2}, {2, 4}, {2, 3, 4}]
+    # without a producer of tracks, Retrieve_and_Convert parses them itself
+    graph = ActionGraph(["Retrieve_and_Convert", "Summarize"], ACTION_SPECS)
+    assert graph.dependencies == [set(), {0}]
+
+
+def test_action_graph_overlaps_independent_actions():
+    def run_action(index, action):
+        time.sleep(0.1)
+        return True
+
+    ok, timings = ActionGraph(PLAN, ACTION_SPECS).run(run_action)
+
+    assert ok
+    spans = {action: (start, end) for action, start, end in timings}
+    assert [action for action, _, _ in timings][:3] == PLAN[:3]
+    # the table and the downloads overlap; Summarize waits for both
+    table, download = (
+        spans["Create_Recommendation_Table"],
+        spans["Retrieve_and_Convert"],
+    )
+    assert download[0] < table[1] and table[0] < download[1]
+    assert spans["Summarize"][0] >= max(table[1], download[1])
+    assert timings[-1][2] < 0.6
+
+
+def test_action_graph_stops_after_a_failure():
+    started = []
+
+    def run_action(index, action):
+        started.append(action)
+        return action != "Filter"
+
+    ok, _ = ActionGraph(PLAN, ACTION_SPECS).run(run_action)
+
+    assert not ok and started == ["Analyze", "Filter"]
+
+    def raise_error(index, action):
+        raise RuntimeError(action)
+
+    with pytest.raises(RuntimeError, match="Analyze"):
+        ActionGraph(PLAN, ACTION_SPECS).run(raise_error)
+
+
+def test_action_graph_failure_blocks_dependents_and_queued_actions():
+    specs = {
+        "Load": {"outputs": ["tracks"]},
+        "Slow": {"outputs": ["playlist"]},
+        "Use": {"inputs": ["tracks"]},
+        "Other": {"outputs": ["folder_name"]},
+    }
+    started = []
+    slow_started = threading.Event()
+
+    def run_action(index, action):
+        started.append(action)
+        if action == "Slow":
+            slow_started.set()
+            time.sleep(0.1)
+        return action != "Load"
+
+    def load_fails_while_slow_runs(index, action):
+        if action == "Load":
+            slow_started.wait(1)
+        return run_action(index, action)
+
+    # Load fails while Slow runs; its dependent Use never starts
+    ok, _ = ActionGraph(["Load", "Slow", "Use"], specs).run(load_fails_while_slow_runs)
+    assert not ok and sorted(started) == ["Load", "Slow"]
+
+    # with one worker, ready actions queued behind the failed one are cancelled
+    started.clear()
+    ok, timings = ActionGraph(["Load", "Other", "Slow"], specs).run(
+        run_action, max_workers=1
+    )
+    assert not ok and started == ["Load"]
+    assert [action for action, _, _ in timings] == ["Load"]
@@ -0,0 +1,55 @@
+import os
+
+from backend.core.audio_cache import AudioCache
+
+
+def write_file(path, size):
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def test_audio_cache_links_hits_and_counts_savings(tmp_path):
+    cache = AudioCache(tmp_path / "cache", max_bytes=10_000)
+    song = write_file(tmp_path / "song.mp3", 1_000)
+    cache.add("track-1.mp3", song)
+
+    destination = tmp_path / "playlist" / "01 - Song.mp3"
+    destination.parent.mkdir()
+    assert cache.link_into("track-1.mp3", destination)
+    assert not cache.link_into("track-2.mp3", tmp_path / "missing.mp3")
+
+    assert destination.read_bytes() == song.read_bytes()
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["bytes_saved"] == 1_000 and stats["entries"] == 1
+
+
+def test_audio_cache_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(tmp_path / "cache", max_bytes=2_500)
+    for i in range(3):
+        cache.add(f"track-{i}.mp3", write_file(tmp_path / f"song{i}.mp3", 1_000))
+        if i == 1:
+            cache.get("track-0.mp3")  # track-1 is now the least recently used
+
+    assert cache.get("track-1.mp3") is None
+    assert cache.get("track-0.mp3") is not None
+    assert cache.get("track-2.mp3") is not None
+    assert cache.total_bytes() == 2_000
+
+
+def test_audio_cache_names_files_once_and_copies_across_devices(tmp_path, monkeypatch):
+    cache = AudioCache(tmp_path / "cache", max_bytes=1_500)
+    path = cache.add("track-1.mp3", write_file(tmp_path / "song.mp3", 1_000))
+    assert path.name == "track-1.mp3"
+
+    def cross_device_link(source, destination):
+        raise OSError("Invalid cross-device link")
+
+    monkeypatch.setattr(os, "link", cross_device_link)
+    destination = tmp_path / "01 - Song.mp3"
+    assert AudioCache.link(path, destination) == "copy"
+
+    # the playlist copy survives the eviction of its cache entry
+    cache.add("track-2.mp3", write_file(tmp_path / "song2.mp3", 1_000))
+    assert not path.exists()
+    assert destination.stat().st_size == 1_000
@@ -0,0 +1,131 @@
+import chromadb
+import pytest
+
+from backend.corpus.context_store import (
+    OverlayContextStore,
+    SongContextStore,
+    migrate_chroma_documents,
+    song_id_for,
+)
+
+
+@pytest.fixture
+def context_store(tmp_path):
+    return SongContextStore(db_path=tmp_path / "song_contexts.db")
+
+
+def test_context_store_round_trip(context_store):
+    context = "Track Name: Song A\nLyrics:\n" + "la la la\n" * 200
+    context_store.put("track-a", "Artist A", "Song A", context)
+
+    assert context_store.get("track-a") == context
+    assert context_store.get_by_song_id(song_id_for("Artist A", "Song A")) == context
+    assert len(context_store) == 1
+
+    stored_blob = context_store.conn.execute(
+        "SELECT context FROM song_contexts WHERE track_id = 'track-a'"
+    ).fetchone()[0]
+    assert len(stored_blob) < len(context)
+
+
+def test_context_store_batch_reads(context_store):
+    context_store.put_many(
+        [
+            {
+                "track_id": f"track-{i}",
+                "artist": f"Artist {i}",
+                "track_name": f"Song {i}",
+                "context": f"context {i}",
+            }
+            for i in range(5)
+        ]
+    )
+
+    contexts = context_store.get_many(["track-1", "track-3", "missing"])
+    assert contexts == {"track-1": "context 1", "track-3": "context 3"}
+
+
+def test_context_store_keys_unknown_tracks_by_song_id(context_store):
+    context_store.put(None, "Artist", "Song", "context")
+
+    song_id = song_id_for("Artist", "Song")
+    assert context_store.contains(song_id)
+    assert context_store.get_many_by_song_ids([song_id]) == {song_id: "context"}
+
+
+def test_overlay_context_store_keeps_base_read_only(context_store, tmp_path):
+    context_store.put("track-a", "Artist A", "Song A", "shipped context")
+    context_store.close()
+    base_path = tmp_path / "song_contexts.db"
+    base_path.chmod(0o444)
+
+    store = OverlayContextStore(
+        base=SongContextStore(base_path, read_only=True),
+        overlay=SongContextStore(tmp_path / "overlay.db"),
+    )
+    store.put("track-b", "Artist B", "Song B", "runtime context")
+
+    assert store.get_many(["track-a", "track-b"]) == {
+        "track-a": "shipped context",
+        "track-b": "runtime context",
+    }
+    assert len(store) == 2
+    with pytest.raises(RuntimeError):
+        store.base.put("track-c", "Artist C", "Song C", "context")
+
+
+def make_collection(name, size):
+    collection = chromadb.Client().get_or_create_collection(name=name)
+    collection.add(
+        ids=[f"Artist {i} - Song {i}.txt" for i in range(size)],
+        embeddings=[[float(i), 1.0] for i in range(size)],
+        metadatas=[
+            {"artists": f"Artist {i}", "track_name": f"Song {i}"} for i in range(size)
+        ],
+        documents=[f"context {i}" for i in range(size)],
+    )
+    return collection
+
+
+def test_migrate_chroma_documents_in_batches(context_store):
+    collection = make_collection("migrate_in_batches", 7)
+
+    assert migrate_chroma_documents(collection, context_store, batch_size=3) == 7
+
+    stripped = collection.get(include=["documents", "embeddings", "metadatas"])
+    assert len(stripped["ids"]) == 7
+    assert not any(stripped["documents"])
+    assert stripped["metadatas"][6] == {"artists": "Artist 6", "track_name": "Song 6"}
+    assert context_store.get_by_song_id(song_id_for("Artist 6", "Song 6")) == (
+        "context 6"
+    )
+
+
+def test_migrate_chroma_documents_keeps_the_corpus_when_a_write_fails(
+    context_store,
+):
+    collection = make_collection("migrate_write_fails", 7)
+
+    class FailingCollection:
+        upserts = 0
+
+        def get(self, **kwargs):
+            return collection.get(**kwargs)
+
+        def upsert(self, **kwargs):
+            FailingCollection.upserts += 1
+            if FailingCollection.upserts == 2:
+                raise ValueError("Batch size exceeds maximum batch size")
+            collection.upsert(**kwargs)
+
+    with pytest.raises(ValueError):
+        migrate_chroma_documents(FailingCollection(), context_store, batch_size=3)
+
+    # every embedding survives and every context is already stored
+    assert collection.count() == 7
+    assert len(context_store) == 7
+
+    # running the migration again finishes the job
+    migrate_chroma_documents(collection, context_store, batch_size=3)
+    assert not any(collection.get(include=["documents"])["documents"])
+    assert len(context_store) == 7
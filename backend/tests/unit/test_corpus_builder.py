@@ -0,0 +1,149 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from backend.core.rate_limiter import RateLimiter
+from backend.core.song_utils import SongContextGenerator
+from backend.corpus.context_store import SongContextStore
+from backend.corpus.create_basic_corpus import CorpusBuilder
+
+KNOWN_SONGS = {"song 1": 1, "song 2": 2, "song 3": 3, "song 4": 4}
+
+
+class FakeGeniusHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+    # number of searches answered with a server error
+    failing_searches = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type, status=200):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        FakeGeniusHandler.requests_seen.append(self.path)
+        url = urlparse(self.path)
+        host = f"http://{self.headers['Host']}"
+
+        if url.path == "/search" and FakeGeniusHandler.failing_searches > 0:
+            FakeGeniusHandler.failing_searches -= 1
+            self._send("Internal Server Error", "text/plain", status=500)
+        elif url.path == "/search":
+            query = parse_qs(url.query)["q"][0].lower()
+            hits = [
+                {
+                    "result": {
+                        "title": title.title(),
+                        "primary_artist": {"name": "Fake Artist"},
+                        "url": f"{host}/songs/{song_number}",
+                    }
+                }
+                for title, song_number in KNOWN_SONGS.items()
+                if query.endswith(title)
+            ]
+            self._send(json.dumps({"response": {"hits": hits}}), "application/json")
+        else:
+            self._send(
+                '<div class="RichText__Container-1">A fake description</div>'
+                '<div class="Lyrics__Container-1">Fake lyrics line</div>',
+                "text/html",
+            )
+
+
+@pytest.fixture
+def fake_genius():
+    FakeGeniusHandler.requests_seen = []
+    FakeGeniusHandler.failing_searches = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGeniusHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def tracks():
+    return pd.DataFrame(
+        {
+            "track_id": [f"id-{i}" for i in range(1, 6)],
+            "track_name": [f"Song {i}" for i in range(1, 6)],
+            "artists": ["Fake Artist;Featured"] * 5,
+            "tempo": [120.0] * 5,
+            "energy": [0.7] * 5,
+            "danceability": [0.8] * 5,
+            "mode": [1] * 5,
+            "valence": [0.6] * 5,
+            "track_genre": ["dance"] * 5,
+        }
+    )
+
+
+def make_builder(fake_genius, tmp_path):
+    generator = SongContextGenerator(
+        genius_api_key="dummy",
+        api_base_url=fake_genius,
+        rate_limiter=RateLimiter(rate_per_sec=200, burst=5),
+    )
+    return CorpusBuilder(
+        context_generator=generator,
+        context_store=SongContextStore(db_path=tmp_path / "song_contexts.db"),
+        manifest_path=tmp_path / "manifest.jsonl",
+        metadata_path=tmp_path / "corpus_metadata.csv",
+        max_workers=3,
+    )
+
+
+def test_corpus_builder_fetches_in_parallel(fake_genius, tracks, tmp_path, monkeypatch):
+    monkeypatch.delenv("GITHUB_ACTIONS", raising=False)
+    builder = make_builder(fake_genius, tmp_path)
+
+    report = builder.build(tracks)
+
+    assert report["saved"] == 4 and report["not_found"] == 1
+    assert report["errors"] == 0 and report["songs_per_sec"] > 0
+    assert "Fake lyrics line" in builder.context_store.get("id-1")
+
+    metadata = pd.read_csv(tmp_path / "corpus_metadata.csv")
+    assert sorted(metadata["track_id"]) == ["id-1", "id-2", "id-3", "id-4"]
+
+
+def test_corpus_builder_resumes_from_manifest(
+    fake_genius, tracks, tmp_path, monkeypatch
+):
+    monkeypatch.delenv("GITHUB_ACTIONS", raising=False)
+    make_builder(fake_genius, tmp_path).build(tracks.head(2))
+    requests_after_first_run = len(FakeGeniusHandler.requests_seen)
+
+    report = make_builder(fake_genius, tmp_path).build(tracks)
+
+    assert report["skipped"] == 2
+    assert report["saved"] == 2 and report["not_found"] == 1
+    # 3 requests (search, lyrics, description) per remaining found song + 1 miss
+    assert len(FakeGeniusHandler.requests_seen) - requests_after_first_run == 7
+
+    metadata = pd.read_csv(tmp_path / "corpus_metadata.csv")
+    assert len(metadata) == 4
+
+
+def test_corpus_builder_retries_failed_lookups(
+    fake_genius, tracks, tmp_path, monkeypatch
+):
+    monkeypatch.delenv("GITHUB_ACTIONS", raising=False)
+    FakeGeniusHandler.failing_searches = 1
+
+    report = make_builder(fake_genius, tmp_path).build(tracks.head(1))
+    assert report["errors"] == 1 and report["not_found"] == 0
+
+    # the 500 was not recorded as a miss: the next run fetches the song
+    report = make_builder(fake_genius, tmp_path).build(tracks.head(1))
+    assert report["skipped"] == 0 and report["saved"] == 1
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+from backend.corpus.context_store import song_id_for
+from backend.corpus.corpus_warmer import CorpusWarmer, popularity_order
+
+
+class FakeSemanticRetrieval:
+    def __init__(self, embedded=()):
+        self.embedded = set(embedded)
+        self.SongContextGenerator = SimpleNamespace(rate_limiter=None)
+        self.calls = []
+
+    def embedded_song_ids(self, song_ids):
+        return {song_id for song_id in song_ids if song_id in self.embedded}
+
+    def get_or_create_song_embedding(
+        self,
+        artist,
+        track_name,
+        track_id=None,
+        song_context_generator=None,
+        raise_errors=False,
+    ):
+        assert song_context_generator.rate_limiter is not None and raise_errors
+        self.calls.append(track_id)
+        self.embedded.add(song_id_for(artist, track_name))
+        return None if track_name == "Missing" else "context"
+
+
+def make_dataset():
+    return pd.DataFrame(
+        {
+            "track_id": ["r1", "r2", "r3", "p1", "p2"],
+            "track_name": ["Rock 1", "Rock 2", "Missing", "Pop 1", "Pop 2"],
+            "artists": ["A", "B", "C", "D", "E"],
+            "track_genre": ["rock", "rock", "rock", "pop", "pop"],
+            "popularity": [90, 80, 70, 60, 50],
+        }
+    )
+
+
+def test_popularity_order_interleaves_genres():
+    ordered = popularity_order(make_dataset(), genres=["rock", "pop"])
+    assert list(ordered["track_id"]) == ["r1", "p1", "r2", "p2", "r3"]
+
+
+def test_corpus_warmer_respects_budget_and_resumes(tmp_path):
+    retrieval = FakeSemanticRetrieval(embedded={song_id_for("D", "Pop 1")})
+    warmer = CorpusWarmer(retrieval, manifest_path=tmp_path / "manifest.jsonl")
+
+    report = warmer.warm(make_dataset(), budget=2, genres=["rock", "pop"])
+    assert report["saved"] == 2 and report["already_embedded"] == 1
+    assert sorted(retrieval.calls) == ["r1", "r2"]
+
+    warmer = CorpusWarmer(retrieval, manifest_path=tmp_path / "manifest.jsonl")
+    report = warmer.warm(make_dataset(), budget=10, genres=["rock", "pop"])
+    assert report["saved"] == 1 and report["not_found"] == 1
+    assert sorted(retrieval.calls) == ["p2", "r1", "r2", "r3"]
+
+
+def test_corpus_warmer_leaves_serving_generator_unthrottled(tmp_path):
+    retrieval = FakeSemanticRetrieval()
+    CorpusWarmer(retrieval, manifest_path=tmp_path / "manifest.jsonl")
+    assert retrieval.SongContextGenerator.rate_limiter is None
@@ -0,0 +1,36 @@
+import threading
+import time
+
+from backend.core.download_pipeline import DownloadPipeline
+
+
+def test_pipeline_overlaps_stages_and_applies_backpressure():
+    in_flight = []
+    lock = threading.Lock()
+    transcoded = []
+
+    def fetch(job):
+        time.sleep(0.05)
+        if job == 3:
+            raise OSError("connection reset")
+        with lock:
+            in_flight.append(job)
+        return f"raw-{job}"
+
+    def transcode(job, raw_path):
+        time.sleep(0.1)
+        with lock:
+            transcoded.append(raw_path)
+
+    pipeline = DownloadPipeline(
+        fetch, transcode, network_workers=4, cpu_workers=1, queue_size=1
+    )
+    stats = pipeline.run(range(8))
+
+    assert sorted(transcoded) == sorted(f"raw-{job}" for job in range(8) if job != 3)
+    assert [(job, stage) for job, stage, _ in stats["failures"]] == [(3, "fetch")]
+    assert stats["fetch"]["jobs"] == 8 and stats["transcode"]["jobs"] == 7
+    # a single slow transcoder with a one-slot queue blocks the fetchers
+    assert stats["backpressure_sec"] > 0.2
+    # total time is close to the transcode stage alone, not fetch + transcode
+    assert stats["elapsed_sec"] < 0.7 + 0.2
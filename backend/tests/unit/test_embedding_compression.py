@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from backend.corpus.embeddings.embedding_compression import (
+    CompressedVectorIndex,
+    EmbeddingCompressor,
+)
+from backend.corpus.embeddings.vector_index import NumpyVectorIndex
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    # low-rank vectors so that PCA keeps almost all of the signal
+    embeddings = rng.normal(size=(60, 8)) @ rng.normal(size=(8, 64))
+    ids = [f"Artist {i} - Track {i}.txt" for i in range(60)]
+    metadatas = [
+        {"artists": f"Artist {i}", "track_name": f"Track {i}"} for i in range(60)
+    ]
+    return ids, embeddings.astype(np.float32), metadatas
+
+
+def test_compressed_index_matches_full_precision_top_k(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    full_index = NumpyVectorIndex.build(tmp_path / "full", ids, embeddings, metadatas)
+    compressed = CompressedVectorIndex.build(
+        tmp_path / "compressed",
+        ids,
+        embeddings,
+        metadatas,
+        compressor=EmbeddingCompressor(pca_dim=16, quantization="int8"),
+        full_index=full_index,
+        rescore_candidates=20,
+    )
+
+    query = [embeddings[5]]
+    expected = full_index.query(query_embeddings=query, n_results=5)
+    results = compressed.query(query_embeddings=query, n_results=5)
+
+    assert compressed.vectors.dtype == np.int8
+    assert compressed.vectors.shape == (60, 16)
+    assert results["ids"] == expected["ids"]
+    assert results["distances"][0] == pytest.approx(expected["distances"][0], abs=1e-5)
+
+
+def test_compressed_index_reopens_with_codebook(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    CompressedVectorIndex.build(
+        tmp_path,
+        ids[:50],
+        embeddings[:50],
+        metadatas[:50],
+        compressor=EmbeddingCompressor(pca_dim=16, quantization="int8"),
+    )
+    CompressedVectorIndex(tmp_path).add(ids[50:], embeddings[50:], metadatas[50:])
+
+    reopened = CompressedVectorIndex(tmp_path, rescore_candidates=0)
+    assert reopened.count() == 60
+    assert reopened.compressor.components.shape == (16, 64)
+    results = reopened.query(query_embeddings=[embeddings[55]], n_results=1)
+    assert results["ids"][0] == [ids[55]]
+
+
+def test_compressed_index_rescores_from_float16_copy(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    full_index = NumpyVectorIndex.build(tmp_path / "full", ids, embeddings, metadatas)
+    rescore_index = NumpyVectorIndex.build(
+        tmp_path / "float16", ids, embeddings, metadatas, dtype="float16"
+    )
+    compressed = CompressedVectorIndex.build(
+        tmp_path / "compressed",
+        ids,
+        embeddings,
+        metadatas,
+        compressor=EmbeddingCompressor(pca_dim=16, quantization="int8"),
+        full_index=rescore_index,
+        rescore_candidates=20,
+    )
+
+    query = [embeddings[5]]
+    expected = full_index.query(query_embeddings=query, n_results=5)
+    assert compressed.query(query_embeddings=query, n_results=5)["ids"] == (
+        expected["ids"]
+    )
+    # the rescoring copy is part of the serving footprint
+    assert compressed.nbytes() > rescore_index.vectors.nbytes
+    assert rescore_index.vectors.nbytes == full_index.vectors.nbytes // 2
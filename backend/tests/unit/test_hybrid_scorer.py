@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from backend.core.hybrid_scorer import HybridScorer
+
+
+def make_pool():
+    return pd.DataFrame(
+        {
+            "track_name": ["On target", "Off target", "Popular", "Semantic"],
+            "artists": ["A", "B", "C", "D"],
+            "energy": [0.8, 0.1, 0.5, 0.6],
+            "tempo": [120, 60, 100, 110],
+            "popularity": [20, 20, 100, 20],
+        }
+    )
+
+
+def test_audio_scores_prefer_range_midpoint():
+    params = {"energy": [0.7, 0.9], "tempo": [110, 130], "valence": None}
+    scores = HybridScorer.audio_scores(make_pool(), params)
+    assert np.argmax(scores) == 0 and np.argmin(scores) == 1
+    assert scores[0] == 1.0
+
+
+def test_top_n_combines_scores_and_treats_missing_embeddings_as_neutral():
+    pool = make_pool()
+    params = {"energy": [0.7, 0.9], "tempo": [110, 130]}
+    similarities = [0.80, np.nan, 0.80, 0.95]
+
+    top = HybridScorer({"audio": 0.5, "semantic": 0.5, "popularity": 0.0}).top_n(
+        pool, params, similarities, n=2
+    )
+    assert list(top["track_name"]) == ["Semantic", "On target"]
+    assert top["semantic_score"].tolist() == [1.0, 0.0]
+
+    scored = HybridScorer().score(pool, params, similarities)
+    assert scored.loc[1, "semantic_score"] == 0.0  # median of known scores
+    assert list(pool.columns) == list(make_pool().columns)
@@ -0,0 +1,17 @@
+from backend import config
+from backend.core.llm_executor import LLMExecutor
+
+
+def test_estimated_latency_uses_prior_then_recent_calls_of_the_kind():
+    executor = LLMExecutor(open_ai_key="test-key")
+    assert executor.estimated_latency("rerank") == config.LLM_LATENCY_PRIOR_SEC
+
+    for seconds in (1.0, 2.0, 3.0, 10.0):
+        executor.record_latency("rerank", seconds)
+    executor.record_latency("planning", 30.0)
+    assert executor.estimated_latency("rerank", percentile=50) == 3.0
+    assert executor.estimated_latency("rerank", percentile=90) == 10.0
+
+    executor.client = None  # failed calls do not count towards the estimate
+    assert executor.execute([], kind="rerank") is None
+    assert len(executor.latencies["rerank"]) == 4
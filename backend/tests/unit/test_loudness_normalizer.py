@@ -0,0 +1,85 @@
+import shutil
+
+import pytest
+
+from backend.core import loudness_normalizer
+from backend.core.loudness_normalizer import (
+    LoudnessCache,
+    LoudnessNormalizer,
+    measure_loudness,
+    parse_loudnorm_output,
+)
+from backend.tests.unit.test_track_downloader import write_sine_wav
+
+LOUDNORM_STDERR = """
+[Parsed_loudnorm_0 @ 0x5581]
+{
+    "input_i" : "-27.61",
+    "input_tp" : "-4.47",
+    "input_lra" : "0.00",
+    "input_thresh" : "-37.61",
+    "output_i" : "-14.02",
+    "output_tp" : "-1.00",
+    "output_lra" : "0.00",
+    "output_thresh" : "-24.02",
+    "normalization_type" : "dynamic",
+    "target_offset" : "0.02"
+}
+"""
+
+
+def test_parse_loudnorm_output():
+    assert parse_loudnorm_output(LOUDNORM_STDERR) == {
+        "input_i": -27.61,
+        "input_tp": -4.47,
+        "input_lra": 0.0,
+        "input_thresh": -37.61,
+        "target_offset": 0.02,
+    }
+
+
+def test_normalizer_reuses_cached_measurements(tmp_path, monkeypatch):
+    measured = []
+
+    def fake_measure(ffmpeg_path, path, target):
+        measured.append(path.name)
+        return parse_loudnorm_output(LOUDNORM_STDERR)
+
+    def fake_apply(ffmpeg_path, path, measurement, target):
+        path.write_bytes(b"normalized " + path.read_bytes())
+
+    monkeypatch.setattr(loudness_normalizer, "measure_loudness", fake_measure)
+    monkeypatch.setattr(loudness_normalizer, "apply_loudnorm", fake_apply)
+    normalizer = LoudnessNormalizer(
+        cache=LoudnessCache(tmp_path / "loudness.db"), max_workers=1
+    )
+    normalizer.TRACKS_DIR = tmp_path
+    for folder in ("first", "second"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "01 - A - X.mp3").write_bytes(b"song")
+
+    first = normalizer.normalize_playlist("first")
+    again = normalizer.normalize_playlist("first")
+    second = normalizer.normalize_playlist("second")
+
+    assert first["normalized"] == 1 and again["skipped"] == 1
+    assert second["normalized"] == 1 and second["measure_cached"] == 1
+    assert measured == ["01 - A - X.mp3"]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_normalizer_levels_sine_fixtures(tmp_path):
+    paths = [tmp_path / "quiet.wav", tmp_path / "loud.wav"]
+    write_sine_wav(paths[0], seconds=5.0, amplitude=1500)
+    write_sine_wav(paths[1], seconds=5.0, amplitude=25000)
+    ffmpeg = shutil.which("ffmpeg")
+    normalizer = LoudnessNormalizer(
+        ffmpeg_path=ffmpeg, cache=LoudnessCache(tmp_path / "loudness.db")
+    )
+
+    summary = normalizer.normalize_files(paths)
+
+    assert summary["normalized"] == 2 and summary["failed"] == 0
+    for path in paths:
+        loudness = measure_loudness(ffmpeg, path, normalizer.target)["input_i"]
+        assert loudness == pytest.approx(normalizer.target["integrated"], abs=1.0)
@@ -0,0 +1,51 @@
+import pytest
+
+from backend.core.negative_cache import NegativeCache
+from backend.core.song_utils import SongContextGenerator
+
+
+@pytest.fixture
+def negative_cache(tmp_path):
+    return NegativeCache(db_path=tmp_path / "negative_cache.db", ttl_sec=3600)
+
+
+def test_negative_cache_normalizes_keys(negative_cache):
+    negative_cache.add("Los Ángeles Azules;Other Artist", "  Mis Sentimientos ")
+
+    assert negative_cache.contains("los ángeles azules", "mis  sentimientos")
+    assert not negative_cache.contains("Los Ángeles Azules", "Another Song")
+
+    stats = negative_cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["entries"] == 1
+
+
+def test_negative_cache_expires_entries(tmp_path):
+    negative_cache = NegativeCache(db_path=tmp_path / "negative_cache.db", ttl_sec=0)
+    negative_cache.add("Artist", "Track")
+
+    assert not negative_cache.contains("Artist", "Track")
+    assert negative_cache.purge_expired() == 1
+
+
+def test_negative_cache_is_persistent(tmp_path):
+    db_path = tmp_path / "negative_cache.db"
+    NegativeCache(db_path=db_path).add("Artist", "Track")
+
+    assert NegativeCache(db_path=db_path).contains("Artist", "Track")
+
+
+def test_song_context_generator_skips_known_misses(negative_cache, monkeypatch):
+    monkeypatch.delenv("GITHUB_ACTIONS", raising=False)
+    generator = SongContextGenerator(
+        genius_api_key="dummy", negative_cache=negative_cache
+    )
+
+    def fail_search(title, artist):
+        raise AssertionError("Genius must not be called for a cached miss")
+
+    monkeypatch.setattr(generator, "search_song", fail_search)
+    negative_cache.add("Artist", "Track")
+
+    assert generator.generate_song_context("Artist", "Track") is None
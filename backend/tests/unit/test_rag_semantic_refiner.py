@@ -0,0 +1,171 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from backend.core.hybrid_scorer import HybridScorer
+from backend.core.rag_semantic_refiner import RAGSemanticRefiner
+from backend.corpus.context_store import song_id_for
+
+
+class FakeSemanticRetrieval:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.created = []
+        self.negative_cache = SimpleNamespace(report=lambda: None)
+
+    def get_or_create_song_embedding(self, artist, track_name, track_id=None):
+        self.created.append(track_id)
+
+    def get_song_embeddings(self, song_ids):
+        return {
+            song_id: np.asarray(self.embeddings[song_id], np.float32)
+            for song_id in song_ids
+            if song_id in self.embeddings
+        }
+
+
+def make_refiner(embeddings, prompt_embedding):
+    refiner = RAGSemanticRefiner.__new__(RAGSemanticRefiner)
+    refiner.SemanticRetrieval = FakeSemanticRetrieval(embeddings)
+    refiner.embed_user_prompt = lambda user_prompt: prompt_embedding
+    return refiner
+
+
+def test_rank_tracks_by_embedding_similarity_scores_stored_embeddings():
+    tracks = pd.DataFrame(
+        {
+            "track_id": ["t1", "t2", "t3", "t4"],
+            "artists": ["A", "B", "C", "D"],
+            "track_name": ["One", "Two", "Three", "Four"],
+            "energy": [0.1, 0.2, 0.3, 0.4],
+        }
+    )
+    embeddings = {
+        song_id_for("A", "One"): [0.0, 1.0],
+        song_id_for("B", "Two"): [2.0, 0.1],
+        song_id_for("C", "Three"): [1.0, 1.0],
+    }
+    refiner = make_refiner(embeddings, prompt_embedding=[1.0, 0.0])
+
+    ranked = refiner.rank_tracks_by_embedding_similarity("prompt", tracks, top_k=2)
+
+    assert refiner.SemanticRetrieval.created == ["t1", "t2", "t3", "t4"]
+    assert list(ranked["track_id"]) == ["t2", "t3"]
+    assert list(ranked["energy"]) == [0.2, 0.3]
+    expected = 1 - 2.0 / np.linalg.norm([2.0, 0.1])
+    assert np.isclose(ranked["distance"].iloc[0], expected, atol=1e-6)
+
+
+class SlowLLMExecutor:
+    def estimated_latency(self, kind="default"):
+        assert kind == "rerank"
+        return 5.0
+
+    def execute(self, messages, kind="default"):
+        raise AssertionError("the LLM must not be called over budget")
+
+
+def test_hybrid_refine_returns_embedding_order_when_over_latency_budget():
+    tracks = pd.DataFrame(
+        {
+            "track_id": ["t1", "t2"],
+            "artists": ["A", "B"],
+            "track_name": ["One", "Two"],
+        }
+    )
+    embeddings = {
+        song_id_for("A", "One"): [0.0, 1.0],
+        song_id_for("B", "Two"): [1.0, 0.0],
+    }
+    refiner = make_refiner(embeddings, prompt_embedding=[1.0, 0.0])
+    refiner.llm_executor = SlowLLMExecutor()
+
+    ranked, folder_name, degraded = refiner.hybrid_refine_tracks(
+        "prompt", tracks, folder_name="calm", latency_budget_sec=1.0
+    )
+
+    assert list(ranked["track_id"]) == ["t2", "t1"]
+    assert degraded
+    assert folder_name == "calm"
+
+
+def test_reorder_tracks_by_semantic_ranking_does_not_mutate_inputs():
+    tracks = pd.DataFrame(
+        {
+            "artists": ["Artist A;Feat", "Artist B", "Artist C"],
+            "track_name": ["Song A", "Song  B", "Song C"],
+            "energy": [0.1, 0.2, 0.3],
+        }
+    )
+    original = tracks.copy()
+    ranked_playlist = [
+        {"artist": "artist c", "track_name": "song c"},
+        {"artist": "Unknown", "track_name": "Missing"},
+        {"artist": " ARTIST A ", "track_name": "Song A"},
+        {"artist": "Artist B", "track_name": "song b"},
+    ]
+
+    ordered = RAGSemanticRefiner.reorder_tracks_by_semantic_ranking(
+        tracks, ranked_playlist
+    )
+
+    assert list(ordered["track_name"]) == ["Song C", "Song A", "Song  B"]
+    assert list(ordered.index) == [0, 1, 2]
+    pd.testing.assert_frame_equal(tracks, original)
+
+
+class FastLLMExecutor:
+    def estimated_latency(self, kind="default"):
+        return 0.5
+
+
+def test_hybrid_refine_embeds_missing_candidates_within_budget(capsys):
+    tracks = pd.DataFrame(
+        {
+            "track_id": ["t1", "t2", "t3"],
+            "artists": ["A", "B", "C"],
+            "track_name": ["One", "Two", "Three"],
+            "energy": [0.5, 0.6, 0.9],
+            "popularity": [50, 50, 50],
+        }
+    )
+    refiner = make_refiner(
+        {song_id_for("A", "One"): [0.0, 1.0]}, prompt_embedding=[1.0, 0.0]
+    )
+    fetchable = {song_id_for("B", "Two"): [1.0, 0.0]}
+
+    def get_or_create_song_embedding(artist, track_name, track_id=None):
+        refiner.SemanticRetrieval.created.append(track_id)
+        embedding = fetchable.get(song_id_for(artist, track_name))
+        if embedding is None:
+            return None
+        refiner.SemanticRetrieval.embeddings[song_id_for(artist, track_name)] = (
+            embedding
+        )
+        return "context"
+
+    refiner.SemanticRetrieval.get_or_create_song_embedding = (
+        get_or_create_song_embedding
+    )
+    refiner.hybrid_scorer = HybridScorer(
+        weights={"audio": 0.1, "semantic": 1.0, "popularity": 0.0}
+    )
+    refiner.llm_executor = FastLLMExecutor()
+    refiner.refine_tracks_with_rag = lambda prompt, ranked, folder_name: (
+        ranked,
+        folder_name,
+    )
+
+    ranked, _, degraded = refiner.hybrid_refine_tracks(
+        "prompt",
+        tracks,
+        params={"energy": [0.5, 0.7]},
+        embedding_top_k=3,
+        latency_budget_sec=30.0,
+    )
+
+    # best audio match first; the song Genius lacks is reported as missing
+    assert refiner.SemanticRetrieval.created == ["t2", "t3"]
+    assert list(ranked["track_id"])[0] == "t2" and not degraded
+    assert "1/3 candidate tracks have no embedding" in capsys.readouterr().out
@@ -0,0 +1,172 @@
+import io
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+
+from backend.core.search_scheduler import (
+    QuotaLedger,
+    S3QuotaBackend,
+    SearchScheduler,
+)
+
+
+def quota_error():
+    return HttpError(
+        Response({"status": 403}),
+        b'{"error": {"errors": [{"reason": "quotaExceeded"}], "message": "quota"}}',
+    )
+
+
+def test_quota_ledger_persists_units_per_day(tmp_path):
+    ledger = QuotaLedger(tmp_path / "quota.db", daily_units=300)
+
+    assert ledger.try_spend(100) and ledger.try_spend(100, reserve=100)
+    assert not ledger.try_spend(100, reserve=100)
+    assert QuotaLedger(tmp_path / "quota.db", daily_units=300).remaining() == 100
+
+
+class FakeS3Client:
+    """
+    In-memory stand-in for the boto3 S3 client with conditional writes.
+    """
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+        self.conflicts = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            if Key not in self.objects:
+                raise self.exceptions.NoSuchKey(Key)
+            body, etag = self.objects[Key]
+        time.sleep(0.001)  # widen the read-modify-write window
+        return {"Body": io.BytesIO(body.encode()), "ETag": etag}
+
+    def put_object(
+        self, Bucket, Key, Body, ContentType, IfMatch=None, IfNoneMatch=None
+    ):
+        with self._lock:
+            current = self.objects.get(Key)
+            if (IfNoneMatch == "*" and current is not None) or (
+                IfMatch is not None and (current is None or current[1] != IfMatch)
+            ):
+                self.conflicts += 1
+                raise ClientError(
+                    {"Error": {"Code": "PreconditionFailed", "Message": "412"}},
+                    "PutObject",
+                )
+            self.objects[Key] = (Body, uuid.uuid4().hex)
+
+
+def test_s3_quota_ledger_is_shared_between_containers():
+    s3_client = FakeS3Client()
+    containers = [
+        QuotaLedger(
+            backend=S3QuotaBackend("bucket", s3_client=s3_client), daily_units=1000
+        )
+        for _ in range(4)
+    ]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        spent = list(
+            pool.map(lambda i: containers[i % 4].try_spend(100, reserve=200), range(20))
+        )
+
+    # every container sees one shared budget, not 1000 units each
+    assert sum(spent) == 8
+    assert all(ledger.remaining() == 200 for ledger in containers)
+    assert s3_client.conflicts > 0
+
+    containers[0].exhaust()
+    assert not containers[3].try_spend(100)
+
+
+def test_scheduler_spills_to_fallback_when_budget_runs_low():
+    ledger = QuotaLedger(":memory:", daily_units=1000)
+    scheduler = SearchScheduler(
+        api_search=lambda query: f"api-{query}",
+        fallback_search=lambda query: f"dlp-{query}",
+        ledger=ledger,
+        cost_units=100,
+        reserve_units=700,
+    )
+
+    results = [scheduler.search(str(i)) for i in range(5)]
+
+    assert results == ["api-0", "api-1", "api-2", "dlp-3", "dlp-4"]
+    stats = scheduler.stats()
+    assert stats["api"]["calls"] == 3 and stats["yt_dlp"]["calls"] == 2
+    assert stats["quota_spent"] == 300 and stats["quota_remaining"] == 700
+
+
+def test_scheduler_marks_quota_exhausted_and_bounds_fallback_pool():
+    api_calls = []
+    running = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def api_search(query):
+        api_calls.append(query)
+        raise quota_error()
+
+    def fallback_search(query):
+        with lock:
+            running.append(query)
+            peak[0] = max(peak[0], len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(query)
+        return query
+
+    scheduler = SearchScheduler(
+        api_search,
+        fallback_search,
+        ledger=QuotaLedger(":memory:", daily_units=10000),
+        reserve_units=0,
+        fallback_workers=2,
+    )
+    assert scheduler.search("first") == "first"
+    threads = [
+        threading.Thread(target=scheduler.search, args=(str(i),)) for i in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert scheduler.ledger.remaining() == 0
+    assert api_calls == ["first"] and peak[0] == 2
+    stats = scheduler.stats()
+    assert stats["api"]["failures"] == 1 and stats["yt_dlp"]["calls"] == 7
+
+
+def test_scheduler_refunds_failed_calls_and_survives_fallback_errors():
+    def api_search(query):
+        raise ConnectionError("connection reset")
+
+    def fallback_search(query):
+        raise RuntimeError("yt-dlp failed")
+
+    scheduler = SearchScheduler(
+        api_search,
+        fallback_search,
+        ledger=QuotaLedger(":memory:", daily_units=1000),
+        cost_units=100,
+        reserve_units=0,
+    )
+
+    assert scheduler.search("query") is None
+    # the failed API call is not charged to today's quota
+    assert scheduler.ledger.spent() == 0
+    stats = scheduler.stats()
+    assert stats["api"]["failures"] == 1 and stats["yt_dlp"]["failures"] == 1
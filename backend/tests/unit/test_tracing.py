@@ -0,0 +1,81 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind
+
+from backend.core import tracing
+
+
+def test_spans_nest_across_pool_threads():
+    def search(query):
+        with tracing.span("youtube.search", kind="client", backend="api"):
+            return query
+
+    with tracing.trace("run", exporter=False, num_tracks=2) as root:
+        with tracing.span("action.Create_Recommendation_Table") as action:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(tracing.propagate(search), ["a", "b"]))
+            action.set_attributes(tracks=2)
+
+    assert [span.name for span in root.iter_spans()] == [
+        "run",
+        "action.Create_Recommendation_Table",
+        "youtube.search",
+        "youtube.search",
+    ]
+    assert all(span.trace_id == root.trace_id for span in root.iter_spans())
+    assert tracing.current_span() is None
+
+
+def test_span_outside_trace_records_nothing():
+    with tracing.span("openai.chat", kind="client") as span:
+        span.set_attributes(prompt_tokens=10)
+    assert tracing.current_span() is None
+
+
+def test_summary_aggregates_calls_and_keeps_errors():
+    with pytest.raises(ValueError):
+        with tracing.trace("run", exporter=False) as root:
+            with tracing.span("planning"):
+                for tokens in (10, 20):
+                    with tracing.span("openai.chat", kind="client") as call:
+                        call.set_attributes(prompt_tokens=tokens, model="gpt")
+            with tracing.span("structuring"):
+                raise ValueError("invalid plan")
+
+    summary = tracing.summarize(root)
+
+    assert [stage["name"] for stage in summary["stages"]] == [
+        "run",
+        "planning",
+        "structuring",
+    ]
+    assert summary["stages"][2]["error"] == "ValueError: invalid plan"
+    chat = summary["calls"]["openai.chat"]
+    assert chat["count"] == 2 and chat["prompt_tokens"] == 30
+    # the summary goes into the S3 job record
+    json.dumps(summary)
+
+
+def test_exporters(tmp_path):
+    exporter = tracing.JsonLinesExporter(tmp_path / "traces.jsonl")
+    with tracing.trace("run", exporter=exporter) as root:
+        with tracing.span("ffmpeg.convert", kind="client", source="file"):
+            pass
+
+    lines = [json.loads(line) for line in open(tmp_path / "traces.jsonl")]
+    assert [line["name"] for line in lines] == ["run", "ffmpeg.convert"]
+    assert lines[1]["parent_id"] == lines[0]["span_id"] == root.span_id
+
+    memory = InMemorySpanExporter()
+    otlp = tracing.OtlpExporter(span_exporter=memory)
+    otlp.export(list(root.iter_spans()))
+    assert otlp.flush()
+    run, convert = memory.get_finished_spans()
+    assert convert.parent.span_id == run.context.span_id == int(root.span_id, 16)
+    assert convert.context.trace_id == run.context.trace_id
+    assert convert.kind == SpanKind.CLIENT
+    assert dict(convert.attributes) == {"source": "file"}
+    assert convert.end_time >= convert.start_time
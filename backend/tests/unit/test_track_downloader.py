@@ -0,0 +1,248 @@
+import math
+import shutil
+import struct
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+from yt_dlp.utils import DownloadError
+
+from backend import config
+from backend.core import track_downloader
+from backend.core.audio_cache import AudioCache
+from backend.core.track_downloader import TrackDownloader, ffmpeg_audio_args
+from backend.core.track_resolver import TrackResolver
+
+
+def write_sine_wav(path, seconds=1.0, frequency=440, sample_rate=22050, amplitude=8000):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(
+            b"".join(
+                struct.pack(
+                    "<h",
+                    int(
+                        amplitude * math.sin(2 * math.pi * frequency * i / sample_rate)
+                    ),
+                )
+                for i in range(int(seconds * sample_rate))
+            )
+        )
+
+
+class FixtureDownloader(TrackDownloader):
+    """
+    Downloader whose network stage copies a local fixture file.
+    """
+
+    def __init__(self, tracks_dir, fixture, convert=True):
+        super().__init__(audio_cache=AudioCache(tracks_dir / "cache"))
+        self.TRACKS_DIR = tracks_dir
+        self.fixture = fixture
+        self.convert = convert
+        self.converted = []
+        self.fetched_ids = []
+        self.lock = threading.Lock()
+
+    def fetch_audio(
+        self, track_name, artist_name, save_folder, filename_safe, video_id=None
+    ):
+        with self.lock:
+            self.fetched_ids.append(video_id)
+        time.sleep(0.2)
+        if track_name == "Broken":
+            raise RuntimeError("no video found")
+        return shutil.copy(self.fixture, save_folder / f"{filename_safe}.wav")
+
+    def convert_audio(self, source, output_path):
+        if self.convert:
+            super().convert_audio(source, output_path)
+        else:
+            shutil.move(source, output_path)
+        with self.lock:
+            self.converted.append(output_path.name)
+
+
+class FlakyAudioHandler(BaseHTTPRequestHandler):
+    """
+    Serves AUDIO, cutting every full response off halfway; range requests
+    (a resumed download) are served completely.
+    """
+
+    AUDIO = bytes(range(256)) * 400
+    ranges_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        requested = self.headers.get("Range")
+        FlakyAudioHandler.ranges_seen.append(requested)
+        if requested and not requested.startswith("bytes=0-"):
+            start = int(requested.split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                f"bytes {start}-{len(self.AUDIO) - 1}/{len(self.AUDIO)}",
+            )
+            body = self.AUDIO[start:]
+        else:
+            self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+            start, body = 0, self.AUDIO
+        self.send_header("Content-Type", "audio/webm")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body if start else body[: len(body) // 2])
+        self.close_connection = True
+
+
+@pytest.fixture
+def flaky_audio_url(monkeypatch):
+    FlakyAudioHandler.ranges_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyAudioHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/audio.webm"
+    monkeypatch.setattr(track_downloader, "youtube_link", lambda video_id: url)
+    yield url
+    server.shutdown()
+
+
+@pytest.fixture
+def fixture_wav(tmp_path):
+    path = tmp_path / "fixture.wav"
+    write_sine_wav(path)
+    return path
+
+
+def test_retrieve_and_convert_runs_tracks_concurrently(tmp_path, fixture_wav):
+    tracks = pd.DataFrame(
+        {
+            "artists": ["A", "B", "C", "D"],
+            "track_name": ["One", "Broken", "Three", "Four"],
+        }
+    )
+    downloader = FixtureDownloader(tmp_path, fixture_wav, convert=False)
+
+    started = time.monotonic()
+    summary = downloader.retrieve_and_convert(tracks, "playlist", max_workers=4)
+
+    assert time.monotonic() - started < 0.6
+    assert summary["downloaded"] == 3 and summary["failed"] == 1
+    assert summary["failures"] == [(2, "B", "Broken", "no video found")]
+    assert sorted(downloader.converted) == [
+        "01 - A - One.mp3",
+        "03 - C - Three.mp3",
+        "04 - D - Four.mp3",
+    ]
+
+    summary = downloader.retrieve_and_convert(tracks.iloc[[0]], "playlist")
+    assert summary["skipped"] == 1
+
+
+def test_retrieve_and_convert_links_cached_songs_into_new_playlists(
+    tmp_path, fixture_wav
+):
+    tracks = pd.DataFrame(
+        {"track_id": ["id-1", "id-2"], "artists": ["A", "B"], "track_name": ["X", "Y"]}
+    )
+    downloader = FixtureDownloader(tmp_path, fixture_wav, convert=False)
+    downloader.retrieve_and_convert(tracks, "first")
+
+    summary = downloader.retrieve_and_convert(tracks.iloc[::-1], "second")
+
+    assert summary["cached"] == 2 and len(downloader.converted) == 2
+    second = tmp_path / "second" / "01 - B - Y.mp3"
+    assert second.read_bytes() == fixture_wav.read_bytes()
+    assert downloader.audio_cache.stats()["hit_rate"] == 0.5
+
+
+def test_retrieve_and_convert_reuses_resolved_videos(tmp_path, fixture_wav):
+    tracks = pd.DataFrame({"artists": ["A", "B"], "track_name": ["X", "Y"]})
+    resolver = TrackResolver(lambda query: f"vid-{query}")
+    resolver.resolve_many(tracks)
+    downloader = FixtureDownloader(tmp_path, fixture_wav, convert=False)
+
+    downloader.retrieve_and_convert(tracks, "first", resolver=resolver)
+    summary = downloader.retrieve_and_convert(tracks, "second", resolver=resolver)
+
+    assert resolver.searches == 2
+    assert sorted(downloader.fetched_ids) == ["vid-A X", "vid-B Y"]
+    # tracks without a track_id are cached under their video id
+    assert summary["cached"] == 2
+
+
+def test_retrieve_and_convert_redoes_incomplete_files(tmp_path, fixture_wav):
+    folder = tmp_path / "playlist"
+    folder.mkdir()
+    (folder / "01 - A - One.mp3").write_bytes(b"")
+    (folder / "01 - A - One.part.mp3").write_bytes(b"truncated")
+    tracks = pd.DataFrame({"artists": ["A"], "track_name": ["One"]})
+    downloader = FixtureDownloader(tmp_path, fixture_wav, convert=False)
+
+    summary = downloader.retrieve_and_convert(tracks, "playlist")
+
+    assert summary["downloaded"] == 1
+    assert sorted(path.name for path in folder.iterdir()) == ["01 - A - One.mp3"]
+
+
+def test_failed_conversion_leaves_no_output(tmp_path, fixture_wav):
+    downloader = FixtureDownloader(tmp_path, fixture_wav)
+    downloader.ffmpeg_path = tmp_path / "missing" / "ffmpeg"
+    tracks = pd.DataFrame({"artists": ["A"], "track_name": ["One"]})
+
+    summary = downloader.retrieve_and_convert(tracks, "playlist")
+
+    assert summary["failed"] == 1
+    assert not any((tmp_path / "playlist").glob("*.mp3"))
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_retrieve_and_convert_transcodes_fixture_audio(tmp_path, fixture_wav):
+    downloader = FixtureDownloader(tmp_path, fixture_wav)
+    downloader.ffmpeg_path = shutil.which("ffmpeg")
+    tracks = pd.DataFrame({"artists": ["A", "B"], "track_name": ["One", "Two"]})
+
+    summary = downloader.retrieve_and_convert(tracks, "playlist")
+
+    assert summary["downloaded"] == 2
+    assert summary["stages"]["transcode"]["jobs"] == 2
+    mp3_files = sorted(path.name for path in (tmp_path / "playlist").iterdir())
+    assert mp3_files == ["01 - A - One.mp3", "02 - B - Two.mp3"]
+    mp3_path = tmp_path / "playlist" / "01 - A - One.mp3"
+    assert downloader.probe_duration(mp3_path) == pytest.approx(1.0, abs=0.1)
+    assert not downloader.verify_audio(mp3_path, expected_duration=60)
+
+
+def test_ffmpeg_audio_args_copies_compatible_codecs():
+    assert ffmpeg_audio_args("mp3", "mp3") == ["-acodec", "copy"]
+    assert ffmpeg_audio_args("mp4a.40.2", "m4a") == ["-acodec", "copy"]
+    assert ffmpeg_audio_args("opus", "mp3") == ["-acodec", "libmp3lame"]
+    assert ffmpeg_audio_args(None, "m4a") == ["-acodec", "aac"]
+
+
+def test_interrupted_download_resumes(tmp_path, flaky_audio_url, monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_RETRIES", 0)
+    downloader = TrackDownloader(audio_cache=AudioCache(tmp_path / "cache"))
+
+    with pytest.raises(DownloadError):
+        downloader.fetch_audio("One", "A", tmp_path, "01 - A - One", video_id="v")
+    partial = next(tmp_path.glob("01 - A - One.source.*.part"))
+    downloaded_bytes = partial.stat().st_size
+    assert 0 < downloaded_bytes < len(FlakyAudioHandler.AUDIO)
+
+    # even when streaming is enabled, the partial download is resumed
+    monkeypatch.setattr(config, "STREAM_TO_FFMPEG", True)
+    source = downloader.fetch_audio("One", "A", tmp_path, "01 - A - One", video_id="v")
+
+    assert FlakyAudioHandler.ranges_seen[-1] == f"bytes={downloaded_bytes}-"
+    # one extraction and one download request per attempt
+    assert len(FlakyAudioHandler.ranges_seen) == 4
+    assert source["path"].read_bytes() == FlakyAudioHandler.AUDIO
+    assert not any(tmp_path.glob("*.part"))
@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from backend.core import playlist_utils
+from backend.core.track_resolver import TrackResolver, youtube_link
+
+
+def test_resolve_searches_each_track_once():
+    queries = []
+    lock = threading.Lock()
+
+    def search(query):
+        time.sleep(0.05)
+        with lock:
+            queries.append(query)
+        return f"id-{len(queries)}"
+
+    resolver = TrackResolver(search)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        video_ids = list(
+            pool.map(lambda _: resolver.resolve("Queen", "Bohemian Rhapsody"), range(8))
+        )
+
+    assert queries == ["Queen Bohemian Rhapsody"]
+    assert set(video_ids) == {"id-1"}
+    # normalized artist/title keys share the same resolution
+    assert resolver.resolved("queen", " Bohemian  Rhapsody") == "id-1"
+    assert resolver.resolved("Queen", "Radio Ga Ga") is None
+
+
+def test_resolve_many_is_aligned_with_rows():
+    tracks = pd.DataFrame({"artists": ["A", "B", "A"], "track_name": ["X", "Y", "X"]})
+    resolver = TrackResolver(lambda query: None if query == "B Y" else query)
+
+    assert resolver.resolve_many(tracks) == ["A X", None, "A X"]
+    assert resolver.searches == 2
+    assert youtube_link("abc") == "https://www.youtube.com/watch?v=abc"
+
+
+def test_resolve_many_isolates_failed_searches():
+    def search(query):
+        if query == "B Y":
+            raise RuntimeError("yt-dlp failed")
+        return query
+
+    tracks = pd.DataFrame({"artists": ["A", "B", "C"], "track_name": ["X", "Y", "Z"]})
+    resolved = []
+    resolver = TrackResolver(search, max_workers=3)
+
+    video_ids = resolver.resolve_many(
+        tracks, on_resolved=lambda position, video_id: resolved.append(position)
+    )
+
+    assert video_ids == ["A X", None, "C Z"]
+    assert sorted(resolved) == [0, 1, 2]
+    assert youtube_link(None) is None
+
+
+def test_resolve_many_searches_concurrently():
+    tracks = pd.DataFrame(
+        {"artists": [f"A{i}" for i in range(20)], "track_name": ["X"] * 20}
+    )
+    resolver = TrackResolver(lambda query: time.sleep(0.1) or query, max_workers=10)
+
+    started = time.monotonic()
+    video_ids = resolver.resolve_many(tracks)
+
+    assert time.monotonic() - started < 0.5
+    assert video_ids == [f"A{i} X" for i in range(20)]
+
+
+def test_youtube_searcher_reuses_its_client(monkeypatch, tmp_path):
+    built = []
+
+    class FakeYouTube:
+        def search(self):
+            return self
+
+        def list(self, q, **kwargs):
+            self.query = q
+            return self
+
+        def execute(self):
+            return {"items": [{"id": {"videoId": f"id-{self.query}"}}]}
+
+    def fake_build(*args, **kwargs):
+        built.append(kwargs)
+        return FakeYouTube()
+
+    monkeypatch.delenv("GITHUB_ACTIONS", raising=False)
+    monkeypatch.setattr(playlist_utils.config, "VIDEO_ID_CACHE_ENABLED", False)
+    monkeypatch.setattr(
+        playlist_utils.config, "YOUTUBE_QUOTA_LEDGER_PATH", tmp_path / "quota.db"
+    )
+    monkeypatch.setattr(playlist_utils, "build", fake_build)
+    searcher = playlist_utils.YouTubeSearcher(youtube_api_key="key")
+
+    assert searcher.search_video_id("a") == "id-a"
+    assert searcher.search_top_result("b") == youtube_link("id-b")
+    assert len(built) == 1 and built[0]["static_discovery"] is True
+
+
+def test_recommendation_table_reports_partial_playlists(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "test")
+    monkeypatch.setattr(playlist_utils.config, "VIDEO_ID_CACHE_ENABLED", False)
+    monkeypatch.setattr(
+        playlist_utils.config, "YOUTUBE_QUOTA_LEDGER_PATH", tmp_path / "quota.db"
+    )
+    searcher = playlist_utils.YouTubeSearcher(youtube_api_key="key")
+    tracks = pd.DataFrame({"artists": ["A", "B", "C"], "track_name": ["X", "Y", "Z"]})
+    resolver = TrackResolver(lambda query: query, max_workers=3)
+    partials = []
+
+    playlist = searcher.create_recommendation_table(
+        tracks, "playlist", resolver=resolver, on_progress=partials.append
+    )
+
+    assert [len(partial["playlist"]) for partial in partials] == [1, 2, 3]
+    assert partials[-1] == playlist
+    assert playlist["playlist"][1] == {
+        "artist": "B",
+        "track": "Y",
+        "youtube_link": youtube_link("B Y"),
+    }
@@ -0,0 +1,147 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.corpus.embeddings.vector_index import (
+    NumpyVectorIndex,
+    OverlayVectorIndex,
+)
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(40, 16)).astype(np.float32)
+    ids = [f"Artist {i} - Track {i}.txt" for i in range(40)]
+    metadatas = [
+        {"artists": f"Artist {i}", "track_name": f"Track {i}"} for i in range(40)
+    ]
+    return ids, embeddings, metadatas
+
+
+def test_numpy_index_exact_top_k(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    index = NumpyVectorIndex.build(tmp_path, ids, embeddings, metadatas)
+
+    results = index.query(query_embeddings=[embeddings[7]], n_results=5)
+
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ normalized[7]))[:5]
+    assert results["ids"][0] == [ids[row] for row in expected]
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_numpy_index_restricted_query(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    index = NumpyVectorIndex.build(tmp_path, ids, embeddings, metadatas)
+    where = {
+        "$or": [
+            {
+                "$and": [
+                    {"artists": {"$eq": f"Artist {i}"}},
+                    {"track_name": {"$eq": f"Track {i}"}},
+                ]
+            }
+            for i in (3, 11, 25)
+        ]
+    }
+
+    results = index.query(query_embeddings=[embeddings[0]], n_results=10, where=where)
+
+    assert sorted(results["ids"][0]) == sorted(ids[i] for i in (3, 11, 25))
+
+
+def test_numpy_index_persists_additions(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    NumpyVectorIndex.build(tmp_path, ids[:30], embeddings[:30], metadatas[:30])
+    NumpyVectorIndex(tmp_path).add(ids[30:], embeddings[30:], metadatas[30:])
+
+    reopened = NumpyVectorIndex(tmp_path)
+    assert reopened.count() == 40
+    assert reopened.get(ids=[ids[35]], include=["metadatas"])["metadatas"] == [
+        metadatas[35]
+    ]
+    with pytest.raises(RuntimeError):
+        NumpyVectorIndex(tmp_path, read_only=True).add(ids[:1], embeddings[:1])
+
+
+def test_overlay_index_merges_runtime_additions(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    NumpyVectorIndex.build(tmp_path / "base", ids[:30], embeddings[:30], metadatas[:30])
+    index = OverlayVectorIndex(
+        NumpyVectorIndex(tmp_path / "base", read_only=True),
+        NumpyVectorIndex(tmp_path / "overlay"),
+    )
+    index.add(ids[30:], embeddings[30:], metadatas[30:])
+
+    assert index.count() == 40
+    assert index.get(ids=[ids[3], ids[33]], include=[])["ids"] == [ids[3], ids[33]]
+    for row in (3, 33):
+        results = index.query(query_embeddings=[embeddings[row]], n_results=3)
+        assert results["ids"][0][0] == ids[row]
+        assert len(results["ids"][0]) == 3
+
+
+def test_numpy_index_adds_in_place(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    index = NumpyVectorIndex(tmp_path)
+    index.add(ids[:1], embeddings[:1], metadatas[:1])
+    for row in range(1, 32):
+        index.add(
+            ids[row : row + 1], embeddings[row : row + 1], metadatas[row : row + 1]
+        )
+
+    # 32 rows fit the doubled allocation: replacing a row writes in place
+    vectors_inode = (tmp_path / "vectors.npy").stat().st_ino
+    table = (tmp_path / "ids.json").read_text()
+    replaced = {"artists": "Replaced", "track_name": "Replaced"}
+    index.add(ids[31:32], embeddings[0:1], [replaced])
+    assert (tmp_path / "vectors.npy").stat().st_ino == vectors_inode
+    assert (tmp_path / "ids.json").read_text() == table
+
+    reopened = NumpyVectorIndex(tmp_path)
+    assert reopened.count() == 32
+    assert reopened.get(ids=[ids[31]], include=["metadatas"])["metadatas"] == [replaced]
+    results = reopened.query(query_embeddings=[embeddings[0]], n_results=2)
+    assert sorted(results["ids"][0]) == sorted([ids[0], ids[31]])
+    assert reopened.query(query_embeddings=[embeddings[20]], n_results=1)["ids"] == [
+        [ids[20]]
+    ]
+
+
+def test_numpy_index_queries_see_consistent_rows_during_adds(corpus, tmp_path):
+    ids, embeddings, metadatas = corpus
+    rng = np.random.default_rng(1)
+    extra = rng.normal(size=(400, 16)).astype(np.float32)
+    index = NumpyVectorIndex(tmp_path, dtype="float16")
+    index.add(ids, embeddings, metadatas)
+    errors = []
+
+    def add_songs():
+        for i in range(len(extra)):
+            index.add([f"Extra {i}"], extra[i : i + 1], [{"artists": f"Extra {i}"}])
+
+    def query_songs():
+        try:
+            for i in range(200):
+                results = index.query(query_embeddings=[extra[i % 400]], n_results=5)
+                distances = results["distances"][0]
+                assert all(np.isfinite(distances)) and len(distances) == 5
+                assert all(metadata is not None for metadata in results["metadatas"][0])
+                got = index.get(include=["embeddings", "metadatas"])
+                assert (
+                    len(got["ids"]) == len(got["embeddings"]) == len(got["metadatas"])
+                )
+        except Exception as e:
+            errors.append(e)
+
+    adder = threading.Thread(target=add_songs)
+    readers = [threading.Thread(target=query_songs) for _ in range(3)]
+    for thread in [adder] + readers:
+        thread.start()
+    for thread in [adder] + readers:
+        thread.join()
+
+    assert not errors
+    assert index.count() == 440
@@ -0,0 +1,97 @@
+import io
+
+import pandas as pd
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from backend.core.track_resolver import TrackResolver
+from backend.core.video_id_cache import (
+    S3VideoIdBackend,
+    SQLiteVideoIdBackend,
+    VideoIdCache,
+)
+
+
+class FakeS3Client:
+    """
+    In-memory stand-in for the boto3 S3 client.
+    """
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)].encode())}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[(Bucket, Key)] = Body
+
+
+class FailingS3Client(FakeS3Client):
+    def get_object(self, Bucket, Key):
+        raise ClientError(
+            {"Error": {"Code": "SlowDown", "Message": "Please reduce your rate"}},
+            "GetObject",
+        )
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        raise EndpointConnectionError(endpoint_url="https://s3.amazonaws.com")
+
+
+@pytest.fixture(params=["sqlite", "s3"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteVideoIdBackend(tmp_path / "video_ids.db")
+    return S3VideoIdBackend("bucket", s3_client=FakeS3Client())
+
+
+def test_video_id_cache_round_trip_and_ttl(backend):
+    cache = VideoIdCache(backend=backend, ttl_sec=3600)
+    key = cache.make_key("Queen;David Bowie", " Under  Pressure")
+    cache.put_many({key: "a01QQZyl-_I", cache.make_key("A", "B", "id-1"): None})
+
+    assert key == "queen - under pressure"
+    assert cache.get_many([key, "spotify:id-1"]) == {key: "a01QQZyl-_I"}
+    assert cache.stats()["hit_rate"] == 0.5
+
+    backend.put_many({key: ("a01QQZyl-_I", 0.0)})
+    assert cache.get_many([key]) == {}
+
+
+def test_resolver_reads_and_fills_the_cache_in_bulk(tmp_path):
+    tracks = pd.DataFrame(
+        {
+            "track_id": ["id-1", None, "id-3"],
+            "artists": ["A", "B", "C"],
+            "track_name": ["X", "Y", "Z"],
+        }
+    )
+    cache = VideoIdCache(backend=SQLiteVideoIdBackend(tmp_path / "video_ids.db"))
+    first = TrackResolver(lambda query: f"vid-{query}", cache=cache)
+    assert first.resolve_many(tracks) == ["vid-A X", "vid-B Y", "vid-C Z"]
+
+    def fail_search(query):
+        raise AssertionError("cached tracks must not be searched")
+
+    second = TrackResolver(fail_search, cache=cache)
+    assert second.resolve_many(tracks.iloc[::-1]) == ["vid-C Z", "vid-B Y", "vid-A X"]
+    assert second.resolve("b", "y") == "vid-B Y"
+    assert cache.backend.get_many(["spotify:id-1"])["spotify:id-1"][0] == "vid-A X"
+    assert cache.stats()["hits"] == 3
+
+
+def test_s3_errors_are_cache_misses():
+    cache = VideoIdCache(
+        backend=S3VideoIdBackend("bucket", s3_client=FailingS3Client())
+    )
+    key = cache.make_key("Queen", "Under Pressure")
+
+    cache.put_many({key: "a01QQZyl-_I"})
+    assert cache.get_many([key]) == {}
+    assert cache.stats()["misses"] == 1
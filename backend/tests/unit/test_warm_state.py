@@ -0,0 +1,69 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from backend.deployment.aws.warm_state import CachedSecrets, WarmOrchestrator
+
+
+class FakeSecretsManager:
+    def __init__(self, secrets):
+        self.secrets = secrets
+        self.calls = 0
+        self.fail = False
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        if self.fail:
+            raise ClientError(
+                {"Error": {"Code": "Throttling", "Message": "slow down"}},
+                "GetSecretValue",
+            )
+        return {"SecretString": json.dumps(self.secrets)}
+
+
+def test_secrets_are_fetched_once_until_refresh():
+    client = FakeSecretsManager({"OPENAI_API_KEY": "a"})
+    secrets = CachedSecrets("name", ["OPENAI_API_KEY"], client=client, refresh_sec=60)
+
+    assert secrets.get() == {"OPENAI_API_KEY": "a"}
+    client.secrets = {"OPENAI_API_KEY": "b"}
+    assert secrets.get() == {"OPENAI_API_KEY": "a"}
+    assert client.calls == 1
+
+    secrets.refresh_sec = 0
+    assert secrets.get() == {"OPENAI_API_KEY": "b"}
+
+    # a failed refresh keeps the cached keys
+    client.fail = True
+    assert secrets.get() == {"OPENAI_API_KEY": "b"}
+
+
+def test_secrets_fail_without_cached_value():
+    client = FakeSecretsManager({"GENIUS_API_KEY": "g"})
+    secrets = CachedSecrets("name", ["OPENAI_API_KEY"], client=client)
+
+    with pytest.raises(KeyError):
+        secrets.get()
+
+
+def test_orchestrator_is_reused_until_keys_change():
+    built = []
+
+    def factory(dataset=None, **api_keys):
+        orchestrator = type("Fake", (), {})()
+        orchestrator.dataset = dataset if dataset is not None else object()
+        orchestrator.api_keys = api_keys
+        built.append(orchestrator)
+        return orchestrator
+
+    warm = WarmOrchestrator(factory=factory)
+    first = warm.get(open_ai_key="a", genius_api_key="g")
+
+    assert warm.get(open_ai_key="a", genius_api_key="g") is first
+    assert warm.cold_starts == 1
+
+    # rotated keys rebuild the clients but keep the loaded dataset
+    rotated = warm.get(open_ai_key="b", genius_api_key="g")
+    assert rotated is not first and rotated.dataset is first.dataset
+    assert warm.cold_starts == 2
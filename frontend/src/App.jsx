@@ -24,8 +24,17 @@ function App() {
         if (data.status === "completed" && data.playlist) {
           setPlaylist(data.playlist);
           setLoading(false);
-        } else if (retries > 0) {
-          setTimeout(() => fetchPlaylist(jobId, retries - 1), 4000);
+          return;
+        }
+        // render the tracks resolved so far while the job keeps running
+        if (data.status === "processing" && data.playlist) {
+          setPlaylist(data.playlist);
+        }
+        if (retries > 0) {
+          setTimeout(
+            () => fetchPlaylist(jobId, retries - 1),
+            data.playlist ? 1500 : 4000
+          );
         }
       });
   }, []);
@@ -113,6 +122,11 @@ function App() {
                 </tbody>
               </table>
             </div>
+            {loading && (
+              <p className="text-center text-indigo-400 animate-pulse my-3">
+                Finding YouTube links... {playlist.length} tracks ready
+              </p>
+            )}
             <div className="flex justify-center">
               <button
                 className="mt-8 bg-gradient-to-r from-green-500 to-green-600 hover:from-green-600 hover:to-green-700 text-white font-semibold py-3 px-8 rounded-xl shadow-xl transition duration-300 ease-in-out"
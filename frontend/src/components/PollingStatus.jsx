@@ -8,6 +8,12 @@ const simulatedSteps = [
   "📊 Finalizing your personalized playlist...",
 ];
 
+// give up on the job after 10 minutes of polling
+const TIMEOUT_MS = 10 * 60 * 1000;
+const POLL_MS = 4000;
+// faster while tracks stream in
+const PARTIAL_POLL_MS = 1500;
+
 function PollingStatus({ jobId, onReset }) {
   const [status, setStatus] = useState("processing");
   const [playlist, setPlaylist] = useState(null);
@@ -15,15 +21,24 @@ function PollingStatus({ jobId, onReset }) {
 
   const executed = useRef(false);
 
-  const fetchPlaylist = useCallback((retries = 150) => {
+  // the interval changes once tracks stream in, so the budget is the
+  // polling time left rather than a fixed number of retries
+  const fetchPlaylist = useCallback((remainingMs = TIMEOUT_MS) => {
     fetch(`https://1xqg9hsfdl.execute-api.us-east-1.amazonaws.com/Prod/status/${jobId}`)
       .then((res) => res.json())
       .then((data) => {
         if (data.status === "completed" && data.playlist) {
           setStatus("completed");
           setPlaylist(data.playlist);
-        } else if (retries > 0) {
-          setTimeout(() => fetchPlaylist(retries - 1), 4000);
+          return;
+        }
+        // tracks resolved so far, while the rest is still processing
+        if (data.status === "processing" && data.playlist) {
+          setPlaylist(data.playlist);
+        }
+        const delay = data.playlist ? PARTIAL_POLL_MS : POLL_MS;
+        if (remainingMs > 0) {
+          setTimeout(() => fetchPlaylist(remainingMs - delay), delay);
         }
       });
   }, [jobId]);
@@ -56,11 +71,16 @@ function PollingStatus({ jobId, onReset }) {
         </div>
       )}
 
-      {status === "completed" && playlist && (
+      {playlist && (
         <>
           <h2 className="text-2xl font-bold my-4 text-indigo-700">
             🎵 Your Personalized AI Playlist
           </h2>
+          {status === "processing" && (
+            <p className="text-sm text-gray-500 mb-2 animate-pulse">
+              Finding YouTube links... {playlist.length} tracks ready
+            </p>
+          )}
           <div className="overflow-x-auto shadow-lg rounded-lg">
             <table className="w-full text-left table-auto">
               <thead className="bg-indigo-700 text-white">
@@ -97,12 +117,14 @@ function PollingStatus({ jobId, onReset }) {
               </tbody>
             </table>
           </div>
-          <button
-            className="mt-6 bg-green-500 hover:bg-green-600 text-white font-bold py-2 px-6 rounded-lg shadow-md transition duration-300 ease-in-out"
-            onClick={onReset}
-          >
-            🔄 Create Another Playlist
-          </button>
+          {status === "completed" && (
+            <button
+              className="mt-6 bg-green-500 hover:bg-green-600 text-white font-bold py-2 px-6 rounded-lg shadow-md transition duration-300 ease-in-out"
+              onClick={onReset}
+            >
+              🔄 Create Another Playlist
+            </button>
+          )}
         </>
       )}
     </div>